@@ -0,0 +1,24 @@
+-- macros/incremental.sql
+
+-- Restrict an incremental model to rows loaded after the newest one it already holds.
+-- `id` is the SERIAL key of telegram_medical_messages, so it grows in load order across
+-- all channels; message_id restarts per channel and message_date is not load order.
+-- Rollups keep the newest source id of each group in their own column, passed as `watermark`.
+{% macro new_rows_only(column='id', watermark=none) %}
+    {% if is_incremental() %}
+        WHERE {{ column }} > (SELECT COALESCE(MAX({{ watermark or column }}), 0) FROM {{ this }})
+    {% endif %}
+{% endmacro %}
+
+-- Log how many rows each model processed in this run (called from on-run-end).
+{% macro report_processed_rows(results) %}
+    {% if execute %}
+        {% for result in results if result.node.resource_type == 'model' %}
+            {% set rows_affected = result.adapter_response.get('rows_affected') %}
+            {# Postgres reports INSERT for an incremental merge and SELECT when the table was (re)built #}
+            {% set mode = 'incremental' if result.adapter_response.get('code') == 'INSERT' else 'full build' %}
+            {{ log(result.node.name ~ ': ' ~ (rows_affected if rows_affected is not none else 'unknown') ~ ' rows processed ('
+                   ~ mode ~ ', ' ~ result.status ~ ', ' ~ (result.execution_time | round(2)) ~ 's)', info=True) }}
+        {% endfor %}
+    {% endif %}
+{% endmacro %}
@@ -0,0 +1,38 @@
+-- models/daily_channel_messages.sql
+
+{{
+    config(
+        materialized='incremental',
+        unique_key=['channel_username', 'message_day'],
+        indexes=[
+            {'columns': ['channel_username', 'message_day'], 'unique': True},
+            {'columns': ['message_day']}
+        ]
+    )
+}}
+
+-- Messages, emoji and YouTube-link usage per channel per day. An incremental run only
+-- recomputes the (channel, day) groups that received rows since the last run, each from
+-- all of its rows, so the counts stay exact without rescanning the other days.
+WITH touched_days AS (
+    SELECT DISTINCT
+        channel_username,
+        CAST(message_date AS date) AS message_day
+    FROM {{ ref('medical_source_data') }}
+    {{ new_rows_only('id', watermark='max_source_id') }}
+)
+
+SELECT
+    source.channel_username,
+    touched_days.message_day,
+    COUNT(*) AS message_count,
+    COUNT(*) FILTER (WHERE source.emoji_used <> 'No emoji') AS messages_with_emoji,
+    COUNT(*) FILTER (WHERE source.youtube_links <> 'No YouTube link') AS messages_with_youtube_links,
+    COALESCE(SUM(array_length(string_to_array(NULLIF(source.youtube_links, 'No YouTube link'), ', '), 1)), 0) AS youtube_link_count,
+    MAX(source.id) AS max_source_id  -- Watermark of the next incremental run
+FROM {{ ref('medical_source_data') }} AS source
+JOIN touched_days
+    ON source.channel_username = touched_days.channel_username
+    AND source.message_date >= touched_days.message_day  -- Range predicates use the (channel_username, message_date) index
+    AND source.message_date < touched_days.message_day + 1
+GROUP BY source.channel_username, touched_days.message_day
@@ -0,0 +1,24 @@
+-- models/detection_class_counts.sql
+
+{{
+    config(
+        materialized='table',
+        indexes=[
+            {'columns': ['class_name'], 'unique': True}
+        ]
+    )
+}}
+
+-- Detections per class. yolo_detection.py replaces the detections of re-processed
+-- images, so rows can disappear and an id watermark would miss that: the rollup is
+-- rebuilt on every run instead. It is one pass over the (class_name, id) index, and
+-- dbt swaps the new table in atomically, so readers never see a partial rollup.
+SELECT
+    class_name,
+    COUNT(*) AS detection_count,
+    COUNT(DISTINCT image_path) AS image_count,
+    AVG(confidence) AS avg_confidence,
+    MAX(id) AS max_detection_id
+FROM {{ source('public', 'detection_data') }}
+WHERE class_name IS NOT NULL
+GROUP BY class_name
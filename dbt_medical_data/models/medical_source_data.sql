@@ -1,4 +1,28 @@
-{{ config(materialized='table') }}
+{{
+    config(
+        materialized='incremental',
+        unique_key=['channel_username', 'message_id'],
+        on_schema_change='append_new_columns',
+        indexes=[
+            {'columns': ['channel_username', 'message_id'], 'unique': True},
+            {'columns': ['id']},
+            {'columns': ['channel_username', 'message_date']}  -- Range scans of the rollup models
+        ]
+    )
+}}
 
-select *
-from {{ source('public', 'telegram_medical_messages') }}
\ No newline at end of file
+-- Columns are listed so the loader's generated search_vector (the full-text index column) is not copied
+select
+    id,  -- Load-order key of the source row, used to pick up new rows on the next run
+    channel_title,
+    channel_username,
+    message_id,
+    message,
+    message_date,
+    emoji_used,
+    youtube_links,
+    product_name,
+    usage_info,
+    cluster_id
+from {{ source('public', 'telegram_medical_messages') }}
+{{ new_rows_only('id') }}
@@ -1,36 +1,44 @@
 -- models/transform_medical_data.sql
 
-{{ config(materialized='table') }}
+{{
+    config(
+        materialized='incremental',
+        unique_key=['channel_username', 'message_id'],
+        on_schema_change='append_new_columns',
+        indexes=[
+            {'columns': ['channel_username', 'message_id'], 'unique': True},
+            {'columns': ['id']},
+            {'columns': ['channel_username', 'message_date']}  -- Range scans of the rollup models
+        ]
+    )
+}}
 
 WITH processed_data AS (
     SELECT
+        id,  -- Load-order key of the source row, used to pick up new rows on the next run
         message_id,
         channel_title,
         channel_username,
         message,
-        CASE
-            WHEN message ~ '[A-Za-z]{3,}' THEN  -- Check if message contains a sequence of at least 3 letters (product name)
-                TRIM(SUBSTRING(message FROM '([A-Za-z ]{3,})'))  -- Extract sequence of at least 3 letters or spaces
-            ELSE NULL
-        END AS product_name,
-        CASE
-            WHEN message ~ '\d{1,3}\s?[A-Za-z]*' THEN  -- Checks if a number (1-3 digits) followed by optional text appears
-                TRIM(SUBSTRING(message FROM '(\d{1,3}\s?[A-Za-z]*)'))  -- Extracts the number and possible text after
-            ELSE NULL
-        END AS usage_info,
+        product_name,  -- Extracted by scripts/product_extraction.py while the data is cleaned
+        usage_info,
+        cluster_id,  -- Near-duplicate cluster from scripts/near_duplicates.py; reposts share one
         cast(message_date as timestamp) as message_date,  -- Ensure message_date is in timestamp format
         emoji_used,
         youtube_links
     FROM {{ ref('medical_source_data') }}
+    {{ new_rows_only('id') }}  -- On incremental runs only new rows are read
 )
 
 SELECT 
+    id,
     message_id,
     channel_title,
     channel_username,
     message,
     product_name,
     usage_info,
+    cluster_id,
     message_date,
     emoji_used,
     youtube_links
@@ -0,0 +1,36 @@
+-- models/weekly_channel_products.sql
+
+{{
+    config(
+        materialized='incremental',
+        unique_key=['channel_username', 'week_start', 'product_name'],
+        indexes=[
+            {'columns': ['channel_username', 'week_start', 'product_name'], 'unique': True},
+            {'columns': ['week_start']}
+        ]
+    )
+}}
+
+-- Product mentions per channel per week (weeks start on Monday). Incremental runs
+-- recompute only the (channel, week) groups that received rows since the last run.
+WITH touched_weeks AS (
+    SELECT DISTINCT
+        channel_username,
+        CAST(date_trunc('week', message_date) AS date) AS week_start
+    FROM {{ ref('transform_medical_data') }}
+    {{ new_rows_only('id', watermark='max_source_id') }}
+)
+
+SELECT
+    source.channel_username,
+    touched_weeks.week_start,
+    source.product_name,
+    COUNT(*) AS mentions,
+    MAX(source.id) AS max_source_id  -- Watermark of the next incremental run
+FROM {{ ref('transform_medical_data') }} AS source
+JOIN touched_weeks
+    ON source.channel_username = touched_weeks.channel_username
+    AND source.message_date >= touched_weeks.week_start
+    AND source.message_date < touched_weeks.week_start + 7
+WHERE source.product_name IS NOT NULL
+GROUP BY source.channel_username, touched_weeks.week_start, source.product_name
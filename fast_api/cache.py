@@ -0,0 +1,141 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from prometheus_client import Counter
+from .metrics import REGISTRY
+
+# Cache settings, configurable through the environment
+CACHE_TTL_SECONDS = float(os.getenv('CACHE_TTL_SECONDS', 30))  # How long a cached page may be served
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 1024))  # In-process entries kept before the least recently used is evicted
+CACHE_URL = os.getenv('CACHE_URL')  # e.g. redis://localhost:6379/0 to share the cache between workers
+
+CACHE_REQUESTS = Counter('api_cache_requests', 'Read requests answered from or missing the response cache', ['result'], registry=REGISTRY)
+
+class TTLCache:
+    """ In-process LRU cache whose entries also expire after ttl seconds.
+
+    The generation number counts invalidations; set() drops a value computed
+    before the latest one, so a read racing a write cannot re-cache stale data.
+    """
+
+    def __init__(self, ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self._generation = 0
+
+    async def generation(self):
+        return self._generation
+
+    async def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    async def set(self, key, value, generation):
+        with self.lock:
+            if generation != self._generation:
+                return
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    async def invalidate(self):
+        with self.lock:
+            self._generation += 1
+            self.entries.clear()
+
+    async def size(self):
+        return len(self.entries)
+
+class RedisCache:
+    """ Cache on a Redis-compatible asyncio client (get, set with ex, incr).
+
+    Keys carry a generation number; invalidation increments it, so every
+    worker stops reading the old entries at once and Redis expires them by TTL.
+    """
+
+    def __init__(self, client, ttl=CACHE_TTL_SECONDS, prefix='fast_api:cache'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def generation(self):
+        return int(await self.client.get(f"{self.prefix}:generation") or 0)
+
+    async def get(self, key):
+        return await self.client.get(f"{self.prefix}:{await self.generation()}:{key}")
+
+    async def set(self, key, value, generation):
+        # Written under the generation it was computed in; after an invalidation nobody reads it
+        await self.client.set(f"{self.prefix}:{generation}:{key}", value, ex=max(1, int(self.ttl)))
+
+    async def invalidate(self):
+        await self.client.incr(f"{self.prefix}:generation")
+
+    async def size(self):
+        return None
+
+def create_backend(cache_url=CACHE_URL):
+    """ Return a RedisCache for cache_url, or the in-process TTLCache when no URL is configured. """
+    if not cache_url:
+        return TTLCache()
+    import redis.asyncio as redis
+    return RedisCache(redis.from_url(cache_url))
+
+class ResponseCache:
+    """ Caches serialized read responses by path and query parameters, with hit/miss counts. """
+
+    def __init__(self, backend=None):
+        self.backend = backend or create_backend()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(request):
+        """ Key a request by its path and query parameters, independent of their order. """
+        query = '&'.join(f"{name}={value}" for name, value in sorted(request.query_params.multi_items()))
+        return f"{request.url.path}?{query}"
+
+    @staticmethod
+    def make_etag(body):
+        return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+    async def get(self, key):
+        """ Return (cached body or None, generation to pass to set), counting the hit or miss. """
+        generation = await self.backend.generation()
+        body = await self.backend.get(key)
+        if body is None:
+            self.misses += 1
+            CACHE_REQUESTS.labels('miss').inc()
+        else:
+            self.hits += 1
+            CACHE_REQUESTS.labels('hit').inc()
+        return body, generation
+
+    async def set(self, key, body, generation):
+        await self.backend.set(key, body, generation)
+
+    async def invalidate(self):
+        await self.backend.invalidate()
+
+    async def stats(self):
+        requests = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / requests, 4) if requests else None,
+            'entries': await self.backend.size()
+        }
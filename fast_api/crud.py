@@ -1,22 +1,216 @@
-from sqlalchemy.orm import Session
+import base64
+import binascii
+import json
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import and_, func, insert, literal, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from . import models, schemas
 from fastapi import HTTPException
 
-# Function to get detection data from the database
-async def get_detection_data(db: Session, skip: int = 0, limit: int = 100):
+# Function to encode the last id of a page into an opaque cursor
+def encode_cursor(last_id: int) -> str:
+    payload = json.dumps({'id': last_id}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+# Function to decode a cursor back into the id the next page starts after
+def decode_cursor(cursor: str) -> int:
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        last_id = json.loads(payload)['id']
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError) as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+    if not isinstance(last_id, int) or isinstance(last_id, bool):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return last_id
+
+# Function to get a page of detection data from the database
+async def get_detection_data(db: AsyncSession, cursor: str = None, limit: int = 100, class_name: str = None,
+                             min_confidence: float = None, image_path: str = None, skip: int = 0):
+    """ 
+    Keyset pagination on id: each page seeks past the last id of the previous one instead of
+    scanning and discarding `skip` rows. Returns the rows and the cursor of the next page (None on the last page).
+    """
+    query = select(models.DetectionData)
+    if cursor is not None:
+        query = query.where(models.DetectionData.id > decode_cursor(cursor))
+    if class_name is not None:
+        query = query.where(models.DetectionData.class_name == class_name)
+    if min_confidence is not None:
+        query = query.where(models.DetectionData.confidence >= min_confidence)
+    if image_path is not None:
+        query = query.where(models.DetectionData.image_path == image_path)
+    # Legacy offset paging, only honoured on the first page
+    if skip and cursor is None:
+        query = query.offset(skip)
+    # Fetch one extra row to learn whether another page follows
+    query = query.order_by(models.DetectionData.id).limit(limit + 1)
     try:
-        return db.query(models.DetectionData).offset(skip).limit(limit).all()
+        result = await db.execute(query)
+        rows = result.scalars().all()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1].id)
+    return rows, None
 
 # Function to create new detection data in the database
-async def create_detection_data(db: Session, detection_data: schemas.DetectionDataCreate):
+async def create_detection_data(db: AsyncSession, detection_data: schemas.DetectionDataCreate):
     try:
         db_detection_data = models.DetectionData(**detection_data.dict())
         db.add(db_detection_data)
-        db.commit()
-        db.refresh(db_detection_data)
+        await db.commit()
+        await db.refresh(db_detection_data)
         return db_detection_data
     except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Function to insert many detections in one transaction with a multi-row INSERT ... RETURNING
+async def create_detection_data_batch(db: AsyncSession, detections: list):
+    """ Insert all detections in one transaction and return their new ids in input order. """
+    if not detections:
+        return []
+    statement = insert(models.DetectionData).returning(models.DetectionData.id, sort_by_parameter_order=True)
+    try:
+        result = await db.execute(statement, [detection.dict() for detection in detections])
+        ids = result.scalars().all()
+        await db.commit()
+        return ids
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Function to run a select and return its rows as dicts
+async def fetch_rows(db: AsyncSession, query):
+    try:
+        result = await db.execute(query)
+        return [dict(row) for row in result.mappings()]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Function to get the daily message rollup, newest day first
+async def get_daily_message_stats(db: AsyncSession, channel_username: str = None, start: date = None,
+                                  end: date = None, limit: int = 100):
+    rollup = models.DailyChannelMessages
+    query = select(
+        rollup.channel_username, rollup.message_day, rollup.message_count, rollup.messages_with_emoji,
+        rollup.messages_with_youtube_links, rollup.youtube_link_count
+    )
+    if channel_username is not None:
+        query = query.where(rollup.channel_username == channel_username)
+    if start is not None:
+        query = query.where(rollup.message_day >= start)
+    if end is not None:
+        query = query.where(rollup.message_day <= end)
+    query = query.order_by(rollup.message_day.desc(), rollup.channel_username).limit(limit)
+    return await fetch_rows(db, query)
+
+# Function to sum the daily message rollup per channel over a date range, busiest channel first
+async def get_channel_message_stats(db: AsyncSession, start: date = None, end: date = None):
+    rollup = models.DailyChannelMessages
+    message_count = func.sum(rollup.message_count)
+    query = select(
+        rollup.channel_username,
+        message_count.label('message_count'),
+        func.sum(rollup.messages_with_emoji).label('messages_with_emoji'),
+        func.sum(rollup.messages_with_youtube_links).label('messages_with_youtube_links'),
+        func.sum(rollup.youtube_link_count).label('youtube_link_count'),
+        func.min(rollup.message_day).label('first_day'),
+        func.max(rollup.message_day).label('last_day')
+    )
+    if start is not None:
+        query = query.where(rollup.message_day >= start)
+    if end is not None:
+        query = query.where(rollup.message_day <= end)
+    query = query.group_by(rollup.channel_username).order_by(message_count.desc(), rollup.channel_username)
+    return await fetch_rows(db, query)
+
+# Function to get the top products of every channel and week in a range
+async def get_weekly_product_stats(db: AsyncSession, channel_username: str = None, start: date = None,
+                                   end: date = None, top: int = 10):
+    """ The `top` most mentioned products per (channel, week), newest week first. """
+    rollup = models.WeeklyChannelProducts
+    rank = func.row_number().over(
+        partition_by=(rollup.channel_username, rollup.week_start),
+        order_by=(rollup.mentions.desc(), rollup.product_name)
+    ).label('rank')
+    ranked = select(rollup.channel_username, rollup.week_start, rollup.product_name, rollup.mentions, rank)
+    if channel_username is not None:
+        ranked = ranked.where(rollup.channel_username == channel_username)
+    if start is not None:
+        ranked = ranked.where(rollup.week_start >= start)
+    if end is not None:
+        ranked = ranked.where(rollup.week_start <= end)
+    ranked = ranked.subquery()
+    query = (
+        select(ranked.c.channel_username, ranked.c.week_start, ranked.c.product_name, ranked.c.mentions)
+        .where(ranked.c.rank <= top)
+        .order_by(ranked.c.week_start.desc(), ranked.c.channel_username, ranked.c.rank)
+    )
+    return await fetch_rows(db, query)
+
+# Function to get the detection counts per class, most detected first
+async def get_detection_class_stats(db: AsyncSession):
+    rollup = models.DetectionClassCounts
+    query = select(
+        rollup.class_name, rollup.detection_count, rollup.image_count, rollup.avg_confidence
+    ).order_by(rollup.detection_count.desc(), rollup.class_name)
+    return await fetch_rows(db, query)
+
+# Function to encode the rank and id of the last search hit of a page into an opaque cursor
+def encode_search_cursor(rank: float, last_id: int) -> str:
+    payload = json.dumps({'rank': rank, 'id': last_id}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+# Function to decode a search cursor back into the (rank, id) the next page starts after
+def decode_search_cursor(cursor: str):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        rank, last_id = payload['rank'], payload['id']
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError) as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+    if not isinstance(rank, (int, float)) or isinstance(rank, bool) or not isinstance(last_id, int) or isinstance(last_id, bool):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return float(rank), last_id
+
+# Function to search message text, best match first, one keyset page at a time
+async def search_messages(db: AsyncSession, q: str, cursor: str = None, limit: int = 20, channel_username: str = None,
+                          start: date = None, end: date = None):
+    """
+    On PostgreSQL the query is parsed with websearch_to_tsquery (words, "quoted phrases", OR, -word)
+    and matched against the GIN-indexed search_vector column; hits are ordered by ts_rank, then id.
+    Other engines (SQLite in tests) match every word as a substring and rank all hits 0.
+    Returns the rows as dicts and the cursor of the next page (None on the last page).
+    """
+    message = models.TelegramMessage
+    if db.get_bind().dialect.name == 'postgresql':
+        tsquery = func.websearch_to_tsquery(models.SEARCH_CONFIG, q)
+        match = message.search_vector.op('@@')(tsquery)
+        rank = func.ts_rank(message.search_vector, tsquery)
+    else:
+        match = and_(*(message.message.ilike(f"%{word}%") for word in q.split()))
+        rank = literal(0.0)
+
+    query = select(
+        message.id, message.channel_title, message.channel_username, message.message_id, message.message,
+        message.message_date, message.emoji_used, message.youtube_links, message.product_name, message.usage_info,
+        message.cluster_id, rank.label('rank')
+    ).where(match)
+    if channel_username is not None:
+        query = query.where(message.channel_username == channel_username)
+    # Whole days; bounds on message_date let PostgreSQL skip the other monthly partitions
+    if start is not None:
+        query = query.where(message.message_date >= datetime.combine(start, time.min))
+    if end is not None:
+        query = query.where(message.message_date < datetime.combine(end + timedelta(days=1), time.min))
+    if cursor is not None:
+        last_rank, last_id = decode_search_cursor(cursor)
+        query = query.where(or_(rank < last_rank, and_(rank == last_rank, message.id > last_id)))
+    # Fetch one extra row to learn whether another page follows
+    query = query.order_by(rank.desc(), message.id).limit(limit + 1)
+    rows = await fetch_rows(db, query)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_search_cursor(rows[-1]['rank'], rows[-1]['id'])
+    return rows, None
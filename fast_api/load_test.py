@@ -0,0 +1,163 @@
+"""Load-test harness for the detection data API.
+
+Runs the same GET /detection_data/ workload against two in-process apps backed
+by one seeded SQLite file: the legacy data path (sync Session inside async
+endpoints) and the current async engine. SQLite answers in microseconds, so every
+statement is delayed by --latency-ms in the thread that executes it, standing in
+for the network round trip to Postgres: the sync driver waits on the event loop
+thread, aiosqlite waits in its own worker thread. Prints requests per second and
+latency percentiles for each. Pass --url to load-test a running server instead,
+e.g. uvicorn against a local Postgres.
+
+    python -m fast_api.load_test --rows 100000 --requests 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import threading
+import time
+from typing import List
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.util import await_only
+
+def add_sync_latency(sync_engine, latency):
+    """ Delay every statement of a sync sqlite3 engine by latency seconds. """
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        dbapi_connection.set_trace_callback(lambda statement: time.sleep(latency))
+
+def add_async_latency(async_engine, latency):
+    """ Delay every statement of an aiosqlite engine by latency seconds, inside aiosqlite's thread. """
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        await_only(dbapi_connection.driver_connection.set_trace_callback(lambda statement: time.sleep(latency)))
+
+def build_legacy_app(database_url, latency):
+    """ Rebuild the pre-async data path: a sync Session used from async endpoints. """
+    from . import models, schemas
+
+    sync_engine = create_engine(database_url)
+    add_sync_latency(sync_engine, latency)
+    SyncSession = sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
+    legacy_app = FastAPI()
+
+    async def get_sync_db():
+        db = SyncSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @legacy_app.get("/detection_data/", response_model=List[schemas.DetectionData])
+    async def read_detection_data(skip: int = 0, limit: int = 100, db: Session = Depends(get_sync_db)):
+        return db.query(models.DetectionData).offset(skip).limit(limit).all()
+
+    return legacy_app
+
+def seed_database(database_url, rows):
+    """ Create the detection_data table and fill it with synthetic boxes. """
+    from . import models
+
+    sync_engine = create_engine(database_url)
+    models.Base.metadata.create_all(sync_engine)
+    batch = [
+        {
+            'bounding_box': [i % 640, i % 480, i % 640 + 10, i % 480 + 10],
+            'confidence': (i % 100) / 100,
+            'class_id': i % 80,
+            'class_name': f'class_{i % 80}',
+            'image_path': f'images/{i // 5}.jpg'
+        }
+        for i in range(rows)
+    ]
+    with sync_engine.begin() as connection:
+        connection.execute(insert(models.DetectionData), batch)
+    sync_engine.dispose()
+
+async def run_load(get, requests, concurrency, skip):
+    """ Fire requests with at most concurrency in flight; return per-request latencies and total time. """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one_request(i):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await get({'skip': (i * 97) % max(skip, 1), 'limit': 100})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_request(i) for i in range(requests)))
+    return latencies, time.perf_counter() - start
+
+def report(name, latencies, elapsed):
+    """ Print throughput and latency percentiles for one run. """
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f"{name:<8} {len(latencies) / elapsed:8.1f} req/s   p50 {quantiles[49] * 1000:7.1f} ms   p99 {quantiles[98] * 1000:7.1f} ms")
+
+async def load_test_app(app, args):
+    """ Run the workload against an in-process app served from its own event loop thread.
+
+    Keeping the client on a separate loop means a server that blocks its loop
+    delays responses, as it would for real clients, instead of freezing the
+    client's timers too.
+    """
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    def on_server(coroutine):
+        return asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, loop))
+
+    lifespan = app.router.lifespan_context(app)
+    await on_server(lifespan.__aenter__())
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+    try:
+        return await run_load(
+            lambda params: on_server(client.get("/detection_data/", params=params)),
+            args.requests, args.concurrency, args.rows
+        )
+    finally:
+        await on_server(client.aclose())
+        await on_server(lifespan.__aexit__(None, None, None))
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+async def main_async(args):
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+            get = lambda params: client.get("/detection_data/", params=params)
+            report("server", *await run_load(get, args.requests, args.concurrency, args.skip))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'load_test.sqlite')
+        os.environ['DATABASE_URL'] = f'sqlite+aiosqlite:///{db_path}'
+        seed_database(f'sqlite:///{db_path}', args.rows)
+
+        from .main import app
+        from .database import engine
+        latency = args.latency_ms / 1000
+        add_async_latency(engine, latency)
+        report("before", *await load_test_app(build_legacy_app(f'sqlite:///{db_path}', latency), args))
+        report("after", *await load_test_app(app, args))
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test GET /detection_data/ before and after the async data path.")
+    parser.add_argument("--rows", type=int, default=100000, help="Rows seeded into the stand-in database")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Simulated database round trip per statement")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--url", help="Base URL of a running server to test instead of the in-process apps")
+    parser.add_argument("--skip", type=int, default=10000, help="Largest skip offset used with --url; requests spread their offsets below it")
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
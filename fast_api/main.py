@@ -1,36 +1,223 @@
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date
+from typing import List, Optional
 from . import crud, models, schemas
-from .database import SessionLocal, engine
+from .cache import ResponseCache
+from .database import engine, get_db
+from .metrics import observe_request, render_metrics
 
-# Create all the tables in the database
-models.Base.metadata.create_all(bind=engine)
+# Largest number of detections accepted by one batch upload
+MAX_BATCH_SIZE = int(os.getenv('DETECTION_BATCH_MAX_SIZE', 5000))
+
+# Content types read line by line as newline-delimited JSON
+NDJSON_MEDIA_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+# Function to create missing tables and indexes; the message table and the rollups are created by the loader and dbt
+def create_schema(connection):
+    tables = [table for table in models.Base.metadata.sorted_tables if 'managed_by' not in table.info]
+    models.Base.metadata.create_all(connection, tables=tables)
+    # create_all skips tables that already exist, so add indexes declared since they were created
+    for index in models.DetectionData.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+# Create all the tables in the database on startup and release the pool on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with engine.begin() as connection:
+        await connection.run_sync(create_schema)
+    yield
+    await engine.dispose()
 
 # Create the FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+# Cache of serialized read responses, cleared by every write
+response_cache = ResponseCache()
+
+# Function to answer from a serialized body: 304 when the client already has it, otherwise the JSON with its ETag
+def cached_json_response(request: Request, body: bytes, cache_status: str):
+    etag = ResponseCache.make_etag(body)
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'X-Cache': cache_status}
+    if_none_match = request.headers.get('if-none-match', '')
+    client_etags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    if etag in client_etags or '*' in client_etags:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type='application/json', headers=headers)
 
-# Dependency to get the database session
-async def get_db():
-    db = SessionLocal()
+# Middleware to record the count and latency of every request, labelled by route template
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
     try:
-        yield db
+        response = await call_next(request)
+        status = response.status_code
+        return response
     finally:
-        db.close()
+        route = request.scope.get('route')
+        # Unmatched paths share one label so arbitrary URLs cannot grow the metric set
+        observe_request(request.method, route.path if route else 'unmatched', status, time.perf_counter() - start)
+
+# Endpoint exposing the API and process metrics in the Prometheus text format
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
 
 # Endpoint to create new detection data
 @app.post("/detection_data/", response_model=schemas.DetectionData)
-async def create_detection_data(detection_data: schemas.DetectionDataCreate, db: Session = Depends(get_db)):
+async def create_detection_data(detection_data: schemas.DetectionDataCreate, db: AsyncSession = Depends(get_db)):
     try:
-        return await crud.create_detection_data(db=db, detection_data=detection_data)
+        created = await crud.create_detection_data(db=db, detection_data=detection_data)
+        await response_cache.invalidate()
+        return created
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# Endpoint to read detection data
-@app.get("/detection_data/", response_model=List[schemas.DetectionData])
-async def read_detection_data(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+# Function to yield raw detections from a JSON array or a streamed NDJSON body
+async def iter_batch_items(request: Request):
+    content_type = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    if content_type not in NDJSON_MEDIA_TYPES:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+        if not isinstance(body, list):
+            raise HTTPException(status_code=422, detail="Expected a JSON array of detections")
+        for item in body:
+            yield item
+        return
+
+    # Parse NDJSON as it arrives, keeping only the unfinished line in memory
+    buffer = b''
+    async for chunk in request.stream():
+        *lines, buffer = (buffer + chunk).split(b'\n')
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+# Function to validate one raw detection; returns the schema object or a list of errors
+def validate_batch_item(item):
+    if isinstance(item, bytes):
+        try:
+            item = json.loads(item)
+        except ValueError as e:
+            return None, [{'type': 'json_invalid', 'msg': str(e)}]
+    if not isinstance(item, dict):
+        return None, [{'type': 'dict_type', 'msg': 'Detection must be a JSON object'}]
     try:
-        detection_data = await crud.get_detection_data(db, skip=skip, limit=limit)
-        return detection_data
+        return schemas.DetectionDataCreate(**item), None
+    except ValidationError as e:
+        return None, json.loads(e.json())
+
+# Endpoint to create many detections in one transaction
+@app.post("/detection_data/batch", response_model=schemas.DetectionDataBatchResult)
+async def create_detection_data_batch(request: Request, db: AsyncSession = Depends(get_db)):
+    detections, positions, errors = [], [], []
+    count = 0
+    async for item in iter_batch_items(request):
+        if count >= MAX_BATCH_SIZE:
+            raise HTTPException(status_code=413, detail=f"Batch exceeds the maximum of {MAX_BATCH_SIZE} detections")
+        detection, item_errors = validate_batch_item(item)
+        if item_errors:
+            errors.append({'index': count, 'errors': item_errors})
+        else:
+            detections.append(detection)
+            positions.append(count)
+        count += 1
+
+    # Invalid items are reported and skipped; the valid ones are written together
+    ids = [None] * count
+    for position, new_id in zip(positions, await crud.create_detection_data_batch(db, detections)):
+        ids[position] = new_id
+    if detections:
+        await response_cache.invalidate()
+    return {'inserted': len(detections), 'ids': ids, 'errors': errors}
+
+# Endpoint to read detection data, one keyset page at a time; repeated polls are answered from the cache
+@app.get("/detection_data/", response_model=schemas.DetectionDataPage,
+         responses={304: {'description': "Not modified: the page matches the If-None-Match ETag"}})
+async def read_detection_data(request: Request,
+                              cursor: Optional[str] = None,
+                              limit: int = Query(100, ge=1, le=1000),
+                              class_name: Optional[str] = None,
+                              min_confidence: Optional[float] = None,
+                              image_path: Optional[str] = None,
+                              skip: int = Query(0, ge=0, deprecated=True),
+                              db: AsyncSession = Depends(get_db)):
+    key = ResponseCache.make_key(request)
+    body, generation = await response_cache.get(key)
+    if body is not None:
+        return cached_json_response(request, body, 'HIT')
+    try:
+        items, next_cursor = await crud.get_detection_data(
+            db, cursor=cursor, limit=limit, class_name=class_name,
+            min_confidence=min_confidence, image_path=image_path, skip=skip
+        )
+        page = schemas.DetectionDataPage.model_validate({'items': items, 'next_cursor': next_cursor}, from_attributes=True)
+        body = page.model_dump_json().encode()
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+    await response_cache.set(key, body, generation)
+    return cached_json_response(request, body, 'MISS')
+
+# Endpoint reporting the response cache hit and miss counts
+@app.get("/cache/stats")
+async def read_cache_stats():
+    return await response_cache.stats()
+
+# Endpoint to read messages, emoji and YouTube-link usage per channel per day from the dbt rollup
+@app.get("/stats/messages/daily", response_model=List[schemas.DailyMessageStats])
+async def read_daily_message_stats(channel_username: Optional[str] = None,
+                                   start: Optional[date] = None,
+                                   end: Optional[date] = None,
+                                   limit: int = Query(100, ge=1, le=5000),
+                                   db: AsyncSession = Depends(get_db)):
+    return await crud.get_daily_message_stats(db, channel_username=channel_username, start=start, end=end, limit=limit)
+
+# Endpoint to read per-channel message totals over a date range from the daily rollup
+@app.get("/stats/messages/channels", response_model=List[schemas.ChannelMessageStats])
+async def read_channel_message_stats(start: Optional[date] = None,
+                                     end: Optional[date] = None,
+                                     db: AsyncSession = Depends(get_db)):
+    return await crud.get_channel_message_stats(db, start=start, end=end)
+
+# Endpoint to read the top products per channel per week from the dbt rollup
+@app.get("/stats/products/weekly", response_model=List[schemas.WeeklyProductStats])
+async def read_weekly_product_stats(channel_username: Optional[str] = None,
+                                    start: Optional[date] = None,
+                                    end: Optional[date] = None,
+                                    top: int = Query(10, ge=1, le=100),
+                                    db: AsyncSession = Depends(get_db)):
+    return await crud.get_weekly_product_stats(db, channel_username=channel_username, start=start, end=end, top=top)
+
+# Endpoint to read detection counts per class from the dbt rollup
+@app.get("/stats/detections/classes", response_model=List[schemas.DetectionClassStats])
+async def read_detection_class_stats(db: AsyncSession = Depends(get_db)):
+    return await crud.get_detection_class_stats(db)
+
+# Endpoint to search message text, ranked by relevance, with channel and date filters and keyset pagination
+@app.get("/messages/search", response_model=schemas.MessageSearchPage)
+async def search_messages(q: str = Query(..., min_length=1, max_length=200),
+                          cursor: Optional[str] = None,
+                          limit: int = Query(20, ge=1, le=100),
+                          channel_username: Optional[str] = None,
+                          start: Optional[date] = None,
+                          end: Optional[date] = None,
+                          db: AsyncSession = Depends(get_db)):
+    items, next_cursor = await crud.search_messages(
+        db, q, cursor=cursor, limit=limit, channel_username=channel_username, start=start, end=end
+    )
+    return {'items': items, 'next_cursor': next_cursor}
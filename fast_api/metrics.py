@@ -0,0 +1,114 @@
+import json
+import os
+import threading
+from prometheus_client import CollectorRegistry, Counter, Histogram, ProcessCollector, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+from prometheus_client.utils import floatToGoString
+
+# JSON lines written by scripts/instrumentation.py for every pipeline stage run; same default location
+PIPELINE_METRICS_LOG = os.getenv(
+    'PIPELINE_METRICS_LOG',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs', 'pipeline_metrics.jsonl')
+)
+# Buckets of pipeline_stage_duration_seconds, as in scripts/instrumentation.py
+STAGE_BUCKETS = (0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600, float('inf'))
+
+# Own registry, so the app can be created more than once in a process (tests, benchmarks)
+REGISTRY = CollectorRegistry()
+ProcessCollector(registry=REGISTRY)
+
+HTTP_REQUESTS = Counter('http_requests', 'HTTP requests handled', ['method', 'route', 'status'], registry=REGISTRY)
+HTTP_SECONDS = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency', ['method', 'route'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, float('inf')), registry=REGISTRY
+)
+
+class PipelineLogCollector:
+    """ Export the pipeline stage runs logged to PIPELINE_METRICS_LOG.
+
+    Stages run in the scraper, merge, loader and detection processes, so their
+    metrics never reach the API process. Each scrape reads the complete lines
+    appended since the previous one and adds them to running totals; a
+    replaced or truncated log starts the totals over.
+    """
+
+    def __init__(self, path=PIPELINE_METRICS_LOG):
+        self.path = path
+        self.lock = threading.Lock()
+        self.reset(None)
+
+    def reset(self, source):
+        self.source = source
+        self.offset = 0
+        self.durations = {}  # (stage, status) -> [count per bucket, sum of seconds]
+        self.rows = {}
+        self.rows_per_second = {}
+        self.peak_rss = {}
+
+    def read_new_events(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        source = (self.path, stat.st_ino)
+        if source != self.source or stat.st_size < self.offset:
+            self.reset(source)
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(stat.st_size - self.offset)
+        # A line still being written is read on the next scrape
+        data = data[:data.rfind(b'\n') + 1]
+        self.offset += len(data)
+        for line in data.splitlines():
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(event, dict) and event.get('event') == 'stage':
+                self.add(event)
+
+    def add(self, event):
+        stage, status, seconds = event['stage'], event['status'], event['seconds']
+        duration = self.durations.setdefault((stage, status), [[0] * len(STAGE_BUCKETS), 0.0])
+        for index, bound in enumerate(STAGE_BUCKETS):
+            if seconds <= bound:
+                duration[0][index] += 1
+        duration[1] += seconds
+        self.rows[stage] = self.rows.get(stage, 0) + event.get('rows', 0)
+        if status == 'ok':
+            self.rows_per_second[stage] = event.get('rows_per_sec', 0.0)
+        if event.get('peak_rss_bytes') is not None:
+            self.peak_rss[stage] = event['peak_rss_bytes']
+
+    def collect(self):
+        with self.lock:
+            self.read_new_events()
+            duration = HistogramMetricFamily(
+                'pipeline_stage_duration_seconds', 'Wall time of a pipeline stage run', labels=['stage', 'status']
+            )
+            for (stage, status), (buckets, total) in sorted(self.durations.items()):
+                duration.add_metric(
+                    [stage, status], [(floatToGoString(bound), count) for bound, count in zip(STAGE_BUCKETS, buckets)], total
+                )
+            rows = CounterMetricFamily('pipeline_stage_rows', 'Rows processed by a pipeline stage', labels=['stage'])
+            for stage, value in sorted(self.rows.items()):
+                rows.add_metric([stage], value)
+            rows_per_second = GaugeMetricFamily('pipeline_stage_rows_per_second', 'Throughput of the last run of a stage', labels=['stage'])
+            for stage, value in sorted(self.rows_per_second.items()):
+                rows_per_second.add_metric([stage], value)
+            peak_rss = GaugeMetricFamily('pipeline_stage_peak_rss_bytes', 'Peak RSS of the process of the last run of a stage', labels=['stage'])
+            for stage, value in sorted(self.peak_rss.items()):
+                peak_rss.add_metric([stage], value)
+        return [duration, rows, rows_per_second, peak_rss]
+
+PIPELINE_STAGES = PipelineLogCollector()
+REGISTRY.register(PIPELINE_STAGES)
+
+def observe_request(method, route, status, seconds):
+    """ Record one HTTP request in the API metrics. """
+    HTTP_REQUESTS.labels(method, route, str(status)).inc()
+    HTTP_SECONDS.labels(method, route).observe(seconds)
+
+def render_metrics():
+    """ Return (body, content type) of the API, process and pipeline stage metrics in the Prometheus text format. """
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
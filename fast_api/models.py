@@ -1,5 +1,10 @@
-from sqlalchemy import Column, Integer, Float, String, JSON
-from .database import Base
+from sqlalchemy import Column, Integer, BigInteger, Float, String, Text, Date, DateTime, JSON, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.ext.declarative import declarative_base
+
+# Base class of the declarative models; kept apart from database.py so the tables can be imported
+# (e.g. by scripts/yolo_detection.py) without creating the API's engine
+Base = declarative_base()
 
 # Define the DetectionData model
 class DetectionData(Base):
@@ -10,4 +15,73 @@ class DetectionData(Base):
     confidence = Column(Float)  # Confidence score
     class_id = Column(Integer)  # Class ID
     class_name = Column(String)  # Class name
-    image_path = Column(String)  # Path to the image
\ No newline at end of file
+    image_path = Column(String)  # Path to the image
+
+    # Filter columns lead and id trails, so filtered keyset pages are a single index range scan
+    __table_args__ = (
+        Index('ix_detection_data_class_name_id', 'class_name', 'id'),
+        Index('ix_detection_data_image_path_id', 'image_path', 'id'),
+        Index('ix_detection_data_confidence', 'confidence'),
+    )
+
+# Text search configuration of telegram_medical_messages.search_vector (scripts/database_setup.py);
+# 'simple' lowercases words without stemming, so English and Amharic are indexed alike
+SEARCH_CONFIG = 'simple'
+
+# Define the TelegramMessage model: the cleaned messages loaded by scripts/database_setup.py, which owns the table
+class TelegramMessage(Base):
+    __tablename__ = 'telegram_medical_messages'
+    __table_args__ = {'info': {'managed_by': 'database_setup'}}
+
+    id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True)  # Load-order key
+    channel_title = Column(Text)
+    channel_username = Column(Text)
+    message_id = Column(BigInteger)  # Unique together with channel_username
+    message = Column(Text)
+    message_date = Column(DateTime)
+    emoji_used = Column(Text)
+    youtube_links = Column(Text)
+    product_name = Column(Text)
+    usage_info = Column(Text)
+    cluster_id = Column(BigInteger)  # Near-duplicate cluster; reposts share one
+    search_vector = Column(TSVECTOR().with_variant(Text, 'sqlite'))  # Generated from message; GIN indexed
+
+# Rollup tables built by the dbt models of the same names (dbt_medical_data/models); the API only reads them
+DBT_MANAGED = {'managed_by': 'dbt'}
+
+# Define the DailyChannelMessages rollup: messages, emoji and YouTube-link usage per channel per day
+class DailyChannelMessages(Base):
+    __tablename__ = 'daily_channel_messages'
+    __table_args__ = {'info': DBT_MANAGED}
+
+    channel_username = Column(String, primary_key=True)
+    message_day = Column(Date, primary_key=True)
+    message_count = Column(BigInteger)
+    messages_with_emoji = Column(BigInteger)
+    messages_with_youtube_links = Column(BigInteger)
+    youtube_link_count = Column(BigInteger)
+    max_source_id = Column(BigInteger)
+
+# Define the WeeklyChannelProducts rollup: product mentions per channel per week
+class WeeklyChannelProducts(Base):
+    __tablename__ = 'weekly_channel_products'
+    __table_args__ = {'info': DBT_MANAGED}
+
+    channel_username = Column(String, primary_key=True)
+    week_start = Column(Date, primary_key=True)
+    product_name = Column(String, primary_key=True)
+    mentions = Column(BigInteger)
+    max_source_id = Column(BigInteger)
+
+# Define the DetectionClassCounts rollup: detections per class
+class DetectionClassCounts(Base):
+    __tablename__ = 'detection_class_counts'
+    __table_args__ = {'info': DBT_MANAGED}
+
+    class_name = Column(String, primary_key=True)
+    detection_count = Column(BigInteger)
+    image_count = Column(BigInteger)
+    avg_confidence = Column(Float)
+    max_detection_id = Column(BigInteger)
+
+ROLLUP_TABLES = [DailyChannelMessages.__table__, WeeklyChannelProducts.__table__, DetectionClassCounts.__table__]
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import List
+from datetime import date, datetime
+from typing import List, Optional
 
 # Base schema for detection data
 class DetectionDataBase(BaseModel):
@@ -19,4 +20,89 @@ class DetectionData(DetectionDataBase):
 
     # Config class to enable ORM mode
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+# Schema for one page of detection data with the cursor for the next page
+class DetectionDataPage(BaseModel):
+    items: List[DetectionData]
+    next_cursor: Optional[str] = None
+
+
+# Validation errors for one rejected item of a batch upload
+class DetectionDataBatchError(BaseModel):
+    index: int
+    errors: List[dict]
+
+# Schema for the result of a batch upload; ids line up with the submitted items (None where rejected)
+class DetectionDataBatchResult(BaseModel):
+    inserted: int
+    ids: List[Optional[int]]
+    errors: List[DetectionDataBatchError]
+
+# Schema for reading a cleaned Telegram message
+class Message(BaseModel):
+    id: int
+    channel_title: Optional[str] = None
+    channel_username: str
+    message_id: int
+    message: Optional[str] = None
+    message_date: Optional[datetime] = None
+    emoji_used: Optional[str] = None
+    youtube_links: Optional[str] = None
+    product_name: Optional[str] = None
+    usage_info: Optional[str] = None
+    cluster_id: Optional[int] = None
+
+    class Config:
+        orm_mode = True
+
+# Schema for a search hit with its relevance to the query
+class MessageSearchResult(Message):
+    rank: float
+
+# Schema for one page of search hits, best first, with the cursor for the next page
+class MessageSearchPage(BaseModel):
+    items: List[MessageSearchResult]
+    next_cursor: Optional[str] = None
+
+# Schema for one channel's message and emoji/YouTube-link usage on one day
+class DailyMessageStats(BaseModel):
+    channel_username: str
+    message_day: date
+    message_count: int
+    messages_with_emoji: int
+    messages_with_youtube_links: int
+    youtube_link_count: int
+
+    class Config:
+        orm_mode = True
+
+# Schema for one channel's totals over a date range
+class ChannelMessageStats(BaseModel):
+    channel_username: str
+    message_count: int
+    messages_with_emoji: int
+    messages_with_youtube_links: int
+    youtube_link_count: int
+    first_day: date
+    last_day: date
+
+# Schema for the mentions of one product in one channel and week
+class WeeklyProductStats(BaseModel):
+    channel_username: str
+    week_start: date
+    product_name: str
+    mentions: int
+
+    class Config:
+        orm_mode = True
+
+# Schema for the detections of one class
+class DetectionClassStats(BaseModel):
+    class_name: str
+    detection_count: int
+    image_count: int
+    avg_confidence: Optional[float] = None
+
+    class Config:
+        orm_mode = True
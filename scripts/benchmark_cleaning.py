@@ -0,0 +1,83 @@
+import argparse
+import random
+import re
+import time
+import emoji
+import pandas as pd
+from clean_medical_data import MedicalDataCleaner, clean_messages
+
+# Message fragments used to build the synthetic channel history
+WORDS = [
+    "Paracetamol", "500mg", "tablets", "available", "now", "በቅናሽ", "ዋጋ", "መድሃኒት",
+    "Vitamin", "C", "1000mg", "call", "0911234567", "Amoxicillin", "capsules", "ለልጆች"
+]
+EMOJIS = ["😊", "💊", "🔥", "✅", "❤", "📞"]
+LINKS = ["https://youtu.be/dQw4w9WgXcQ", "https://www.youtube.com/watch?v=abc123"]
+
+def make_synthetic_frame(rows, seed=42):
+    """ Build a synthetic merged-channel DataFrame with emojis, links, newlines and missing messages. """
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(rows):
+        if rng.random() < 0.05:
+            messages.append(None)
+            continue
+        # Channel posts are typically a few lines of 20-80 words
+        parts = rng.choices(WORDS, k=rng.randint(20, 80))
+        if rng.random() < 0.5:
+            parts.insert(rng.randrange(len(parts)), rng.choice(EMOJIS))
+        if rng.random() < 0.1:
+            parts.append(rng.choice(LINKS))
+        for _ in range(rng.randint(0, 3)):
+            parts.insert(rng.randrange(len(parts)), "\n\n")
+        messages.append(" ".join(parts))
+    return pd.DataFrame({
+        "Channel Title": "Synthetic Pharmacy",
+        "Channel Username": "@synthetic",
+        "ID": range(rows),
+        "Message": messages,
+        "Date": "2025-02-02 10:00:00+00:00"
+    })
+
+def legacy_clean_messages(messages):
+    """ The original five Series.apply passes, kept here as the benchmark baseline. """
+    youtube_pattern = r"https?://(?:www\.)?(?:youtube\.com|youtu\.be)/[^\s]+"
+    text = messages.fillna("No Message")
+    text = text.apply(lambda t: "No Message" if pd.isna(t) else re.sub(r'\n+', ' ', t).strip())
+    emojis = text.apply(lambda t: ''.join(c for c in t if c in emoji.EMOJI_DATA) or "No emoji")
+    text = text.apply(lambda t: ''.join(c for c in t if c not in emoji.EMOJI_DATA))
+    links = text.apply(lambda t: ', '.join(re.findall(youtube_pattern, t)) or "No YouTube link")
+    text = text.apply(lambda t: re.sub(youtube_pattern, '', t).strip())
+    return pd.DataFrame({"message": text, "emoji_used": emojis, "youtube_links": links})
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the clean_medical_data message engine against the legacy apply chain.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for clean_dataframe")
+    parser.add_argument("--chunksize", type=int, default=None, help="Rows per partition when --workers > 1")
+    args = parser.parse_args()
+
+    df = make_synthetic_frame(args.rows)
+
+    start = time.perf_counter()
+    legacy = legacy_clean_messages(df["Message"])
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    current = clean_messages(df["Message"])
+    current_seconds = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(current, legacy, check_dtype=False)
+
+    start = time.perf_counter()
+    MedicalDataCleaner(df=df).clean_dataframe(workers=args.workers, chunksize=args.chunksize)
+    dataframe_seconds = time.perf_counter() - start
+
+    print(f"rows:             {args.rows}")
+    print(f"legacy messages:  {legacy_seconds:.2f}s ({args.rows / legacy_seconds:,.0f} rows/s)")
+    print(f"clean_messages:   {current_seconds:.2f}s ({args.rows / current_seconds:,.0f} rows/s)")
+    print(f"speedup:          {legacy_seconds / current_seconds:.1f}x")
+    print(f"clean_dataframe:  {dataframe_seconds:.2f}s end to end with {args.workers} worker(s) ({args.rows / dataframe_seconds:,.0f} rows/s)")
+
+if __name__ == "__main__":
+    main()
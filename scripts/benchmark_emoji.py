@@ -0,0 +1,62 @@
+import argparse
+import re
+import time
+import emoji
+from emoji_matcher import EMOJI_SEQUENCES, character_class, emoji_frequencies, split_emojis
+from synthetic_data import make_message_pool
+
+def legacy_split(text):
+    """ The original two passes: a membership test on emoji.EMOJI_DATA per character, once to extract and once to remove. """
+    found = ''.join(c for c in text if c in emoji.EMOJI_DATA)
+    return found, ''.join(c for c in text if c not in emoji.EMOJI_DATA)
+
+# The single-codepoint character class clean_medical_data used before emoji_matcher
+CODEPOINT_PATTERN = re.compile("[" + character_class(sorted(ord(c) for c in EMOJI_SEQUENCES if len(c) == 1)) + "]+")
+
+def codepoint_class_split(text):
+    return ''.join(CODEPOINT_PATTERN.findall(text)), CODEPOINT_PATTERN.sub('', text)
+
+# Every sequence in one alternation, longest first; the engine tries the alternatives one by one at each position
+ALTERNATION_PATTERN = re.compile("|".join(re.escape(s) for s in sorted(EMOJI_SEQUENCES, key=len, reverse=True)))
+
+def alternation_split(text):
+    return ''.join(ALTERNATION_PATTERN.findall(text)), ALTERNATION_PATTERN.sub('', text)
+
+def matcher_split(text):
+    found, stripped = split_emojis(text)
+    return ''.join(found), stripped
+
+IMPLEMENTATIONS = {
+    'legacy EMOJI_DATA loop': legacy_split,
+    'codepoint class regex': codepoint_class_split,
+    'alternation regex': alternation_split,
+    'emoji_matcher': matcher_split
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark emoji extraction and removal against the per-character implementations.")
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--alternation-messages", type=int, default=2_000, help="Messages for the (slow) alternation regex")
+    args = parser.parse_args()
+
+    messages = list(make_message_pool(args.messages))
+    expected = [matcher_split(text) for text in messages]
+
+    print(f"{'implementation':<26}{'messages/s':>14}{'chars/s':>16}{'differs':>10}")
+    for name, split in IMPLEMENTATIONS.items():
+        sample = messages[:args.alternation_messages] if split is alternation_split else messages
+        start = time.perf_counter()
+        results = [split(text) for text in sample]
+        seconds = time.perf_counter() - start
+        characters = sum(map(len, sample))
+        # Messages where the result differs from emoji_matcher, i.e. a sequence was split into fragments or missed
+        differs = sum(result != reference for result, reference in zip(results, expected))
+        print(f"{name:<26}{len(sample) / seconds:>14,.0f}{characters / seconds:>16,.0f}{differs / len(sample):>10.1%}")
+
+    start = time.perf_counter()
+    counts = emoji_frequencies(messages)
+    seconds = time.perf_counter() - start
+    print(f"\nemoji_frequencies: {len(messages) / seconds:,.0f} messages/s, top 5: {counts.most_common(5)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import io
+import time
+import pandas as pd
+from sqlalchemy import create_engine
+from database_setup import get_db_connection
+from product_extraction import default_matcher, extract_product_info
+from synthetic_data import make_message_pool
+
+# The extraction transform_medical_data.sql ran in Postgres before product_extraction.py
+SQL_EXTRACTION_QUERY = r"""
+CREATE TEMP TABLE sql_extracted AS
+SELECT
+    id,
+    CASE
+        WHEN message ~ '[A-Za-z]{3,}' THEN TRIM(SUBSTRING(message FROM '([A-Za-z ]{3,})'))
+        ELSE NULL
+    END AS product_name,
+    CASE
+        WHEN message ~ '\d{1,3}\s?[A-Za-z]*' THEN TRIM(SUBSTRING(message FROM '(\d{1,3}\s?[A-Za-z]*)'))
+        ELSE NULL
+    END AS usage_info
+FROM bench_messages;
+"""
+
+def load_messages(connection, messages):
+    """ COPY the messages into a temp table bench_messages (id, message). """
+    cursor = connection.cursor()
+    cursor.execute("CREATE TEMP TABLE bench_messages (id BIGINT, message TEXT)")
+    buffer = io.StringIO()
+    pd.DataFrame({'id': range(len(messages)), 'message': messages}).to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    cursor.copy_expert("COPY bench_messages (id, message) FROM STDIN WITH (FORMAT csv)", buffer)
+    cursor.execute("ANALYZE bench_messages")
+    return cursor
+
+def time_sql(connection, repeat):
+    """ Run the SQL extraction repeat times; return the best time in seconds and the extracted frame. """
+    cursor = connection.cursor()
+    timings = []
+    for _ in range(repeat):
+        cursor.execute("DROP TABLE IF EXISTS sql_extracted")
+        start = time.perf_counter()
+        cursor.execute(SQL_EXTRACTION_QUERY)
+        timings.append(time.perf_counter() - start)
+    cursor.execute("SELECT product_name, usage_info FROM sql_extracted ORDER BY id")
+    return min(timings), pd.DataFrame(cursor.fetchall(), columns=['product_name', 'usage_info'])
+
+def time_python(messages, repeat):
+    """ Run extract_product_info repeat times; return the best time in seconds and the extracted frame. """
+    default_matcher()  # Built once per process; not part of the per-message cost
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extracted = extract_product_info(messages)
+        timings.append(time.perf_counter() - start)
+    return min(timings), extracted
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare product/usage extraction in Python with the former SQL regex extraction on the same messages.")
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per implementation (best reported)")
+    parser.add_argument("--url", help="Postgres URL; defaults to the DB_* settings used by database_setup")
+    args = parser.parse_args()
+
+    messages = pd.Series(list(make_message_pool(args.messages)))
+    python_seconds, python_extracted = time_python(messages, args.repeat)
+
+    engine = create_engine(args.url) if args.url else get_db_connection()
+    connection = engine.raw_connection()
+    try:
+        load_messages(connection, messages.tolist())
+        sql_seconds, sql_extracted = time_sql(connection, args.repeat)
+    finally:
+        connection.rollback()
+        connection.close()
+        engine.dispose()
+
+    print(f"{'implementation':<22}{'seconds':>10}{'messages/s':>14}")
+    for name, seconds in (('python (dictionary)', python_seconds), ('postgres regex', sql_seconds)):
+        print(f"{name:<22}{seconds:>10.3f}{len(messages) / seconds:>14,.0f}")
+
+    # The SQL took the first Latin run as the product; the dictionary also finds Amharic names and canonical spellings
+    same_usage = (python_extracted['usage_info'].fillna('') == sql_extracted['usage_info'].fillna('')).mean()
+    same_product = (python_extracted['product_name'].fillna('') == sql_extracted['product_name'].fillna('')).mean()
+    found = python_extracted['product_name'].notna().mean(), sql_extracted['product_name'].notna().mean()
+    print(f"\nusage_info identical: {same_usage:.1%}, product_name identical: {same_product:.1%}")
+    print(f"product_name found: python {found[0]:.1%}, postgres {found[1]:.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import time
+import numpy as np
+from near_duplicates import NearDuplicateIndex, DEFAULT_THRESHOLD, encode_texts
+from synthetic_data import make_message_pool
+
+def make_reposts(messages, count, rng):
+    """ Return (index of the original, text) of count reposts, each with one word replaced or an emoji added. """
+    originals = rng.choice(len(messages), count, replace=False)
+    reposts = []
+    for original in originals.tolist():
+        words = messages[original].split(" ")
+        if rng.random() < 0.5:
+            words[rng.integers(len(words))] = "ቅናሽ"
+        else:
+            words.append("🔥")
+        reposts.append(" ".join(words))
+    return originals, reposts
+
+def time_pairwise(index, messages, threshold):
+    """ Compare every pair of MinHash signatures; return (seconds, near-duplicate pairs found). """
+    start = time.perf_counter()
+    signatures = index.signatures_of(*encode_texts(messages))
+    pairs = 0
+    for row in range(1, len(signatures)):
+        similarity = (signatures[:row] == signatures[row]).mean(axis=1)
+        pairs += int((similarity >= threshold).sum())
+    return time.perf_counter() - start, pairs
+
+def main():
+    parser = argparse.ArgumentParser(description="Time MinHash/LSH near-duplicate clustering and its recall on synthetic reposts.")
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--repost-rate", type=float, default=0.1, help="Share of messages reposted with a one-word edit")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--pairwise", type=int, default=5_000, help="Messages in the all-pairs comparison baseline")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    messages = list(make_message_pool(args.messages))
+    originals, reposts = make_reposts(messages, int(args.messages * args.repost_rate), rng)
+
+    index = NearDuplicateIndex(args.threshold)
+    start = time.perf_counter()
+    original_ids = index.assign(np.arange(len(messages)), messages)
+    first_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    repost_ids = index.assign(len(messages) + np.arange(len(reposts)), reposts)
+    incremental_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    index.assign(np.arange(len(messages)), messages)
+    rerun_seconds = time.perf_counter() - start
+
+    pairwise_seconds, pairs = time_pairwise(NearDuplicateIndex(args.threshold), messages[:args.pairwise], args.threshold)
+    projected = pairwise_seconds * (len(messages) / args.pairwise) ** 2
+
+    print(f"LSH bands x rows: {index.bands} x {index.rows}, {index.num_perm} permutations")
+    print(f"{'step':<28}{'messages':>10}{'seconds':>10}{'messages/s':>14}")
+    for name, count, seconds in (
+        ('first run', len(messages), first_seconds),
+        ('incremental reposts', len(reposts), incremental_seconds),
+        ('rerun, all keys known', len(messages), rerun_seconds)
+    ):
+        print(f"{name:<28}{count:>10,}{seconds:>10.3f}{count / seconds:>14,.0f}")
+    print(f"{'all pairs (baseline)':<28}{args.pairwise:>10,}{pairwise_seconds:>10.3f}{args.pairwise / pairwise_seconds:>14,.0f}"
+          f"  ~{projected:,.0f} s projected for {len(messages):,}")
+
+    recall = (repost_ids == original_ids[originals]).mean()
+    print(f"\nreposts matched to their original: {recall:.1%}")
+    print(f"clusters: {len(np.unique(original_ids[original_ids >= 0])):,} for {len(messages):,} originals"
+          f" ({pairs} near-duplicate pairs among the first {args.pairwise:,})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import argparse
+import statistics
+import time
+from sqlalchemy import create_engine, text
+from database_setup import get_db_connection, create_table, CREATE_UNPARTITIONED_TABLE_QUERY
+
+# Synthetic history generated server side: channels post evenly over the date range
+GENERATE_QUERY = """
+INSERT INTO telegram_medical_messages (channel_title, channel_username, message_id, message, message_date)
+SELECT
+    'Channel ' || (g % :channels),
+    '@channel_' || (g % :channels),
+    g,
+    'Paracetamol 500mg tablets available ' || md5(g::text),
+    CAST(:start AS TIMESTAMP) + (g::float / :rows) * (:months * INTERVAL '1 month')
+FROM generate_series(1, :rows) AS g;
+"""
+
+# Representative warehouse queries; the parameters are filled from the run settings
+QUERIES = {
+    "channel_week": """
+        SELECT COUNT(*) FROM telegram_medical_messages
+        WHERE channel_username = :channel
+          AND message_date >= CAST(:start AS TIMESTAMP) + INTERVAL '200 days'
+          AND message_date < CAST(:start AS TIMESTAMP) + INTERVAL '207 days'
+    """,
+    "month_by_channel": """
+        SELECT channel_username, COUNT(*) FROM telegram_medical_messages
+        WHERE message_date >= CAST(:start AS TIMESTAMP) + INTERVAL '6 months'
+          AND message_date < CAST(:start AS TIMESTAMP) + INTERVAL '7 months'
+        GROUP BY channel_username
+    """,
+    "channel_latest_100": """
+        SELECT * FROM telegram_medical_messages
+        WHERE channel_username = :channel
+        ORDER BY message_date DESC LIMIT 100
+    """,
+    "message_lookup": """
+        SELECT * FROM telegram_medical_messages
+        WHERE channel_username = :lookup_channel AND message_id = :message_id
+    """
+}
+
+def schema_engine(database_url, schema):
+    """ Return an engine whose unqualified table names resolve inside the given schema. """
+    return create_engine(database_url, connect_args={"options": f"-csearch_path={schema}"})
+
+def load_layout(database_url, schema, partitioned, args):
+    """ Create one layout in its own schema and fill it with the synthetic history. """
+    with create_engine(database_url).begin() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {schema}"))
+
+    engine = schema_engine(database_url, schema)
+    if partitioned:
+        create_table(engine, months_ahead=0)
+        with engine.begin() as connection:
+            connection.execute(
+                text("SELECT create_message_partitions(CAST(:start AS TIMESTAMP), "
+                     "CAST(:start AS TIMESTAMP) + :months * INTERVAL '1 month')"),
+                {"start": args.start, "months": args.months}
+            )
+    else:
+        with engine.begin() as connection:
+            connection.execute(text(CREATE_UNPARTITIONED_TABLE_QUERY))  # Original layout: no extra indexes
+
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        connection.execute(text(GENERATE_QUERY), {
+            "rows": args.rows, "channels": args.channels, "months": args.months, "start": args.start
+        })
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("ANALYZE telegram_medical_messages"))
+    print(f"{schema}: loaded {args.rows:,} rows in {time.perf_counter() - start:.1f}s")
+    return engine
+
+def time_queries(engine, args):
+    """ Return the median wall time in milliseconds of each query. """
+    message_id = args.rows // 2
+    params = {
+        "start": args.start,
+        "channel": "@channel_7",
+        "lookup_channel": f"@channel_{message_id % args.channels}",
+        "message_id": message_id
+    }
+    timings = {}
+    with engine.connect() as connection:
+        for name, query in QUERIES.items():
+            connection.execute(text(query), params).fetchall()  # Warm the cache
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                connection.execute(text(query), params).fetchall()
+                samples.append((time.perf_counter() - start) * 1000)
+            timings[name] = statistics.median(samples)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Time representative warehouse queries on the legacy and partitioned layouts.")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--channels", type=int, default=20)
+    parser.add_argument("--months", type=int, default=24, help="Months of history the rows are spread over")
+    parser.add_argument("--start", default="2023-01-01", help="Date of the first synthetic message")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per query (median reported)")
+    parser.add_argument("--url", help="Database URL; defaults to the DB_* settings used by database_setup")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark schemas afterwards")
+    args = parser.parse_args()
+
+    database_url = args.url or get_db_connection().url.render_as_string(hide_password=False)
+    layouts = {"bench_legacy": False, "bench_partitioned": True}
+    results = {}
+    for schema, partitioned in layouts.items():
+        engine = load_layout(database_url, schema, partitioned, args)
+        results[schema] = time_queries(engine, args)
+        engine.dispose()
+
+    print(f"\n{'query':<20}{'legacy ms':>12}{'partitioned ms':>16}{'speedup':>10}")
+    for name in QUERIES:
+        legacy, partitioned = results["bench_legacy"][name], results["bench_partitioned"][name]
+        print(f"{name:<20}{legacy:>12.2f}{partitioned:>16.2f}{legacy / partitioned:>9.1f}x")
+
+    if not args.keep:
+        with create_engine(database_url).begin() as connection:
+            for schema in layouts:
+                connection.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import statistics
+import time
+from sqlalchemy import create_engine, text
+from database_setup import get_db_connection, SEARCH_CONFIG
+from benchmark_queries import load_layout
+
+# Every synthetic message carries md5(message_id), so searching one row's hash matches exactly one message
+SEARCH_QUERIES = {
+    # What analysts ran before: a sequential scan of every partition
+    "ilike": """
+        SELECT id, message FROM telegram_medical_messages
+        WHERE message ILIKE '%' || :term || '%'
+        ORDER BY id LIMIT 20
+    """,
+    # The /messages/search query: GIN index on search_vector, ranked
+    "tsvector_ranked": f"""
+        SELECT id, message, ts_rank(search_vector, websearch_to_tsquery('{SEARCH_CONFIG}', :term)) AS rank
+        FROM telegram_medical_messages
+        WHERE search_vector @@ websearch_to_tsquery('{SEARCH_CONFIG}', :term)
+        ORDER BY rank DESC, id LIMIT 21
+    """
+}
+
+def time_search(engine, rows, repeat):
+    """ Return the median wall time in milliseconds of each search query for a selective term. """
+    timings = {}
+    with engine.connect() as connection:
+        term = connection.execute(text("SELECT md5(CAST(:g AS TEXT))"), {"g": rows // 2}).scalar()
+        for name, query in SEARCH_QUERIES.items():
+            found = len(connection.execute(text(query), {"term": term}).fetchall())  # Warm the cache
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                connection.execute(text(query), {"term": term}).fetchall()
+                samples.append((time.perf_counter() - start) * 1000)
+            timings[name] = (statistics.median(samples), found)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Time message search with ILIKE and with the GIN-indexed search_vector as the table grows.")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument("--channels", type=int, default=20)
+    parser.add_argument("--months", type=int, default=24, help="Months of history the rows are spread over")
+    parser.add_argument("--start", default="2023-01-01", help="Date of the first synthetic message")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per query (median reported)")
+    parser.add_argument("--url", help="Database URL; defaults to the DB_* settings used by database_setup")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark schema afterwards")
+    args = parser.parse_args()
+
+    database_url = args.url or get_db_connection().url.render_as_string(hide_password=False)
+    results = {}
+    for rows in args.sizes:
+        args.rows = rows
+        engine = load_layout(database_url, "bench_search", True, args)
+        results[rows] = time_search(engine, rows, args.repeat)
+        engine.dispose()
+
+    print(f"\n{'rows':>12}{'ilike ms':>12}{'tsvector ms':>14}{'hits':>6}")
+    for rows, timings in results.items():
+        print(f"{rows:>12,}{timings['ilike'][0]:>12.2f}{timings['tsvector_ranked'][0]:>14.2f}{timings['tsvector_ranked'][1]:>6}")
+
+    if not args.keep:
+        with create_engine(database_url).begin() as connection:
+            connection.execute(text("DROP SCHEMA IF EXISTS bench_search CASCADE"))
+
+if __name__ == "__main__":
+    main()
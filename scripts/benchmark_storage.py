@@ -0,0 +1,76 @@
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from benchmark_cleaning import make_synthetic_frame
+from parquet_store import write_layer, read_layer
+
+# Channels the synthetic rows are spread over, as in ../config/channels.yaml
+CHANNELS = ['@DoctorsET', '@CheMed123', '@lobelia4cosmetics', '@yetenaweg', '@EAHCI']
+
+def make_channel_frame(rows, months=24, seed=42):
+    """ Synthetic merged layer with rows spread over several channels and months of history. """
+    df = make_synthetic_frame(rows, seed=seed)
+    rng = np.random.default_rng(seed)
+    df['Channel Username'] = rng.choice(CHANNELS, rows)
+    df['Channel Title'] = df['Channel Username'].str.lstrip('@')
+    seconds = rng.integers(0, months * 30 * 86400, rows)
+    df['Date'] = (pd.Timestamp('2023-01-01', tz='UTC') + pd.to_timedelta(seconds, unit='s')).astype(str)
+    return df
+
+def directory_size(path):
+    """ Total size in bytes of every file below path. """
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare CSV and the Parquet layer on size and load time.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = make_channel_frame(args.rows)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, 'merged_medical_data.csv')
+        _, csv_write = timed(lambda: df.to_csv(csv_path, index=False))
+        _, parquet_write = timed(lambda: write_layer(df, 'merged', base_dir=tmp_dir))
+        csv_size, parquet_size = os.path.getsize(csv_path), directory_size(os.path.join(tmp_dir, 'merged'))
+
+        def read_csv(**kwargs):
+            loaded = pd.read_csv(csv_path, **kwargs)
+            loaded['Date'] = pd.to_datetime(loaded['Date'], errors='coerce', utc=True)
+            return loaded
+
+        # Full load, a stats projection, and one channel for one month
+        cases = {
+            'full load': (
+                lambda: read_csv(),
+                lambda: read_layer('merged', base_dir=tmp_dir)
+            ),
+            'channel+date columns': (
+                lambda: read_csv(usecols=['Channel Username', 'Date']),
+                lambda: read_layer('merged', columns=['Channel Username', 'Date'], base_dir=tmp_dir)
+            ),
+            'one channel, one month': (
+                lambda: (lambda frame: frame[(frame['Channel Username'] == '@CheMed123')
+                                             & (frame['Date'].dt.strftime('%Y-%m') == '2024-03')])(read_csv()),
+                lambda: read_layer('merged', filters=[('channel', '=', 'CheMed123'), ('month', '=', '2024-03')], base_dir=tmp_dir)
+            )
+        }
+
+        print(f"rows:          {args.rows:,}")
+        print(f"disk:          csv {csv_size / 1e6:.1f} MB, parquet {parquet_size / 1e6:.1f} MB ({csv_size / parquet_size:.1f}x smaller)")
+        print(f"write:         csv {csv_write:.2f}s, parquet {parquet_write:.2f}s")
+        for name, (csv_reader, parquet_reader) in cases.items():
+            csv_frame, csv_seconds = timed(csv_reader)
+            parquet_frame, parquet_seconds = timed(parquet_reader)
+            assert len(csv_frame) == len(parquet_frame)
+            print(f"{name + ':':<24} csv {csv_seconds:.2f}s, parquet {parquet_seconds:.3f}s ({csv_seconds / parquet_seconds:.1f}x faster)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from sqlalchemy import create_engine, text
+from synthetic_data import CHANNELS, generate_channel_data, write_channel_csvs, write_registry
+from instrumentation import peak_rss_bytes
+from clean_medical_data import MedicalDataCleaner, clean_messages
+from product_extraction import extract_product_info
+from merge_medical_data import merge_incremental
+from database_setup import create_table, insert_data
+
+# Results of every run, appended so a run can be compared with earlier commits
+HISTORY_PATH = '../benchmarks/history.json'
+BENCHMARKS = ['clean', 'merge', 'insert', 'api']
+# A benchmark is reported as a regression when it is this much slower than the previous comparable run
+REGRESSION_THRESHOLD = 0.10
+# Detections loaded into the API benchmark database at most, however many rows the run uses
+API_MAX_DETECTIONS = 100_000
+
+def measure(function, rows):
+    """ Run function once and return its timing record along with its result. """
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    return {
+        'seconds': round(seconds, 4),
+        'rows': rows,
+        'rows_per_sec': round(rows / seconds, 1) if seconds > 0 else None,
+        'peak_rss_bytes': peak_rss_bytes()
+    }, result
+
+def bench_clean(raw_df, context):
+    """ MedicalDataCleaner.clean_dataframe on the raw frame, then its two message stages alone, in one process.
+
+    Keeps the cleaned frame for the insert benchmark.
+    """
+    cleaner = MedicalDataCleaner(df=raw_df)
+    record, _ = measure(lambda: cleaner.clean_dataframe(workers=context['workers']), len(raw_df))
+    context['cleaned_df'] = cleaner.df
+    messages_record, cleaned = measure(lambda: clean_messages(raw_df['Message']), len(raw_df))
+    extraction_record, _ = measure(lambda: extract_product_info(cleaned['message']), len(raw_df))
+    return {'clean_dataframe': record, 'clean_messages': messages_record, 'extract_product_info': extraction_record}
+
+def bench_merge(raw_df, context):
+    """ Full merge of per-channel CSVs into Parquet, then a no-change incremental run. """
+    work_dir = context['work_dir']
+    data_dir, base_dir = os.path.join(work_dir, 'raw_data'), os.path.join(work_dir, 'parquet')
+    manifest_path, registry_path = os.path.join(work_dir, 'merge_manifest.json'), os.path.join(work_dir, 'channels.yaml')
+    write_channel_csvs(raw_df, data_dir)
+    write_registry(sorted(raw_df['Channel Username'].unique()), registry_path)
+
+    merge = lambda: merge_incremental(data_dir, base_dir, manifest_path, registry_path)
+    full, _ = measure(merge, len(raw_df))
+    unchanged, _ = measure(merge, 0)
+    return {'merge_full': full, 'merge_unchanged': unchanged}
+
+def bench_insert(raw_df, context):
+    """ insert_data of the cleaned frame into an empty table (SQLite file, or a scratch Postgres schema). """
+    cleaned_df = context.get('cleaned_df')
+    if cleaned_df is None:
+        cleaner = MedicalDataCleaner(df=raw_df)
+        cleaner.clean_dataframe()
+        cleaned_df = cleaner.df
+
+    database_url = context['database_url']
+    if database_url:
+        from benchmark_queries import schema_engine
+        with create_engine(database_url).begin() as connection:
+            connection.execute(text("DROP SCHEMA IF EXISTS bench_suite CASCADE"))
+            connection.execute(text("CREATE SCHEMA bench_suite"))
+        engine = schema_engine(database_url, 'bench_suite')
+    else:
+        engine = create_engine(f"sqlite:///{os.path.join(context['work_dir'], 'insert.sqlite')}")
+
+    try:
+        create_table(engine)
+        record, (inserted, skipped) = measure(lambda: insert_data(engine, cleaned_df.copy()), len(cleaned_df))
+        record.update(inserted=inserted, skipped=skipped)
+        return {'insert_data': record}
+    finally:
+        engine.dispose()
+        if database_url:
+            with create_engine(database_url).begin() as connection:
+                connection.execute(text("DROP SCHEMA IF EXISTS bench_suite CASCADE"))
+
+def latency_record(latencies):
+    """ Timing record of a series of request latencies in milliseconds. """
+    seconds = sum(latencies) / 1000
+    return {
+        'seconds': round(seconds, 4),
+        'rows': len(latencies),
+        'rows_per_sec': round(len(latencies) / seconds, 1),
+        'p50_ms': round(statistics.median(latencies), 3),
+        'p95_ms': round(statistics.quantiles(latencies, n=20)[-1], 3),
+        'peak_rss_bytes': peak_rss_bytes()
+    }
+
+def bench_api(raw_df, context, requests=200):
+    """ FastAPI endpoints through TestClient on a scratch SQLite database: batch upload, keyset scan, filtered reads.
+
+    Filtered reads are timed twice: with the response cache cleared before every
+    request, so each one queries the database, and repeating one request, so
+    every request after the first is served from the cache.
+    """
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from fastapi.testclient import TestClient
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from fast_api.database import create_engine as create_async_engine, get_db
+    from fast_api.cache import TTLCache
+    from fast_api.main import app, create_schema, response_cache
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(context['work_dir'], 'api.sqlite')}")
+    sessions = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async def setup():
+        async with engine.begin() as connection:
+            await connection.run_sync(create_schema)
+    asyncio.run(setup())
+
+    async def get_bench_db():
+        async with sessions() as db:
+            yield db
+
+    detections = [
+        {
+            'bounding_box': [i % 640, i % 480, i % 640 + 50, i % 480 + 50],
+            'confidence': (i % 100) / 100,
+            'class_id': i % 5,
+            'class_name': ['bottle', 'person', 'cup', 'cell phone', 'book'][i % 5],
+            'image_path': f'images/{i // 3}.jpg'
+        }
+        for i in range(min(len(raw_df), API_MAX_DETECTIONS))
+    ]
+
+    # No `with` block: the app's startup hook would create tables through its own engine,
+    # which points at the configured database rather than the scratch one
+    app.dependency_overrides[get_db] = get_bench_db
+    # A private in-process cache, whatever CACHE_URL points at, so runs start empty and stay comparable
+    backend, response_cache.backend = response_cache.backend, TTLCache()
+    client = TestClient(app)
+    try:
+        def upload():
+            for start in range(0, len(detections), 1000):
+                response = client.post('/detection_data/batch', json=detections[start:start + 1000])
+                response.raise_for_status()
+        upload_record, _ = measure(upload, len(detections))
+
+        def scan():
+            cursor, rows = None, 0
+            while True:
+                params = {'limit': 1000, **({'cursor': cursor} if cursor else {})}
+                page = client.get('/detection_data/', params=params).json()
+                rows += len(page['items'])
+                cursor = page['next_cursor']
+                if not cursor:
+                    return rows
+        scan_record, scanned = measure(scan, len(detections))
+        scan_record['rows'] = scanned
+
+        def filtered_pages(clear_cache):
+            latencies = []
+            for i in range(requests):
+                if clear_cache:
+                    asyncio.run(response_cache.invalidate())
+                start = time.perf_counter()
+                client.get('/detection_data/', params={'class_name': 'cup', 'min_confidence': 0.5, 'limit': 50}).raise_for_status()
+                latencies.append((time.perf_counter() - start) * 1000)
+            return latencies
+        filtered_record = latency_record(filtered_pages(clear_cache=True))
+        hits = response_cache.hits
+        cached_record = latency_record(filtered_pages(clear_cache=False))
+        cached_record['cache_hits'] = response_cache.hits - hits
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        response_cache.backend = backend
+        asyncio.run(engine.dispose())
+    return {
+        'api_batch_upload': upload_record,
+        'api_keyset_scan': scan_record,
+        'api_filtered_page': filtered_record,
+        'api_filtered_page_cached': cached_record
+    }
+
+BENCHMARK_FUNCTIONS = {'clean': bench_clean, 'merge': bench_merge, 'insert': bench_insert, 'api': bench_api}
+
+def git_revision():
+    """ Return (short commit hash, dirty flag) of the working tree, or (None, None) outside git. """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+def run_suite(rows, benchmarks=BENCHMARKS, database_url=None, workers=1, seed=42):
+    """ Generate rows of synthetic channel data and run the selected benchmarks on it. Returns the run record. """
+    commit, dirty = git_revision()
+    run = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'dirty': dirty,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'rows': rows,
+        'backend': 'postgresql' if database_url else 'sqlite',
+        'workers': workers,
+        'results': {}
+    }
+    generate_record, raw_df = measure(lambda: generate_channel_data(rows, channels=CHANNELS, seed=seed), rows)
+    run['results']['generate'] = generate_record
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        context = {'work_dir': work_dir, 'database_url': database_url, 'workers': workers}
+        for name in benchmarks:
+            run['results'].update(BENCHMARK_FUNCTIONS[name](raw_df, context))
+    return run
+
+def load_history(history_path=HISTORY_PATH):
+    """ Return the list of earlier run records. """
+    try:
+        with open(history_path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+def append_history(run, history_path=HISTORY_PATH):
+    """ Append a run record to the history file. """
+    history = load_history(history_path)
+    history.append(run)
+    os.makedirs(os.path.dirname(history_path) or '.', exist_ok=True)
+    with open(history_path, 'w') as f:
+        json.dump(history, f, indent=2)
+
+def compare_runs(run, baseline, threshold=REGRESSION_THRESHOLD):
+    """ Return (name, baseline seconds, run seconds, ratio, regressed) for every benchmark in both runs. """
+    rows = []
+    for name, record in run['results'].items():
+        previous = baseline['results'].get(name)
+        if not previous or not previous.get('seconds') or record.get('seconds') is None:
+            continue
+        ratio = record['seconds'] / previous['seconds']
+        rows.append((name, previous['seconds'], record['seconds'], ratio, ratio > 1 + threshold))
+    return rows
+
+def find_baseline(run, history):
+    """ Return the latest earlier run with the same size, backend and workers, or None. """
+    for previous in reversed(history):
+        if all(previous.get(key) == run[key] for key in ('rows', 'backend', 'workers')):
+            return previous
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cleaning, merging, loading and the API on synthetic Telegram data.")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[10_000, 100_000], help="Row counts to run, e.g. 10000 1000000 10000000")
+    parser.add_argument("--only", nargs='+', choices=BENCHMARKS, default=BENCHMARKS, help="Benchmarks to run")
+    parser.add_argument("--database-url", help="Postgres URL for the insert benchmark (default: a scratch SQLite file)")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for clean_dataframe")
+    parser.add_argument("--history", default=HISTORY_PATH, help="JSON file the results are appended to")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Slowdown ratio reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 when a benchmark regressed")
+    args = parser.parse_args()
+
+    regressed = False
+    for rows in args.sizes:
+        run = run_suite(rows, args.only, args.database_url, args.workers)
+        baseline = find_baseline(run, load_history(args.history))
+        append_history(run, args.history)
+
+        print(f"\n{rows:,} rows on {run['backend']} (commit {run['commit']}{' +dirty' if run['dirty'] else ''})")
+        print(f"{'benchmark':<26}{'seconds':>10}{'rows/s':>14}")
+        for name, record in run['results'].items():
+            rate = f"{record['rows_per_sec']:,.0f}" if record.get('rows_per_sec') else '-'
+            print(f"{name:<26}{record['seconds']:>10.3f}{rate:>14}")
+
+        if baseline:
+            print(f"\ncompared with {baseline['commit']} ({baseline['timestamp']}):")
+            for name, before, after, ratio, is_regression in compare_runs(run, baseline, args.threshold):
+                flag = '  REGRESSION' if is_regression else ''
+                print(f"{name:<26}{before:>10.3f} -> {after:.3f}s ({ratio:.2f}x){flag}")
+                regressed = regressed or is_regression
+
+    if regressed and args.fail_on_regression:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
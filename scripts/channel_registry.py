@@ -0,0 +1,113 @@
+import heapq
+import json
+import os
+from datetime import datetime, timedelta, timezone
+import yaml
+
+# Channel registry shared by the scraping and merging stages
+REGISTRY_PATH = '../config/channels.yaml'
+# Last successful run of every channel, per stage
+SCHEDULE_PATH = '../src/data/last_id/channel_schedule.json'
+# backfill_limit value that fetches a channel's whole remaining history in one scrape
+UNLIMITED_BACKFILL = 'all'
+
+class Channel:
+    """ One registered Telegram channel and its per-channel settings. """
+
+    def __init__(self, username, title=None, scrape_interval_minutes=60, fetch_media=False,
+                 image_dir=None, priority=1, backfill_limit=None, enabled=True):
+        if not isinstance(username, str) or not username.startswith('@') or len(username) < 2:
+            raise ValueError(f"Channel username must start with '@', got {username!r}")
+        if backfill_limit not in (None, UNLIMITED_BACKFILL) and not (isinstance(backfill_limit, int) and backfill_limit > 0):
+            raise ValueError(f"backfill_limit of {username} must be a positive number or '{UNLIMITED_BACKFILL}', got {backfill_limit!r}")
+        self.username = username
+        self.name = username[1:]
+        self.title = title or self.name
+        self.scrape_interval = timedelta(minutes=scrape_interval_minutes)
+        self.fetch_media = bool(fetch_media)
+        self.image_dir = image_dir or f"../src/data/images/{self.name}_images"
+        self.priority = priority
+        self.backfill_limit = backfill_limit
+        self.enabled = bool(enabled)
+
+    @property
+    def csv_file(self):
+        """ Name of the channel's raw CSV, as written by telegram_scrape.py. """
+        return f"{self.name}_data.csv"
+
+    def __repr__(self):
+        return f"Channel({self.username!r})"
+
+def load_channels(path=REGISTRY_PATH, include_disabled=False):
+    """ Return the registered channels in file order, skipping disabled ones unless asked. """
+    with open(path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+
+    channels = []
+    for entry in config.get('channels') or []:
+        if isinstance(entry, str):
+            entry = {'username': entry}
+        try:
+            channels.append(Channel(**entry))
+        except TypeError as e:
+            raise ValueError(f"Invalid channel entry {entry!r} in '{path}': {e}")
+
+    usernames = [channel.username for channel in channels]
+    duplicates = sorted({username for username in usernames if usernames.count(username) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate channels in '{path}': {', '.join(duplicates)}")
+    return channels if include_disabled else [channel for channel in channels if channel.enabled]
+
+class ChannelScheduler:
+    """ Tracks when each channel last ran per stage and picks the channels that are due.
+
+    A channel is due once its scrape interval has passed since its last
+    successful run, so a run only pays for the channels whose interval has
+    elapsed rather than for the whole registry.
+    """
+
+    def __init__(self, path=SCHEDULE_PATH):
+        self.path = path
+        try:
+            with open(path, 'r') as f:
+                self.state = json.load(f)
+        except FileNotFoundError:
+            self.state = {}
+
+    def last_run(self, stage, channel):
+        """ Return the time of the channel's last successful run in a stage, or None. """
+        value = self.state.get(stage, {}).get(channel.username)
+        return datetime.fromisoformat(value) if value else None
+
+    def due(self, channels, stage, now=None, limit=None):
+        """ Return the channels due in a stage, highest priority first, then most overdue.
+
+        With limit, only that many channels are returned; the rest stay due for the next run.
+        """
+        now = now or datetime.now(timezone.utc)
+        candidates = []
+        for position, channel in enumerate(channels):
+            last_run = self.last_run(stage, channel)
+            next_run = last_run + channel.scrape_interval if last_run else datetime.min.replace(tzinfo=timezone.utc)
+            if next_run <= now:
+                candidates.append((-channel.priority, next_run, position, channel))
+        if limit is not None:
+            candidates = heapq.nsmallest(limit, candidates)
+        else:
+            candidates.sort()
+        return [channel for *_, channel in candidates]
+
+    def mark_run(self, stage, channel, when=None):
+        """ Record a successful run of the channel in a stage. """
+        when = when or datetime.now(timezone.utc)
+        self.state.setdefault(stage, {})[channel.username] = when.isoformat()
+
+    def save(self):
+        """ Atomically replace the schedule file so a crash never leaves it half written. """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
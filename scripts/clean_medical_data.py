@@ -1,8 +1,16 @@
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 import logging
 import re
 import os
-import emoji
+from concurrent.futures import ProcessPoolExecutor
+from instrumentation import track_stage
+from emoji_matcher import emoji_frequencies, emoji_spans, find_emojis, split_emojis, SEQUENCE_CLASS, SINGLE_EMOJI_CLASS
+from product_extraction import NO_MESSAGE, extract_product_info
+from near_duplicates import load_index, DEFAULT_THRESHOLD, SIGNATURES_PATH
+from parquet_store import read_layer, write_layer, PARQUET_DIR
 
 # Ensure logs folder exists
 os.makedirs("../logs", exist_ok=True)
@@ -17,10 +25,220 @@ logging.basicConfig(
     ]
 )
 
+# Separator used to scan a whole column as one string; stripped from messages beforehand
+MESSAGE_SEPARATOR = "\x00"
+
+YOUTUBE_PATTERN = re.compile(r"https?://(?:www\.)?(?:youtube\.com|youtu\.be)/[^\s]+")
+NEWLINE_PATTERN = re.compile(r"\n+")
+
+# RE2 patterns run over the whole column with pyarrow.compute. '\n\n*' equals NEWLINE_PATTERN but starts
+# with a literal, which RE2 finds with memchr: twice as fast as '\n+'
+ARROW_NEWLINE_PATTERN = r"\n\n*"
+ANY_EMOJI_PATTERN = f"[{SINGLE_EMOJI_CLASS}{SEQUENCE_CLASS}]"
+SINGLE_EMOJI_RUN_PATTERN = f"[{SINGLE_EMOJI_CLASS}]+"
+NOT_SINGLE_EMOJI_PATTERN = f"[^{SINGLE_EMOJI_CLASS}]+"
+SEQUENCE_PATTERN = f"[{SEQUENCE_CLASS}]"
+# Characters str.strip() removes, so the Arrow trim matches it exactly
+WHITESPACE = "".join(chr(c) for c in range(0x3001) if chr(c).isspace())
+
+NO_EMOJI = "No emoji"
+NO_YOUTUBE_LINK = "No YouTube link"
+
+def _split_youtube_links(texts):
+    """ Return (texts without their YouTube links, the links joined by ', ' or NO_YOUTUBE_LINK), two lists. """
+    cleaned, youtube_links = [], []
+    for text in texts:
+        links = YOUTUBE_PATTERN.findall(text) if "youtu" in text else None
+        if links:
+            cleaned.append(YOUTUBE_PATTERN.sub("", text))
+            youtube_links.append(", ".join(links))
+        else:
+            cleaned.append(text)
+            youtube_links.append(NO_YOUTUBE_LINK)
+    return cleaned, youtube_links
+
+def _clean_with_trie(texts):
+    """ Split messages into (texts without their emojis, the emojis of each), two lists.
+
+    The path for messages with multi-codepoint emojis. The messages are
+    joined and scanned in one pass (emoji_matcher.emoji_spans), whole
+    sequences included, and the emojis are cut out of the joined string in
+    one pass over the spans.
+    """
+    joined = MESSAGE_SEPARATOR.join(texts)
+    if joined.count(MESSAGE_SEPARATOR) != len(texts) - 1:
+        texts = [text.replace(MESSAGE_SEPARATOR, "") for text in texts]
+        joined = MESSAGE_SEPARATOR.join(texts)
+
+    # Cut the emojis out of the joined column and collect them, keeping one separator per message boundary
+    spans = emoji_spans(joined)
+    message_starts = np.cumsum([0] + [len(text) + 1 for text in texts[:-1]])
+    owners = np.searchsorted(message_starts, [start for start, _ in spans], side="right") - 1
+    kept, found, last, current = [], [], 0, 0
+    for owner, (start, end) in zip(owners.tolist(), spans):
+        if owner != current:
+            found.append(MESSAGE_SEPARATOR * (owner - current))
+            current = owner
+        kept.append(joined[last:start])
+        found.append(joined[start:end])
+        last = end
+    kept.append(joined[last:])
+    found.append(MESSAGE_SEPARATOR * (len(texts) - 1 - current))
+    texts = "".join(kept).split(MESSAGE_SEPARATOR)
+    emojis = "".join(found).split(MESSAGE_SEPARATOR)
+    return texts, emojis
+
+def clean_messages(messages):
+    """ Split a Series of raw messages into cleaned text, emojis and YouTube links.
+
+    Replaces the per-row clean_text / extract_emojis / remove_emojis /
+    extract_youtube_links / remove_youtube_links chain. The column is
+    processed as one Arrow array with RE2 kernels in C++: newlines are
+    collapsed, the messages holding an emoji are picked out in one scan,
+    their single-codepoint emojis are cut out with one character class and
+    the text is stripped. Messages with a multi-codepoint emoji (a codepoint
+    of SEQUENCE_CODEPOINTS) go through the Python trie path,
+    _clean_with_trie, and only messages mentioning 'youtu' through the link regex.
+    Returns a DataFrame with the columns 'message', 'emoji_used' and 'youtube_links'.
+    """
+    texts = pa.array(messages.fillna(NO_MESSAGE).astype(str).array, type=pa.large_string())
+    # A column built by concatenating frames arrives in chunks; the masks below need one array
+    if isinstance(texts, pa.ChunkedArray):
+        texts = texts.combine_chunks()
+    texts = pc.replace_substring_regex(texts, ARROW_NEWLINE_PATTERN, " ")
+    emoji_used = pc.if_else(pc.is_valid(texts), NO_EMOJI, None).cast(texts.type)
+    youtube_links = pc.if_else(pc.is_valid(texts), NO_YOUTUBE_LINK, None).cast(texts.type)
+
+    has_emoji = pc.match_substring_regex(texts, ANY_EMOJI_PATTERN)
+    if pc.any(has_emoji).as_py():
+        with_emoji = pc.filter(texts, has_emoji)
+        # Single-codepoint emojis: one run is extracted, the rare messages with several are collected with a replace
+        stripped = pc.replace_substring_regex(with_emoji, SINGLE_EMOJI_RUN_PATTERN, "")
+        emojis = pc.struct_field(pc.extract_regex(with_emoji, f"(?P<emojis>{SINGLE_EMOJI_RUN_PATTERN})"), [0])
+        several_runs = pc.not_equal(pc.subtract(pc.binary_length(with_emoji), pc.binary_length(stripped)), pc.binary_length(emojis))
+        if pc.any(several_runs).as_py():
+            emojis = pc.replace_with_mask(emojis, several_runs, pc.replace_substring_regex(pc.filter(with_emoji, several_runs), NOT_SINGLE_EMOJI_PATTERN, ""))
+
+        # Multi-codepoint emojis: these messages go through the trie
+        sequences = pc.match_substring_regex(with_emoji, SEQUENCE_PATTERN)
+        if pc.any(sequences).as_py():
+            cleaned, trie_emojis = _clean_with_trie(pc.filter(with_emoji, sequences).to_pylist())
+            stripped = pc.replace_with_mask(stripped, sequences, pa.array(cleaned, type=texts.type))
+            emojis = pc.replace_with_mask(emojis, sequences, pa.array(trie_emojis, type=texts.type))
+        texts = pc.replace_with_mask(texts, has_emoji, stripped)
+        emoji_used = pc.replace_with_mask(emoji_used, has_emoji, pc.if_else(pc.equal(emojis, ""), NO_EMOJI, emojis))
+
+    # Links are looked for after the emojis are removed, as the original chain did
+    has_link = pc.match_substring_regex(texts, "youtu")
+    if pc.any(has_link).as_py():
+        cleaned, links = _split_youtube_links(pc.filter(texts, has_link).to_pylist())
+        texts = pc.replace_with_mask(texts, has_link, pa.array(cleaned, type=texts.type))
+        youtube_links = pc.replace_with_mask(youtube_links, has_link, pa.array(links, type=texts.type))
+
+    columns = {"message": pc.utf8_trim(texts, WHITESPACE), "emoji_used": emoji_used, "youtube_links": youtube_links}
+    df = pd.DataFrame({name: values.to_pandas() for name, values in columns.items()})
+    df.index = messages.index
+    return df
+
+def message_keys(df, channel_column="Channel Username", id_column="ID"):
+    """ Hash each row's (Channel Username, ID) into one uint64 key.
+
+    Telegram message IDs are only unique within a channel, so the channel is
+    part of the key. Both parts are normalized the way clean_chunk stores them,
+    so raw and cleaned rows (channel_username, message_id) hash alike.
+    """
+    key_frame = pd.DataFrame({
+        "channel_username": df[channel_column].astype("string").str.strip(),
+        "message_id": pd.to_numeric(df[id_column], errors="coerce").fillna(0).astype("int64")
+    })
+    return pd.util.hash_pandas_object(key_frame, index=False).to_numpy()
+
+class MessageKeyIndex:
+    """ Sorted array of the hashed message keys seen so far.
+
+    Membership is a vectorized binary search, and 8 bytes per key keeps tens
+    of millions of keys in memory where a set of tuples would not.
+    """
+
+    def __init__(self):
+        self.keys = np.empty(0, dtype=np.uint64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, keys):
+        """ Add keys and return a mask of the rows to keep: the first occurrence of each unseen key. """
+        keys = np.asarray(keys, dtype=np.uint64)
+        unique_keys, first_index = np.unique(keys, return_index=True)
+        position = np.searchsorted(self.keys, unique_keys)
+        seen = position < len(self.keys)
+        seen[seen] = self.keys[position[seen]] == unique_keys[seen]
+
+        mask = np.zeros(len(keys), dtype=bool)
+        mask[first_index[~seen]] = True
+        # Insert at the binary-search positions: one linear copy keeps the array sorted
+        self.keys = np.insert(self.keys, position[~seen], unique_keys[~seen])
+        return mask
+
+def clean_chunk(df):
+    """ Clean one deduplicated partition of the merged channel data.
+
+    Module-level so it can be sent to ProcessPoolExecutor workers.
+    """
+    df = df.copy()
+
+    # ✅ Convert Date to datetime format, replacing NaT with None
+    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    df['Date'] = df['Date'].where(df['Date'].notna(), None)
+
+    # ✅ Convert 'ID' to integer for PostgreSQL BIGINT compatibility
+    df['ID'] = pd.to_numeric(df['ID'], errors="coerce").fillna(0).astype(int)
+
+    # ✅ Standardize text columns
+    df.loc[:, 'Channel Title'] = df['Channel Title'].str.strip()
+    df.loc[:, 'Channel Username'] = df['Channel Username'].str.strip()
+
+    # ✅ Fill missing values, clean text and split out emojis and YouTube links in one pass
+    cleaned = clean_messages(df['Message'])
+    df['Message'] = cleaned['message']
+    df['emoji_used'] = cleaned['emoji_used']
+    df['youtube_links'] = cleaned['youtube_links']
+
+    # ✅ Extract product names and usage info from the cleaned messages, so dbt only selects them
+    extracted = extract_product_info(df['Message'])
+    df['product_name'] = extracted['product_name']
+    df['usage_info'] = extracted['usage_info']
+
+    # ✅ Rename columns to match PostgreSQL schema
+    return df.rename(columns={
+        "Channel Title": "channel_title",
+        "Channel Username": "channel_username",
+        "ID": "message_id",
+        "Message": "message",
+        "Date": "message_date",
+        "emoji_used": "emoji_used",
+        "youtube_links": "youtube_links"
+    })
+
+def assign_cluster_ids(df, index):
+    """ Return the near-duplicate cluster id of each cleaned row from a NearDuplicateIndex, as nullable Int64.
+
+    Rows whose message is missing or has no words get <NA>.
+    """
+    keys = message_keys(df, "channel_username", "message_id")
+    messages = df['message'].where(df['message'] != NO_MESSAGE)
+    cluster_ids = pd.Series(index.assign(keys, messages), index=df.index)
+    return cluster_ids.where(cluster_ids >= 0).astype("Int64")
+
 class MedicalDataCleaner:
-    def __init__(self, file_path):
+    def __init__(self, file_path=None, df=None):
         self.file_path = file_path
-        self.df = self.load_csv()
+        self.df = df if df is not None else self.load_csv()
+
+    @classmethod
+    def from_parquet(cls, filters=None, base_dir=PARQUET_DIR):
+        """ Create a cleaner from the Parquet 'merged' layer, optionally filtered by channel or month. """
+        return cls(df=read_layer('merged', filters=filters, base_dir=base_dir))
 
     def load_csv(self):
         """ Load CSV file into a Pandas DataFrame. """
@@ -34,78 +252,55 @@ class MedicalDataCleaner:
 
     def extract_emojis(self, text):
         """ Extract emojis from text, return 'No emoji' if none found. """
-        emojis = ''.join(c for c in text if c in emoji.EMOJI_DATA)
-        return emojis if emojis else "No emoji"
+        emojis = ''.join(find_emojis(text))
+        return emojis if emojis else NO_EMOJI
 
     def remove_emojis(self, text):
         """ Remove emojis from the message text. """
-        return ''.join(c for c in text if c not in emoji.EMOJI_DATA)
+        return split_emojis(text)[1]
+
+    def emoji_frequencies(self, column='Message'):
+        """ Count each emoji sequence in a text column, e.g. 'Message' before cleaning or 'emoji_used' after. """
+        return emoji_frequencies(self.df[column])
 
     def extract_youtube_links(self, text):
         """ Extract YouTube links from text, return 'No YouTube link' if none found. """
-        youtube_pattern = r"(https?://(?:www\.)?(?:youtube\.com|youtu\.be)/[^\s]+)"
-        links = re.findall(youtube_pattern, text)
-        return ', '.join(links) if links else "No YouTube link"
+        links = YOUTUBE_PATTERN.findall(text)
+        return ', '.join(links) if links else NO_YOUTUBE_LINK
 
     def remove_youtube_links(self, text):
         """ Remove YouTube links from the message text. """
-        youtube_pattern = r"https?://(?:www\.)?(?:youtube\.com|youtu\.be)/[^\s]+"
-        return re.sub(youtube_pattern, '', text).strip()
+        return YOUTUBE_PATTERN.sub('', text).strip()
 
     def clean_text(self, text):
         """ Standardize text by removing newline characters and unnecessary spaces. """
         if pd.isna(text):
-            return "No Message"
-        return re.sub(r'\n+', ' ', text).strip()
+            return NO_MESSAGE
+        return NEWLINE_PATTERN.sub(' ', text).strip()
 
-    def clean_dataframe(self):
-        """ Perform all cleaning and standardization steps while avoiding SettingWithCopyWarning. """
+    def clean_dataframe(self, workers=1, chunksize=None):
+        """ Perform all cleaning and standardization steps while avoiding SettingWithCopyWarning.
+
+        With workers > 1 the deduplicated frame is split into partitions of
+        chunksize rows (default: one partition per worker) that are cleaned in a
+        ProcessPoolExecutor and reassembled in their original order.
+        """
         try:
-            df = self.df.drop_duplicates(subset=["ID"]).copy()  # Ensure a new copy
-            logging.info("✅ Duplicates removed from dataset.")
-
-            # ✅ Convert Date to datetime format, replacing NaT with None
-            df.loc[:, 'Date'] = pd.to_datetime(df['Date'], errors='coerce')
-            df.loc[:, 'Date'] = df['Date'].where(df['Date'].notna(), None)
-            logging.info("✅ Date column formatted to datetime.")
-
-            # ✅ Convert 'ID' to integer for PostgreSQL BIGINT compatibility
-            df.loc[:, 'ID'] = pd.to_numeric(df['ID'], errors="coerce").fillna(0).astype(int)
-
-            # ✅ Fill missing values
-            df.loc[:, 'Message'] = df['Message'].fillna("No Message")
-            logging.info("✅ Missing values filled.")
-
-            # ✅ Standardize text columns
-            df.loc[:, 'Channel Title'] = df['Channel Title'].str.strip()
-            df.loc[:, 'Channel Username'] = df['Channel Username'].str.strip()
-            df.loc[:, 'Message'] = df['Message'].apply(self.clean_text)
-            logging.info("✅ Text columns standardized.")
-
-            # ✅ Extract emojis and store them in a new column
-            df.loc[:, 'emoji_used'] = df['Message'].apply(self.extract_emojis)
-            logging.info("✅ Emojis extracted and stored in 'emoji_used' column.")
-            
-            # ✅ Remove emojis from message text
-            df.loc[:, 'Message'] = df['Message'].apply(self.remove_emojis)
-
-            # ✅ Extract YouTube links into a separate column
-            df.loc[:, 'youtube_links'] = df['Message'].apply(self.extract_youtube_links)
-            logging.info("✅ YouTube links extracted and stored in 'youtube_links' column.")
-
-            # ✅ Remove YouTube links from message text
-            df.loc[:, 'Message'] = df['Message'].apply(self.remove_youtube_links)
-
-            # ✅ Rename columns to match PostgreSQL schema
-            df = df.rename(columns={
-                "Channel Title": "channel_title",
-                "Channel Username": "channel_username",
-                "ID": "message_id",
-                "Message": "message",
-                "Date": "message_date",
-                "emoji_used": "emoji_used",
-                "youtube_links": "youtube_links"
-            })
+            with track_stage('clean', workers=workers) as stage:
+                stage.rows = len(self.df)
+                # Deduplicate on (channel, message ID); IDs repeat across channels
+                df = self.df[MessageKeyIndex().add(message_keys(self.df))].copy()  # Ensure a new copy
+                logging.info("✅ Duplicates removed from dataset.")
+
+                if workers > 1 and len(df) > 1:
+                    chunksize = chunksize or -(-len(df) // workers)
+                    chunks = [df.iloc[start:start + chunksize] for start in range(0, len(df), chunksize)]
+                    with ProcessPoolExecutor(max_workers=workers) as executor:
+                        df = pd.concat(executor.map(clean_chunk, chunks))
+                    logging.info(f"✅ {len(chunks)} partitions cleaned with {workers} worker processes.")
+                else:
+                    df = clean_chunk(df)
+                stage.fields['output_rows'] = len(df)
 
             logging.info("✅ Data cleaning completed successfully.")
             self.df = df
@@ -113,6 +308,34 @@ class MedicalDataCleaner:
             logging.error(f"❌ Data cleaning error: {e}")
             raise
 
+    def detect_near_duplicates(self, threshold=DEFAULT_THRESHOLD, signatures_path=SIGNATURES_PATH):
+        """ Give reposted and lightly edited copies of a message a shared cluster_id; run after clean_dataframe.
+
+        Signatures are loaded from and saved to signatures_path (None keeps them
+        in memory), so each run matches new messages against the clusters of
+        earlier runs. Messages without text get no cluster. Returns the index.
+        """
+        try:
+            with track_stage('near_duplicates', threshold=threshold) as stage:
+                stage.rows = len(self.df)
+                index = load_index(signatures_path, threshold)
+                known = len(index)
+
+                self.df['cluster_id'] = assign_cluster_ids(self.df, index)
+
+                if signatures_path:
+                    index.save(signatures_path)
+                clustered = self.df['cluster_id'].dropna()
+                near_duplicates = len(clustered) - clustered.nunique()
+                stage.fields['near_duplicates'] = near_duplicates
+                stage.fields['new_signatures'] = len(index) - known
+
+            logging.info(f"✅ {near_duplicates} near-duplicate messages found across {clustered.nunique()} clusters.")
+            return index
+        except Exception as e:
+            logging.error(f"❌ Near-duplicate detection error: {e}")
+            raise
+
     def save_cleaned_data(self, output_path):
         """ Save cleaned data to a new CSV file. """
         try:
@@ -121,4 +344,14 @@ class MedicalDataCleaner:
             print(f"✅ Cleaned data saved successfully to '{output_path}'.")
         except Exception as e:
             logging.error(f"❌ Error saving cleaned data: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    def save_cleaned_parquet(self, base_dir=PARQUET_DIR):
+        """ Save cleaned data to the Parquet 'cleaned' layer, partitioned by channel and month. """
+        try:
+            rows = write_layer(self.df, 'cleaned', base_dir=base_dir)
+            print(f"✅ {rows} cleaned rows saved to the Parquet layer under '{base_dir}'.")
+            return rows
+        except Exception as e:
+            logging.error(f"❌ Error saving cleaned data to Parquet: {e}")
+            raise
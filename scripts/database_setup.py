@@ -1,8 +1,11 @@
 import os
+import io
 import logging
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, text
 import pandas as pd
+from instrumentation import timed_stage
+from product_extraction import extract_product_info
 
 # Ensure logs folder exists
 os.makedirs("../logs", exist_ok=True)
@@ -39,47 +42,358 @@ def get_db_connection():
         logging.error(f"❌ Database connection failed: {e}")
         raise
 
-def create_table(engine):
-    """ Create telegram_medical_messages table if it does not exist. """
-    create_table_query = """
-    CREATE TABLE IF NOT EXISTS telegram_medical_messages (
-        id SERIAL PRIMARY KEY,
-        channel_title TEXT,
-        channel_username TEXT,
-        message_id BIGINT UNIQUE,
-        message TEXT,
-        message_date TIMESTAMP,
-        emoji_used TEXT,       -- New column for extracted emojis
-        youtube_links TEXT     -- New column for extracted YouTube links
+# Columns loaded into telegram_medical_messages, in COPY order
+MESSAGE_COLUMNS = [
+    "channel_title",
+    "channel_username",
+    "message_id",
+    "message",
+    "message_date",
+    "emoji_used",
+    "youtube_links",
+    "product_name",
+    "usage_info",
+    "cluster_id"
+]
+
+# Text search configuration of search_vector; 'simple' lowercases words without stemming,
+# so English and Amharic words are indexed alike. fast_api/models.py uses the same one.
+SEARCH_CONFIG = "simple"
+SEARCH_VECTOR_COLUMN = f"search_vector TSVECTOR GENERATED ALWAYS AS (to_tsvector('{SEARCH_CONFIG}', coalesce(message, ''))) STORED"
+
+# Months of empty partitions created ahead of the current month
+PARTITION_MONTHS_AHEAD = 3
+
+# Telegram message IDs are only unique within a channel, so a message is identified by both
+MESSAGE_KEY_CONSTRAINT = "uq_telegram_medical_messages_message_key"
+
+# Unpartitioned layout, used for engines other than PostgreSQL (e.g. SQLite in tests)
+CREATE_UNPARTITIONED_TABLE_QUERY = f"""
+CREATE TABLE IF NOT EXISTS telegram_medical_messages (
+    id SERIAL PRIMARY KEY,
+    channel_title TEXT,
+    channel_username TEXT,
+    message_id BIGINT,
+    message TEXT,
+    message_date TIMESTAMP,
+    emoji_used TEXT,       -- New column for extracted emojis
+    youtube_links TEXT,    -- New column for extracted YouTube links
+    product_name TEXT,     -- Extracted by product_extraction.py during cleaning
+    usage_info TEXT,       -- Extracted by product_extraction.py during cleaning
+    cluster_id BIGINT,     -- Near-duplicate cluster assigned by near_duplicates.py during cleaning
+    CONSTRAINT {MESSAGE_KEY_CONSTRAINT} UNIQUE (channel_username, message_id)
+);
+"""
+
+# Table partitioned by month on message_date. Unique constraints on a partitioned
+# table must include the partition key, so the message key is unique together with
+# message_date; the loaders skip keys that already exist in any partition.
+CREATE_TABLE_QUERY = f"""
+CREATE TABLE IF NOT EXISTS telegram_medical_messages (
+    id SERIAL,
+    channel_title TEXT,
+    channel_username TEXT,
+    message_id BIGINT,
+    message TEXT,
+    message_date TIMESTAMP,
+    emoji_used TEXT,       -- New column for extracted emojis
+    youtube_links TEXT,    -- New column for extracted YouTube links
+    product_name TEXT,     -- Extracted by product_extraction.py during cleaning
+    usage_info TEXT,       -- Extracted by product_extraction.py during cleaning
+    cluster_id BIGINT,     -- Near-duplicate cluster assigned by near_duplicates.py during cleaning
+    {SEARCH_VECTOR_COLUMN},  -- Computed by PostgreSQL as rows are loaded
+    CONSTRAINT {MESSAGE_KEY_CONSTRAINT} UNIQUE (channel_username, message_id, message_date)
+) PARTITION BY RANGE (message_date);
+
+-- Create the monthly partitions covering start_date..end_date that do not exist yet.
+-- Does nothing on a table created before partitioning was introduced.
+CREATE OR REPLACE FUNCTION create_message_partitions(start_date TIMESTAMP, end_date TIMESTAMP)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start TIMESTAMP := date_trunc('month', start_date);
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('telegram_medical_messages')
+    ) THEN
+        RETURN 0;
+    END IF;
+    WHILE month_start <= end_date LOOP
+        partition_name := 'telegram_medical_messages_' || to_char(month_start, '"y"YYYY"m"MM');
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF telegram_medical_messages FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, month_start + INTERVAL '1 month'
+            );
+            created := created + 1;
+        END IF;
+        month_start := month_start + INTERVAL '1 month';
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Rows without a message_date land here
+CREATE_DEFAULT_PARTITION_QUERY = """
+CREATE TABLE IF NOT EXISTS telegram_medical_messages_default
+    PARTITION OF telegram_medical_messages DEFAULT;
+"""
+
+# Indexes for the usual warehouse filters; on a partitioned table each partition gets its own copy.
+# Lookups by (channel_username, message_id) use the message key constraint's index.
+MESSAGE_INDEXES = {
+    "idx_telegram_medical_messages_channel_date": "(channel_username, message_date)",
+    "idx_telegram_medical_messages_message_date": "(message_date)",
+    "idx_telegram_medical_messages_id": "(id)",
+    "idx_telegram_medical_messages_search_vector": "USING GIN (search_vector)"  # Full-text search (/messages/search)
+}
+CREATE_INDEXES_QUERY = "\n".join(
+    f"CREATE INDEX IF NOT EXISTS {name} ON telegram_medical_messages {columns};"
+    for name, columns in MESSAGE_INDEXES.items()
+)
+
+# Columns added after the table was first created; added in place to existing tables.
+# Adding search_vector computes it for every stored row, so the first run after upgrading rewrites the table.
+ADD_COLUMNS_QUERY = f"""
+ALTER TABLE telegram_medical_messages ADD COLUMN IF NOT EXISTS product_name TEXT;
+ALTER TABLE telegram_medical_messages ADD COLUMN IF NOT EXISTS usage_info TEXT;
+ALTER TABLE telegram_medical_messages ADD COLUMN IF NOT EXISTS cluster_id BIGINT;
+ALTER TABLE telegram_medical_messages ADD COLUMN IF NOT EXISTS {SEARCH_VECTOR_COLUMN};
+"""
+
+def create_table(engine, months_ahead=PARTITION_MONTHS_AHEAD):
+    """ Create the partitioned telegram_medical_messages table, its indexes and the upcoming monthly partitions.
+
+    Other engines get the unpartitioned layout.
+    """
+    create_partitions_query = f"""
+    SELECT create_message_partitions(
+        CAST(date_trunc('month', now()) AS TIMESTAMP),
+        CAST(date_trunc('month', now()) + INTERVAL '{int(months_ahead)} months' AS TIMESTAMP)
     );
     """
     try:
+        if engine.dialect.name != "postgresql":
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+                connection.execute(text(CREATE_UNPARTITIONED_TABLE_QUERY))
+            logging.info("✅ Table 'telegram_medical_messages' created successfully.")
+            return
+
         with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
-            connection.execute(text(create_table_query))
-        logging.info("✅ Table 'telegram_medical_messages' created successfully.")
+            connection.execute(text(CREATE_TABLE_QUERY))
+            connection.execute(text(ADD_COLUMNS_QUERY))
+            if is_partitioned(connection):
+                connection.execute(text(CREATE_DEFAULT_PARTITION_QUERY))
+            else:
+                logging.warning("⚠️ Table 'telegram_medical_messages' is not partitioned; run migrate_to_partitioned() to convert it.")
+            if not has_message_key(connection):
+                logging.warning("⚠️ Table 'telegram_medical_messages' is unique on message_id alone; run migrate_message_key() to key it on (channel_username, message_id).")
+            connection.execute(text(CREATE_INDEXES_QUERY))
+            created = connection.execute(text(create_partitions_query)).scalar()
+        logging.info(f"✅ Table 'telegram_medical_messages' created successfully ({created} new monthly partitions).")
     except Exception as e:
         logging.error(f"❌ Error creating table: {e}")
         raise
 
-def insert_data(engine, cleaned_df):
-    """ Inserts cleaned Telegram data into PostgreSQL database. """
+def is_partitioned(connection):
+    """ Return True if telegram_medical_messages is a partitioned table. """
+    return connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+        "WHERE partrelid = to_regclass('telegram_medical_messages'))"
+    )).scalar()
+
+def has_message_key(connection):
+    """ Return True if telegram_medical_messages is unique on (channel_username, message_id). """
+    return connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_constraint "
+        "WHERE conrelid = to_regclass('telegram_medical_messages') AND conname = :name)"
+    ), {"name": MESSAGE_KEY_CONSTRAINT}).scalar()
+
+def migrate_message_key(engine):
+    """ Re-key an existing table's uniqueness from message_id to (channel_username, message_id).
+
+    Drops the old unique constraints (message_id, or message_id with message_date
+    on a partitioned table) and adds the channel-scoped key. Messages the old
+    key rejected are not in the table; re-run the load to insert them.
+    """
+    try:
+        with engine.begin() as connection:
+            if has_message_key(connection):
+                logging.info("✅ Table 'telegram_medical_messages' is already keyed on (channel_username, message_id).")
+                return False
+            old_constraints = connection.execute(text(
+                "SELECT conname FROM pg_constraint "
+                "WHERE conrelid = 'telegram_medical_messages'::regclass AND contype = 'u'"
+            )).scalars().all()
+            for name in old_constraints:
+                connection.execute(text(f'ALTER TABLE telegram_medical_messages DROP CONSTRAINT "{name}"'))
+
+            key = "channel_username, message_id, message_date" if is_partitioned(connection) else "channel_username, message_id"
+            connection.execute(text(f"ALTER TABLE telegram_medical_messages ADD CONSTRAINT {MESSAGE_KEY_CONSTRAINT} UNIQUE ({key})"))
+            connection.execute(text("DROP INDEX IF EXISTS idx_telegram_medical_messages_message_id"))
+            connection.execute(text(CREATE_INDEXES_QUERY))
+        logging.info(f"✅ Replaced {old_constraints} with {MESSAGE_KEY_CONSTRAINT} ({key}).")
+        return True
+    except Exception as e:
+        logging.error(f"❌ Error migrating the message key: {e}")
+        raise
+
+def migrate_to_partitioned(engine):
+    """ Convert an existing unpartitioned telegram_medical_messages table in one transaction.
+
+    The old table is kept as telegram_medical_messages_unpartitioned so it can
+    be checked and dropped by hand. Row ids are preserved.
+    """
+    columns = "id, " + ", ".join(MESSAGE_COLUMNS)
     try:
+        with engine.begin() as connection:
+            if is_partitioned(connection):
+                logging.info("✅ Table 'telegram_medical_messages' is already partitioned.")
+                return 0
+            connection.execute(text("ALTER TABLE telegram_medical_messages RENAME TO telegram_medical_messages_unpartitioned"))
+            # Free the index and constraint names so the partitioned table can reuse them
+            for name in MESSAGE_INDEXES:
+                connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            connection.execute(text(f"""
+            DO $$ BEGIN
+                IF EXISTS (SELECT 1 FROM pg_constraint WHERE conname = '{MESSAGE_KEY_CONSTRAINT}'
+                           AND conrelid = 'telegram_medical_messages_unpartitioned'::regclass) THEN
+                    ALTER TABLE telegram_medical_messages_unpartitioned
+                        RENAME CONSTRAINT {MESSAGE_KEY_CONSTRAINT} TO {MESSAGE_KEY_CONSTRAINT}_unpartitioned;
+                END IF;
+            END $$;
+            """))
+            connection.execute(text(CREATE_TABLE_QUERY))
+            connection.execute(text(CREATE_DEFAULT_PARTITION_QUERY))
+            connection.execute(text(CREATE_INDEXES_QUERY))
+            connection.execute(text("""
+            SELECT create_message_partitions(month, month)
+            FROM (SELECT DISTINCT date_trunc('month', message_date) AS month
+                  FROM telegram_medical_messages_unpartitioned WHERE message_date IS NOT NULL) AS months
+            """))
+            moved = connection.execute(text(
+                f"INSERT INTO telegram_medical_messages ({columns}) "
+                f"SELECT {columns} FROM telegram_medical_messages_unpartitioned"
+            )).rowcount
+            connection.execute(text(
+                "SELECT setval(pg_get_serial_sequence('telegram_medical_messages', 'id'), "
+                "COALESCE(MAX(id), 0) + 1, false) FROM telegram_medical_messages"
+            ))
+        logging.info(f"✅ Migrated {moved} rows into the partitioned 'telegram_medical_messages' table.")
+        return moved
+    except Exception as e:
+        logging.error(f"❌ Error migrating table to partitions: {e}")
+        raise
+
+# Number of rows streamed through COPY per batch
+COPY_BATCH_SIZE = 50000
+
+def _prepare_copy_frame(cleaned_df):
+    """ Select the table columns and coerce types so COPY can parse every row; missing columns load as NULL. """
+    df = cleaned_df.reindex(columns=MESSAGE_COLUMNS)
+    df["message_id"] = pd.to_numeric(df["message_id"], errors="coerce").astype("Int64")
+    df["cluster_id"] = pd.to_numeric(df["cluster_id"], errors="coerce").astype("Int64")
+    df["message_date"] = pd.to_datetime(df["message_date"], errors="coerce")
+    return df
+
+def bulk_insert_data(engine, cleaned_df, batch_size=COPY_BATCH_SIZE):
+    """ Stream cleaned data into a staging table with COPY, then merge it in one statement.
+
+    Returns a tuple (inserted, skipped) where skipped counts rows whose
+    (channel_username, message_id) already existed in telegram_medical_messages.
+    """
+    columns = ", ".join(MESSAGE_COLUMNS)
+    create_staging_query = """
+    CREATE TEMP TABLE staging_telegram_medical_messages (
+        channel_title TEXT,
+        channel_username TEXT,
+        message_id BIGINT,
+        message TEXT,
+        message_date TIMESTAMP,
+        emoji_used TEXT,
+        youtube_links TEXT,
+        product_name TEXT,
+        usage_info TEXT,
+        cluster_id BIGINT
+    ) ON COMMIT DROP;
+    """
+    copy_query = f"COPY staging_telegram_medical_messages ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+    # Make sure every month in the batch has its partition before the merge
+    partition_query = """
+    SELECT create_message_partitions(month, month)
+    FROM (SELECT DISTINCT date_trunc('month', message_date) AS month
+          FROM staging_telegram_medical_messages WHERE message_date IS NOT NULL) AS months;
+    """
+    # The message key is only unique together with message_date on the partitioned table,
+    # so skip keys already stored in any partition or repeated within the batch
+    merge_query = f"""
+    INSERT INTO telegram_medical_messages ({columns})
+    SELECT DISTINCT ON (channel_username, message_id) {columns} FROM staging_telegram_medical_messages AS staging
+    WHERE NOT EXISTS (
+        SELECT 1 FROM telegram_medical_messages AS existing
+        WHERE existing.channel_username = staging.channel_username AND existing.message_id = staging.message_id
+    )
+    ORDER BY channel_username, message_id
+    ON CONFLICT DO NOTHING;
+    """
+
+    df = _prepare_copy_frame(cleaned_df)
+    total = len(df)
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(create_staging_query)
+
+        for batch_number, start in enumerate(range(0, total, batch_size), start=1):
+            batch = df.iloc[start:start + batch_size]
+            buffer = io.StringIO()
+            batch.to_csv(buffer, index=False, header=False, na_rep="\\N", date_format="%Y-%m-%d %H:%M:%S")
+            buffer.seek(0)
+            cursor.copy_expert(copy_query, buffer)
+            logging.info(f"✅ Batch {batch_number}: staged {min(start + batch_size, total)}/{total} rows.")
+
+        cursor.execute(partition_query)
+        cursor.execute(merge_query)
+        inserted = cursor.rowcount
+        connection.commit()
+        cursor.close()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    return inserted, total - inserted
+
+@timed_stage('load', rows=sum)
+def insert_data(engine, cleaned_df, batch_size=COPY_BATCH_SIZE):
+    """ Inserts cleaned Telegram data into PostgreSQL database.
+
+    PostgreSQL engines use the COPY based bulk loader; other engines (e.g. SQLite
+    in tests) fall back to row-by-row inserts. Returns a tuple (inserted, skipped).
+    """
+    try:
+        if engine.dialect.name == "postgresql":
+            inserted, skipped = bulk_insert_data(engine, cleaned_df, batch_size=batch_size)
+            logging.info(f"✅ {inserted} records inserted into PostgreSQL database, {skipped} duplicates skipped.")
+            return inserted, skipped
+
         # Convert NaT timestamps to None (NULL in SQL)
         cleaned_df["message_date"] = cleaned_df["message_date"].apply(lambda x: None if pd.isna(x) else str(x))
 
         insert_query = """
         INSERT INTO telegram_medical_messages 
-        (channel_title, channel_username, message_id, message, message_date, emoji_used, youtube_links) 
-        VALUES (:channel_title, :channel_username, :message_id, :message, :message_date, :emoji_used, :youtube_links)
-        ON CONFLICT (message_id) DO NOTHING;
+        (channel_title, channel_username, message_id, message, message_date, emoji_used, youtube_links, product_name, usage_info, cluster_id) 
+        VALUES (:channel_title, :channel_username, :message_id, :message, :message_date, :emoji_used, :youtube_links, :product_name, :usage_info, :cluster_id)
+        ON CONFLICT (channel_username, message_id) DO NOTHING;
         """
 
+        inserted = 0
         with engine.begin() as connection:  # ✅ Auto-commit enabled
-            for _, row in cleaned_df.iterrows():
-                # Debug log to ensure data is being inserted
-                logging.info(f"Inserting: {row['message_id']} - {row['message_date']}")
-
-                connection.execute(
+            for position, (_, row) in enumerate(cleaned_df.iterrows(), start=1):
+                result = connection.execute(
                     text(insert_query),
                     {
                         "channel_title": row["channel_title"],
@@ -88,21 +402,74 @@ def insert_data(engine, cleaned_df):
                         "message": row["message"],
                         "message_date": row["message_date"],  # ✅ No NaT values
                         "emoji_used": row["emoji_used"],
-                        "youtube_links": row["youtube_links"]
+                        "youtube_links": row["youtube_links"],
+                        "product_name": row.get("product_name"),
+                        "usage_info": row.get("usage_info"),
+                        "cluster_id": None if pd.isna(row.get("cluster_id")) else int(row.get("cluster_id"))
                     }
                 )
+                inserted += result.rowcount
+                if position % batch_size == 0:
+                    logging.debug(f"✅ Inserted batch: {position}/{len(cleaned_df)} rows processed.")
 
-        logging.info(f"✅ {len(cleaned_df)} records inserted into PostgreSQL database.")
+        skipped = len(cleaned_df) - inserted
+        logging.info(f"✅ {inserted} records inserted into database, {skipped} duplicates skipped.")
+        return inserted, skipped
     except Exception as e:
         logging.error(f"❌ Error inserting data: {e}")
         raise
 
+def backfill_extracted_columns(engine, batch_size=COPY_BATCH_SIZE):
+    """ Fill product_name and usage_info for rows loaded before they were extracted during cleaning.
+
+    Reads rows with neither column set in message key order, batch_size at a
+    time, and writes back the values found. Returns the number of rows updated.
+    """
+    select_query = text("""
+    SELECT channel_username, message_id, message FROM telegram_medical_messages
+    WHERE (channel_username, message_id) > (:channel_username, :message_id)
+      AND product_name IS NULL AND usage_info IS NULL
+    ORDER BY channel_username, message_id LIMIT :limit
+    """)
+    update_query = text("""
+    UPDATE telegram_medical_messages SET product_name = :product_name, usage_info = :usage_info
+    WHERE channel_username = :channel_username AND message_id = :message_id
+    """)
+    try:
+        updated, after = 0, {"channel_username": "", "message_id": -1}
+        while True:
+            with engine.begin() as connection:
+                rows = pd.DataFrame(
+                    connection.execute(select_query, {**after, "limit": batch_size}).fetchall(),
+                    columns=["channel_username", "message_id", "message"]
+                )
+                if rows.empty:
+                    break
+                after = {"channel_username": rows["channel_username"].iloc[-1], "message_id": int(rows["message_id"].iloc[-1])}
+                extracted = extract_product_info(rows["message"])
+                extracted["channel_username"] = rows["channel_username"].astype(object)
+                extracted["message_id"] = rows["message_id"].astype(int).astype(object)
+                extracted = extracted[extracted["product_name"].notna() | extracted["usage_info"].notna()]
+                if not extracted.empty:
+                    connection.execute(update_query, extracted.to_dict("records"))
+                updated += len(extracted)
+            logging.info(f"✅ Backfilled product_name and usage_info up to {after['channel_username']}/{after['message_id']} ({updated} rows updated).")
+        return updated
+    except Exception as e:
+        logging.error(f"❌ Error backfilling extracted columns: {e}")
+        raise
+
 if __name__ == "__main__":
+    from parquet_store import layer_path, read_layer
+
     engine = get_db_connection()
     create_table(engine)
-    
-    # Load cleaned data
-    cleaned_df = pd.read_csv('../src/data/cleaned_medical_data.csv')
+
+    # Load cleaned data, preferring the typed Parquet layer over the CSV export
+    if os.path.isdir(layer_path('cleaned')):
+        cleaned_df = read_layer('cleaned')
+    else:
+        cleaned_df = pd.read_csv('../src/data/cleaned_medical_data.csv')
     
     # Insert data into the table
     insert_data(engine, cleaned_df)
\ No newline at end of file
@@ -0,0 +1,122 @@
+import re
+from collections import Counter
+from itertools import chain
+import emoji
+
+def character_class(codepoints):
+    """ Build a regex character class body from a sorted list of codepoints, collapsing runs into ranges. """
+    ranges = []
+    start = previous = codepoints[0]
+    for codepoint in codepoints[1:]:
+        if codepoint != previous + 1:
+            ranges.append((start, previous))
+            start = codepoint
+        previous = codepoint
+    ranges.append((start, previous))
+    return "".join(
+        re.escape(chr(low)) if low == high else f"{re.escape(chr(low))}-{re.escape(chr(high))}"
+        for low, high in ranges
+    )
+
+# Marks a trie node where a complete emoji ends
+END = ""
+
+def build_trie(sequences):
+    """ Return a codepoint trie of the sequences as nested dicts; END keys mark complete sequences. """
+    trie = {}
+    for sequence in sequences:
+        node = trie
+        for char in sequence:
+            node = node.setdefault(char, {})
+        node[END] = True
+    return trie
+
+# Every emoji sequence the emoji package knows: single codepoints, skin tones, flags, keycaps and ZWJ sequences
+EMOJI_SEQUENCES = frozenset(emoji.EMOJI_DATA)
+EMOJI_TRIE = build_trie(EMOJI_SEQUENCES)
+# Every codepoint that can appear inside an emoji sequence, including the digits, '#' and '*' of keycaps
+EMOJI_CODEPOINTS = sorted(ord(char) for char in {char for sequence in EMOJI_SEQUENCES for char in sequence})
+
+# Keycap bases ('#', '*', digits) are the only ASCII codepoints in emojis, and only ever come first
+KEYCAP_BASES = frozenset(chr(c) for c in EMOJI_CODEPOINTS if c < 0x80)
+
+SINGLE_EMOJI_CODEPOINTS = sorted(ord(sequence) for sequence in EMOJI_SEQUENCES if len(sequence) == 1)
+# Codepoints that can follow the first one of a multi-codepoint sequence and are no emoji on their own:
+# variation selector 16, ZWJ, the keycap mark, regional indicators and the subdivision-flag tag.
+# In text without any of them every emoji codepoint is a whole emoji or, for skin tones, a modifier
+# that stays next to its base, so one character class cuts them out exactly as the trie would
+SEQUENCE_CODEPOINTS = sorted({ord(sequence[1]) for sequence in EMOJI_SEQUENCES if len(sequence) > 1} - set(SINGLE_EMOJI_CODEPOINTS))
+# Character class bodies of both sets, shared by re and the RE2 patterns run over Arrow columns
+SEQUENCE_CLASS = character_class(SEQUENCE_CODEPOINTS)
+SINGLE_EMOJI_CLASS = character_class(SINGLE_EMOJI_CODEPOINTS)
+
+# Runs of ordinary text: everything below U+200D (Latin, Ethiopic and other scripts, and the
+# separators clean_messages joins on) except the © and ® emojis. Keycap digits count as ordinary
+# and are picked up again by emoji_spans. Testing a long run against two ranges is several times
+# faster than searching for the rare emoji codepoints with their full class of ranges
+ORDINARY_TEXT_PATTERN = re.compile("[^" + character_class([c for c in EMOJI_CODEPOINTS if 0x80 <= c < 0x200D]) + "\u200d-\U0010ffff]+")
+
+def emoji_spans(text):
+    """ Return the (start, end) offsets of every emoji sequence in text, in one left-to-right scan.
+
+    The regex steps over ordinary text in C; only the short gaps between its
+    matches are walked through the trie, longest match first. A gap is widened
+    by one character when a keycap base ('#', '*' or a digit) precedes it.
+    """
+    spans = []
+    trie = EMOJI_TRIE
+    last = 0
+    for match in chain(ORDINARY_TEXT_PATTERN.finditer(text), [None]):
+        stop = match.start() if match is not None else len(text)
+        i = last - 1 if last and text[last - 1] in KEYCAP_BASES else last
+        while i < stop:
+            node = trie.get(text[i])
+            end = 0
+            j = i + 1
+            if node is not None:
+                if END in node:
+                    end = j
+                while j < stop:
+                    node = node.get(text[j])
+                    if node is None:
+                        break
+                    j += 1
+                    if END in node:
+                        end = j
+            if end:
+                spans.append((i, end))
+                i = end
+            else:
+                i += 1
+        if match is not None:
+            last = match.end()
+    return spans
+
+def split_emojis(text):
+    """ Return (emojis found in text, text with them removed).
+
+    Multi-codepoint emojis such as '👍🏽', '🇪🇹' and '❤️‍🔥' are returned
+    whole rather than as fragments.
+    """
+    spans = emoji_spans(text)
+    if not spans:
+        return [], text
+    pieces, last = [], 0
+    for start, end in spans:
+        pieces.append(text[last:start])
+        last = end
+    pieces.append(text[last:])
+    return [text[start:end] for start, end in spans], "".join(pieces)
+
+def find_emojis(text):
+    """ Return the emoji sequences in text, in order. """
+    return [text[start:end] for start, end in emoji_spans(text)]
+
+def emoji_frequencies(texts, separator="\x00"):
+    """ Count every emoji sequence across an iterable of texts; missing values are skipped.
+
+    The texts are scanned as one joined string; separator is not part of any
+    emoji, so no sequence spans two texts.
+    """
+    joined = separator.join(text for text in texts if isinstance(text, str))
+    return Counter(joined[start:end] for start, end in emoji_spans(joined))
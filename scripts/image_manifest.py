@@ -0,0 +1,136 @@
+import hashlib
+import os
+import sqlite3
+
+# Default location of the manifest shared by all image channels
+MANIFEST_PATH = '../src/data/images/manifest.sqlite'
+# File extensions picked up when importing an existing image directory
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+class ImageManifest:
+    """ Content-hash manifest of downloaded images, stored in SQLite so later stages can query it.
+
+    Each distinct image (by SHA-256 of its bytes) is stored once in 'images'; every
+    channel message that carried it is recorded in 'messages'. The autoincrement id
+    of 'images' lets the detection stage ask for images added after a cursor instead
+    of scanning the image directories.
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+        CREATE TABLE IF NOT EXISTS images (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sha256 TEXT UNIQUE NOT NULL,
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS messages (
+            channel_username TEXT NOT NULL,
+            message_id INTEGER NOT NULL,
+            photo_id INTEGER,
+            image_id INTEGER NOT NULL REFERENCES images(id),
+            PRIMARY KEY (channel_username, message_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_messages_photo_id ON messages (photo_id);
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            photo_id INTEGER NOT NULL
+        );
+        """)
+
+    def close(self):
+        """ Close the underlying SQLite connection. """
+        self.connection.close()
+
+    @staticmethod
+    def hash_bytes(data):
+        """ Return the SHA-256 hex digest used as the image's identity. """
+        return hashlib.sha256(data).hexdigest()
+
+    def has_message(self, channel_username, message_id):
+        """ Return True if this channel message has already been recorded. """
+        row = self.connection.execute(
+            "SELECT 1 FROM messages WHERE channel_username = ? AND message_id = ?",
+            (channel_username, message_id)
+        ).fetchone()
+        return row is not None
+
+    def find_photo(self, photo_id):
+        """ Return (sha256, path, size) of a Telegram photo ID seen before, or None. """
+        return self.connection.execute(
+            "SELECT images.sha256, images.path, images.size FROM messages "
+            "JOIN images ON images.id = messages.image_id WHERE messages.photo_id = ?",
+            (photo_id,)
+        ).fetchone()
+
+    def find_hash(self, sha256):
+        """ Return the stored path of an image with this content hash, or None. """
+        row = self.connection.execute("SELECT path FROM images WHERE sha256 = ?", (sha256,)).fetchone()
+        return row[0] if row else None
+
+    def start_file(self, path, photo_id):
+        """ Note which Telegram photo is about to be written to path, before the file exists. """
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO files (path, photo_id) VALUES (?, ?)", (path, photo_id))
+
+    def file_photo(self, path):
+        """ Return the Telegram photo ID last written to path, or None if the manifest never saw it. """
+        row = self.connection.execute("SELECT photo_id FROM files WHERE path = ?", (path,)).fetchone()
+        return row[0] if row else None
+
+    def record(self, channel_username, message_id, photo_id, sha256, path, size):
+        """ Record a message's image, adding the image itself if its hash is new. Returns the stored path. """
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO images (sha256, path, size) VALUES (?, ?, ?)",
+                (sha256, path, size)
+            )
+            image_id, stored_path = self.connection.execute(
+                "SELECT id, path FROM images WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO messages (channel_username, message_id, photo_id, image_id) VALUES (?, ?, ?, ?)",
+                (channel_username, message_id, photo_id, image_id)
+            )
+        return stored_path
+
+    def import_directory(self, image_dir, extensions=IMAGE_EXTENSIONS):
+        """ Add the images of a directory that the manifest has no path or hash for yet.
+
+        A one-time import for images downloaded before the manifest existed, so
+        the detection stage sees them as new. No message is recorded, since the
+        file does not say which message it came from. Returns the number of
+        images added.
+        """
+        known_paths = {path for path, in self.connection.execute("SELECT path FROM images")}
+        added = 0
+        for file_name in sorted(os.listdir(image_dir)):
+            path = os.path.join(image_dir, file_name)
+            if path in known_paths or os.path.splitext(file_name)[1].lower() not in extensions:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            with self.connection:
+                cursor = self.connection.execute(
+                    "INSERT OR IGNORE INTO images (sha256, path, size) VALUES (?, ?, ?)",
+                    (self.hash_bytes(data), path, len(data))
+                )
+            added += cursor.rowcount
+        return added
+
+    def new_images(self, after_id=0):
+        """ Return (id, path, sha256) for every distinct image added after the given image id. """
+        return self.connection.execute(
+            "SELECT id, path, sha256 FROM images WHERE id > ? ORDER BY id", (after_id,)
+        ).fetchall()
+
+    def stats(self):
+        """ Return counts of distinct images and of messages that referenced them. """
+        images = self.connection.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+        messages = self.connection.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        return {'images': images, 'messages': messages}
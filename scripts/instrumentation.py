@@ -0,0 +1,133 @@
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from functools import wraps
+from itertools import count
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, ProcessCollector, generate_latest, CONTENT_TYPE_LATEST
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# One JSON object per finished stage, for log shippers and offline analysis
+METRICS_LOG_PATH = os.getenv('PIPELINE_METRICS_LOG', '../logs/pipeline_metrics.jsonl')
+# Per-row debug messages are emitted once every LOG_SAMPLE_EVERY occurrences
+LOG_SAMPLE_EVERY = int(os.getenv('LOG_SAMPLE_EVERY', 1000))
+
+# Own registry of this process's stage metrics; other processes (e.g. the API) read the metrics log instead
+REGISTRY = CollectorRegistry()
+ProcessCollector(registry=REGISTRY)
+
+STAGE_SECONDS = Histogram(
+    'pipeline_stage_duration_seconds', 'Wall time of a pipeline stage run', ['stage', 'status'],
+    buckets=(0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600, float('inf')), registry=REGISTRY
+)
+STAGE_ROWS = Counter('pipeline_stage_rows', 'Rows processed by a pipeline stage', ['stage'], registry=REGISTRY)
+STAGE_ROWS_PER_SECOND = Gauge('pipeline_stage_rows_per_second', 'Throughput of the last run of a stage', ['stage'], registry=REGISTRY)
+PEAK_RSS = Gauge('process_peak_rss_bytes', 'Peak resident set size of this process', registry=REGISTRY)
+
+metrics_logger = logging.getLogger('pipeline.metrics')
+_sample_counters = {}
+
+def peak_rss_bytes():
+    """ Return the peak resident set size of this process in bytes, or None where unsupported. """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Linux reports KiB
+
+def _metrics_handler():
+    """ Attach the JSON-lines file handler to the metrics logger on first use. """
+    if not metrics_logger.handlers and METRICS_LOG_PATH:
+        os.makedirs(os.path.dirname(METRICS_LOG_PATH) or '.', exist_ok=True)
+        handler = logging.FileHandler(METRICS_LOG_PATH, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        metrics_logger.addHandler(handler)
+        metrics_logger.setLevel(logging.INFO)
+
+def log_event(event, **fields):
+    """ Write one structured JSON log line to the metrics log (and the root log handlers). """
+    _metrics_handler()
+    metrics_logger.info(json.dumps({'ts': round(time.time(), 3), 'event': event, **fields}, default=str))
+
+class Stage:
+    """ Mutable record of a running stage; set rows (or call add_rows) and extra fields while it runs. """
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.rows = 0
+        self.fields = fields
+
+    def add_rows(self, rows):
+        self.rows += rows
+
+@contextmanager
+def track_stage(name, **fields):
+    """ Time a pipeline stage and record its rows, throughput and peak RSS.
+
+    On exit the stage is added to the Prometheus metrics and written as one
+    JSON log line with status 'ok' or 'error'; exceptions are re-raised.
+    """
+    stage = Stage(name, fields)
+    status = 'ok'
+    start = time.perf_counter()
+    try:
+        yield stage
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        rows_per_sec = stage.rows / seconds if seconds > 0 else 0.0
+        peak_rss = peak_rss_bytes()
+
+        STAGE_SECONDS.labels(name, status).observe(seconds)
+        STAGE_ROWS.labels(name).inc(stage.rows)
+        if status == 'ok':
+            STAGE_ROWS_PER_SECOND.labels(name).set(rows_per_sec)
+        if peak_rss is not None:
+            PEAK_RSS.set(peak_rss)
+
+        log_event(
+            'stage', stage=name, status=status, seconds=round(seconds, 4), rows=stage.rows,
+            rows_per_sec=round(rows_per_sec, 1), peak_rss_bytes=peak_rss, **stage.fields
+        )
+
+def timed_stage(name, rows=None):
+    """ Decorator running a function inside track_stage; rows maps its return value to a row count. """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with track_stage(name) as stage:
+                result = function(*args, **kwargs)
+                if rows is not None:
+                    stage.rows = int(rows(result))
+                return result
+        return wrapper
+    return decorator
+
+def log_sampled(key, message, *args, every=None, logger=None):
+    """ Log a per-row message at DEBUG level, once every `every` calls for the same key.
+
+    message is formatted %-style with args only when it is emitted, and the
+    level check comes first, so a disabled debug log costs one comparison per row.
+    """
+    logger = logger or logging.getLogger()
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    counter = _sample_counters.setdefault(key, count(1))
+    seen = next(counter)
+    every = every or LOG_SAMPLE_EVERY
+    if seen == 1 or seen % every == 0:
+        logger.debug(f"{message} [sampled: occurrence {seen}, 1 in {every}]", *args)
+
+def render_metrics():
+    """ Return (body, content type) of the metrics in the Prometheus text format. """
+    peak_rss = peak_rss_bytes()
+    if peak_rss is not None:
+        PEAK_RSS.set(peak_rss)
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
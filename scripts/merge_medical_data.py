@@ -1,6 +1,14 @@
 import pandas as pd
 import logging
+import glob
 import os
+import argparse
+import hashlib
+import io
+import json
+from parquet_store import write_layer, remove_run_files, clear_layer, export_csv, PARQUET_DIR
+from instrumentation import timed_stage
+from channel_registry import load_channels, REGISTRY_PATH
 
 # Ensure logs folder exists
 os.makedirs("../logs", exist_ok=True)
@@ -15,11 +23,52 @@ logging.basicConfig(
     ]
 )
 
-def load_csv(file_path):
-    """ Load CSV file into a Pandas DataFrame. """
+# Raw per-channel CSVs written by telegram_scrape.py
+DATA_DIR = '../src/data/raw_data/'
+# Fingerprint of every input at its last merge
+MANIFEST_PATH = '../src/data/last_id/merge_manifest.json'
+
+# Declared raw schema (telegram_scrape.CSV_HEADER); Date stays text and is typed by the Parquet layer
+RAW_COLUMNS = ['Channel Title', 'Channel Username', 'ID', 'Message', 'Date']
+RAW_DTYPES = {
+    'Channel Title': 'string',
+    'Channel Username': 'string',
+    'ID': 'Int64',
+    'Message': 'string',
+    'Date': 'string'
+}
+# Bytes read per step when hashing an input
+HASH_BLOCK_SIZE = 1 << 20
+
+def get_channel_paths(data_dir, channel_file):
+    """ Return a channel's CSV plus the per-run partitions telegram_scrape.py appends, oldest first. """
+    stem, extension = os.path.splitext(channel_file)
+    paths = sorted(glob.glob(os.path.join(data_dir, f"{stem}_*{extension}")))
+    file_path = os.path.join(data_dir, channel_file)
+    if os.path.exists(file_path) or not paths:
+        paths.insert(0, file_path)
+    return paths
+
+def load_csv(file_path, offset=0, size=None):
+    """ Load a raw channel CSV with the declared RAW_DTYPES.
+
+    With offset, only the rows appended after that byte position are read;
+    with size, bytes from that position on (written after the file was
+    fingerprinted) are left for the next merge.
+    Raises ValueError when the header does not match RAW_COLUMNS.
+    """
     try:
-        df = pd.read_csv(file_path)
-        logging.info(f"✅ CSV file '{file_path}' loaded successfully.")
+        with open(file_path, 'rb') as f:
+            header = pd.read_csv(f, nrows=0).columns.tolist()
+            if header != RAW_COLUMNS:
+                raise ValueError(f"Unexpected columns {header}, expected {RAW_COLUMNS}")
+            f.seek(offset)
+            data = io.BytesIO(f.read() if size is None else f.read(size - offset))
+        if offset:
+            df = pd.read_csv(data, header=None, names=RAW_COLUMNS, dtype=RAW_DTYPES)
+        else:
+            df = pd.read_csv(data, dtype=RAW_DTYPES)
+        logging.info(f"✅ CSV file '{file_path}' loaded successfully ({len(df)} rows from byte {offset}).")
         return df
     except Exception as e:
         logging.error(f"❌ Error loading CSV file: {e}")
@@ -35,35 +84,175 @@ def save_merged_data(df, output_path):
         logging.error(f"❌ Error saving merged data: {e}")
         raise
 
-def main():
+def load_manifest(manifest_path=MANIFEST_PATH):
+    """ Return the merge manifest: input file name -> fingerprint at its last merge. """
+    try:
+        with open(manifest_path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_manifest(manifest, manifest_path=MANIFEST_PATH):
+    """ Atomically replace the merge manifest so a crash never leaves it half written. """
+    os.makedirs(os.path.dirname(manifest_path) or '.', exist_ok=True)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, manifest_path)
+
+def hash_file(file_path, size, prefix_size=None):
+    """ Return (sha256 of the first prefix_size bytes, sha256 of the first size bytes) in one pass. """
+    prefix_hash, full_hash = hashlib.sha256(), hashlib.sha256()
+    position = 0
+    with open(file_path, 'rb') as f:
+        while position < size:
+            block = f.read(min(HASH_BLOCK_SIZE, size - position))
+            if not block:
+                break
+            if prefix_size is not None and position < prefix_size:
+                prefix_hash.update(block[:prefix_size - position])
+            full_hash.update(block)
+            position += len(block)
+    return prefix_hash.hexdigest(), full_hash.hexdigest()
+
+def complete_size(file_path, size):
+    """ Return the end of the last complete CSV record within the first size bytes.
+
+    A scraper still appending may have flushed half a row; its bytes are left
+    for the next merge. A record ends at a newline outside quotes, i.e. one
+    preceded by an even number of '"' (an escaped '""' counts twice).
+    """
+    quotes = 0
+    with open(file_path, 'rb') as f:
+        position = 0
+        while position < size:
+            block = f.read(min(HASH_BLOCK_SIZE, size - position))
+            if not block:
+                size = position
+                break
+            quotes += block.count(b'"')
+            position += len(block)
+
+        # Walk back over the trailing newlines until one lies outside quotes
+        end = size
+        while end > 0:
+            start = max(0, end - HASH_BLOCK_SIZE)
+            f.seek(start)
+            block = f.read(end - start)
+            newline = len(block)
+            while True:
+                newline = block.rfind(b'\n', 0, newline)
+                if newline < 0:
+                    break
+                if (quotes - block.count(b'"', newline)) % 2 == 0:
+                    return start + newline + 1
+            quotes -= block.count(b'"')
+            end = start
+    return 0
+
+def plan_input(file_path, entry):
+    """ Decide how to merge one input given its manifest entry.
+
+    Returns (action, offset, fingerprint) where fingerprint is the input's new
+    manifest entry without its row count. action is 'unchanged' when size and
+    mtime (or, for a touched file, the hash) match, 'append' from offset when
+    the file only grew past its previous contents, otherwise 'new' or
+    'rewrite' from the start. The size only covers complete records, so a
+    row cut off mid-write is merged once the rest of it is on disk.
+    """
+    stat = os.stat(file_path)
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return 'unchanged', entry['size'], {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': entry['sha256']}
+    fingerprint = {'size': complete_size(file_path, stat.st_size), 'mtime_ns': stat.st_mtime_ns}
+    prefix_size = entry['size'] if entry and fingerprint['size'] > entry['size'] else None
+    prefix_sha256, fingerprint['sha256'] = hash_file(file_path, fingerprint['size'], prefix_size)
+    if entry and fingerprint['sha256'] == entry['sha256']:
+        return 'unchanged', entry['size'], fingerprint
+    if prefix_size is not None and prefix_sha256 == entry['sha256']:
+        return 'append', entry['size'], fingerprint
+    return ('rewrite' if entry else 'new'), 0, fingerprint
+
+def run_id_prefix(file_name):
+    """ Parquet run_id prefix of every segment merged from one input file. """
+    return f"{os.path.splitext(file_name)[0]}--"
+
+@timed_stage('merge', rows=lambda stats: stats['rows'])
+def merge_incremental(data_dir=DATA_DIR, base_dir=PARQUET_DIR, manifest_path=MANIFEST_PATH, registry_path=REGISTRY_PATH, full=False):
+    """ Merge new and changed channel CSVs into the Parquet 'merged' layer.
+
+    Each input's size, mtime and SHA-256 are kept in the manifest. Unchanged
+    inputs are skipped without being read, inputs that only grew have just
+    their appended bytes parsed, and rewritten inputs replace their earlier
+    rows. Every input segment is written under its own run_id, so re-running
+    after a crash replaces a segment instead of duplicating it. Without a
+    manifest (or with full=True) the layer is rebuilt from scratch.
+    Returns a dict of input and row counts.
+    """
+    manifest = {} if full else load_manifest(manifest_path)
+    if not manifest:
+        clear_layer('merged', base_dir)
+    stats = {'unchanged': 0, 'new': 0, 'append': 0, 'rewrite': 0, 'removed': 0, 'rows': 0}
     try:
-        data_dir = '../src/data/raw_data/'
-        channels = [
-            'DoctorsET_data.csv',
-            'CheMed123_data.csv',
-            'lobelia4cosmetics_data.csv',
-            'yetenaweg_data.csv',
-            'EAHCI_data.csv'
+        file_paths = [
+            path for channel in load_channels(registry_path)
+            for path in get_channel_paths(data_dir, channel.csv_file) if os.path.exists(path)
         ]
 
-        # Load data for each channel
-        dfs = []
-        for channel in channels:
-            file_path = os.path.join(data_dir, channel)
-            df = load_csv(file_path)
-            dfs.append(df)
+        # Inputs deleted from disk take their rows with them
+        current = {os.path.basename(path) for path in file_paths}
+        for file_name in [name for name in manifest if name not in current and not os.path.exists(os.path.join(data_dir, name))]:
+            remove_run_files('merged', run_id_prefix(file_name), base_dir)
+            del manifest[file_name]
+            stats['removed'] += 1
+
+        for file_path in file_paths:
+            file_name = os.path.basename(file_path)
+            action, offset, fingerprint = plan_input(file_path, manifest.get(file_name))
+            stats[action] += 1
+            if action == 'unchanged':
+                manifest[file_name].update(fingerprint)  # Skip re-hashing a touched file next time
+                continue
+
+            if action == 'rewrite':
+                remove_run_files('merged', run_id_prefix(file_name), base_dir)
+            segment = f"{run_id_prefix(file_name)}{offset}"
+            remove_run_files('merged', f"{segment}-", base_dir)  # Left over from an interrupted run
+            df = load_csv(file_path, offset, fingerprint['size'])
+            if len(df):
+                write_layer(df, 'merged', base_dir=base_dir, run_id=segment)
 
-        # Merge all data
-        merged_df = pd.concat(dfs, ignore_index=True)
-        logging.info("✅ All channels merged successfully.")
+            rows = len(df) + (manifest[file_name]['rows'] if action == 'append' else 0)
+            manifest[file_name] = dict(fingerprint, rows=rows)
+            save_manifest(manifest, manifest_path)
+            stats['rows'] += len(df)
+
+        save_manifest(manifest, manifest_path)
+        logging.info(f"✅ Incremental merge completed: {stats}.")
+        return stats
+    except Exception as e:
+        logging.error(f"❌ Error in incremental merge: {e}")
+        raise
+
+def main(csv_export=False, full=False):
+    try:
+        # Merge only the channel files that changed since the last run
+        stats = merge_incremental(full=full)
+        print(f"✅ Merged {stats['rows']} new rows ({stats['new']} new, {stats['append']} appended, "
+              f"{stats['rewrite']} rewritten, {stats['unchanged']} unchanged inputs).")
 
-        # Save the merged data
-        output_path = '../src/data/merged_medical_data.csv'
-        save_merged_data(merged_df, output_path)
+        # The CSV copy of the whole layer is only written on request
+        if csv_export:
+            export_csv('merged', '../src/data/merged_medical_data.csv')
 
     except Exception as e:
         logging.error(f"❌ Error in main function: {e}")
         raise
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Incrementally merge the per-channel CSVs into the Parquet 'merged' layer.")
+    parser.add_argument("--csv", action="store_true", help="Also write ../src/data/merged_medical_data.csv")
+    parser.add_argument("--full", action="store_true", help="Ignore the manifest and rebuild the layer from every input")
+    args = parser.parse_args()
+    main(csv_export=args.csv, full=args.full)
@@ -0,0 +1,278 @@
+import os
+import numpy as np
+
+# Signatures of every message clustered so far, matched against by the next run
+SIGNATURES_PATH = '../src/data/near_duplicates/signatures.npz'
+
+# Estimated Jaccard similarity of the messages' shingle sets above which they share a cluster
+DEFAULT_THRESHOLD = 0.8
+# MinHash values per message; more is more accurate and 4 bytes per value larger
+DEFAULT_NUM_PERM = 64
+# Characters per shingle
+DEFAULT_SHINGLE_SIZE = 5
+# Messages hashed per step; keeps the per-shingle arrays of the permutation loop in the CPU cache
+HASH_BATCH_SIZE = 1_000
+
+# Separator used to encode a whole batch as one string
+TEXT_SEPARATOR = "\x00"
+SPACE = 32
+
+# Word characters (\w) of the Basic Multilingual Plane, looked up by codepoint; the last entry stands for everything above
+WORD_CHARACTERS = np.array([chr(c).isalnum() or c == ord("_") for c in range(0x10000)] + [False])
+
+# Multiplier of the polynomial rolling hash over a shingle's codepoints
+SHINGLE_BASE = np.uint64(0x100000001B3)
+
+def encode_texts(texts):
+    """ Normalize texts into one codepoint array; returns (codepoints, length of each text).
+
+    Texts are casefolded and reduced to their words separated by single
+    spaces, so edits in case, spacing and punctuation do not change the
+    shingles. The whole batch is processed as one array; missing texts are empty.
+    """
+    if not texts:
+        return np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.int64)
+    texts = [text.replace(TEXT_SEPARATOR, "") if isinstance(text, str) else "" for text in texts]
+    codepoints = np.frombuffer(TEXT_SEPARATOR.join(texts).casefold().encode("utf-32-le"), dtype=np.uint32)
+    separator = codepoints == 0
+    word = WORD_CHARACTERS[np.minimum(codepoints, len(WORD_CHARACTERS) - 1)]
+    # Keep words, separators and the first non-word character after a word, as a space
+    keep = word | separator
+    keep[1:] |= word[:-1]
+    codepoints = np.where(word | separator, codepoints, SPACE)[keep]
+    # Drop the space left at the end of a text
+    trailing = codepoints == SPACE
+    trailing[:-1] &= codepoints[1:] == 0
+    codepoints = codepoints[~trailing]
+
+    boundaries = np.flatnonzero(codepoints == 0)
+    lengths = np.diff(np.concatenate([[-1], boundaries, [len(codepoints)]])) - 1
+    return codepoints[codepoints != 0], lengths
+
+def select_texts(codepoints, lengths, rows):
+    """ Return (codepoints, lengths) of the texts numbered rows, from encode_texts output. """
+    starts = np.cumsum(lengths) - lengths
+    selected = lengths[rows]
+    offsets = np.cumsum(selected) - selected
+    positions = np.arange(selected.sum()) + np.repeat(starts[rows] - offsets, selected)
+    return codepoints[positions], selected
+
+def shingle_hashes(codepoints, lengths, shingle_size=DEFAULT_SHINGLE_SIZE):
+    """ Return (64-bit hashes of every character shingle of the texts, number of shingles per text).
+
+    A rolling polynomial hash runs over all positions of the batch at once and
+    only windows inside one text are kept. Texts shorter than shingle_size are
+    padded with spaces to one shingle.
+    """
+    padded = np.maximum(lengths, shingle_size)
+    if (padded != lengths).any():
+        starts = np.cumsum(lengths) - lengths
+        padded_starts = np.cumsum(padded) - padded
+        buffer = np.full(padded.sum(), SPACE, dtype=np.uint32)
+        buffer[np.arange(lengths.sum()) + np.repeat(padded_starts - starts, lengths)] = codepoints
+        codepoints, lengths = buffer, padded
+    codepoints = codepoints.astype(np.uint64)
+
+    windows = len(codepoints) - shingle_size + 1
+    hashes = np.zeros(windows, dtype=np.uint64)
+    for offset in range(shingle_size):
+        hashes = hashes * SHINGLE_BASE + codepoints[offset:offset + windows]
+
+    # Window positions of each text: its start up to its end minus shingle_size
+    counts = lengths - shingle_size + 1
+    starts = np.cumsum(lengths) - lengths
+    positions = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+    return hashes[positions], counts
+
+def lsh_params(threshold, num_perm):
+    """ Return the (bands, rows) split of num_perm MinHash values whose LSH S-curve best fits threshold.
+
+    Minimizes the probability mass of false positives below the threshold plus
+    false negatives above it, as datasketch does.
+    """
+    similarity = np.linspace(0, 1, 1001)
+    below = similarity < threshold
+    best, best_error = None, None
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            candidate = 1 - (1 - similarity ** rows) ** bands
+            error = (candidate[below].sum() + (1 - candidate[~below]).sum()) / len(similarity)
+            if best_error is None or error < best_error:
+                best, best_error = (bands, rows), error
+    return best
+
+class NearDuplicateIndex:
+    """ MinHash signatures of the messages seen so far, bucketed by LSH band, with their cluster ids.
+
+    A new message is compared only with the first message of each band bucket
+    it falls in (one per band), so assigning n messages costs O(n * bands)
+    rather than comparing all pairs. It joins the cluster of the most similar
+    candidate whose estimated similarity reaches the threshold, or starts a new
+    one. Cluster ids of messages already in the index never change.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM, shingle_size=DEFAULT_SHINGLE_SIZE, seed=1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+
+        # One hash function per permutation on the 32-bit shingle values: (a * x + b) mod 2**32 with a odd,
+        # then h ^ (h >> 16) so the high bits reach the low ones. 32-bit arithmetic halves the memory traffic
+        rng = np.random.default_rng(seed)
+        self.multipliers = rng.integers(0, 2 ** 31, num_perm, dtype=np.uint32) * np.uint32(2) + np.uint32(1)
+        self.increments = rng.integers(0, 2 ** 32, num_perm, dtype=np.uint32)
+        self.band_multipliers = rng.integers(1, 2 ** 63, self.rows, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self.cluster_ids = np.empty(0, dtype=np.int64)
+        self.next_cluster_id = 0
+        # Per band: sorted bucket keys and the index of the first message in each bucket
+        self.buckets = [(np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)) for _ in range(self.bands)]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def signatures_of(self, codepoints, lengths):
+        """ Return the (len(lengths), num_perm) uint32 MinHash signatures of texts from encode_texts. """
+        signatures = np.empty((len(lengths), self.num_perm), dtype=np.uint32)
+        ends = np.cumsum(lengths)
+        for start in range(0, len(lengths), HASH_BATCH_SIZE):
+            stop = min(start + HASH_BATCH_SIZE, len(lengths))
+            first = ends[start - 1] if start else 0
+            hashes, counts = shingle_hashes(codepoints[first:ends[stop - 1]], lengths[start:stop], self.shingle_size)
+            values = ((hashes ^ (hashes >> np.uint64(32))) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+            offsets = np.cumsum(counts) - counts
+            permuted, shifted = np.empty_like(values), np.empty_like(values)
+            for permutation in range(self.num_perm):
+                # In place: no temporaries allocated per permutation
+                np.multiply(values, self.multipliers[permutation], out=permuted)
+                np.add(permuted, self.increments[permutation], out=permuted)
+                np.right_shift(permuted, np.uint32(16), out=shifted)
+                np.bitwise_xor(permuted, shifted, out=permuted)
+                signatures[start:stop, permutation] = np.minimum.reduceat(permuted, offsets)
+        return signatures
+
+    def band_keys(self, signatures):
+        """ Hash each band of rows MinHash values into one uint64 bucket key; returns (n, bands). """
+        bands = signatures[:, :self.bands * self.rows].astype(np.uint64).reshape(len(signatures), self.bands, self.rows)
+        return (bands * self.band_multipliers).sum(axis=2)
+
+    def _bucket(self, band_keys, first_new):
+        """ Add band keys of messages numbered from first_new; return the first message of each one's buckets. """
+        representatives = np.empty(band_keys.shape, dtype=np.int64)
+        for band, (keys, firsts) in enumerate(self.buckets):
+            unique_keys, first_index, inverse = np.unique(band_keys[:, band], return_index=True, return_inverse=True)
+            position = np.searchsorted(keys, unique_keys)
+            found = position < len(keys)
+            found[found] = keys[position[found]] == unique_keys[found]
+
+            bucket_firsts = first_new + first_index
+            bucket_firsts[found] = firsts[position[found]]
+            representatives[:, band] = bucket_firsts[inverse]
+            # Insert the new buckets at their binary-search positions to keep the keys sorted
+            self.buckets[band] = (
+                np.insert(keys, position[~found], unique_keys[~found]),
+                np.insert(firsts, position[~found], bucket_firsts[~found])
+            )
+        return representatives
+
+    def assign(self, keys, texts):
+        """ Return the cluster id of each message; -1 where the text is missing or has no words.
+
+        keys identify messages (e.g. hashed channel and message id): messages
+        already in the index keep their cluster id and are not added again.
+        """
+        keys = np.asarray(keys, dtype=np.uint64)
+        texts = list(texts)
+        cluster_ids = np.full(len(keys), -1, dtype=np.int64)
+
+        order = np.argsort(self.keys)
+        position = np.searchsorted(self.keys, keys, sorter=order) if len(self.keys) else np.zeros(len(keys), dtype=np.int64)
+        known = position < len(self.keys)
+        known[known] = self.keys[order[position[known]]] == keys[known]
+        cluster_ids[known] = self.cluster_ids[order[position[known]]]
+
+        # First occurrence of each new key with text; repeats of a key in the batch share its cluster
+        unknown = np.flatnonzero(~known)
+        codepoints, lengths = encode_texts([texts[row] for row in unknown.tolist()])
+        candidates = unknown[lengths > 0]
+        _, first = np.unique(keys[candidates], return_index=True)
+        first = np.sort(first)
+        rows = candidates[first]
+        if not len(rows):
+            return cluster_ids
+
+        signatures = self.signatures_of(*select_texts(codepoints, lengths, np.flatnonzero(lengths > 0)[first]))
+        first_new = len(self.keys)
+        representatives = self._bucket(self.band_keys(signatures), first_new)
+
+        # Estimated similarity to each band's representative, counting only messages seen before this one
+        numbers = first_new + np.arange(len(rows))
+        best_similarity = np.full(len(rows), -1.0)
+        parents = np.full(len(rows), -1, dtype=np.int64)
+        for band in range(self.bands):
+            representative = representatives[:, band]
+            earlier = representative < numbers
+            if not earlier.any():
+                continue
+            old = representative < first_new
+            compared = np.empty((len(rows), self.num_perm), dtype=np.uint32)
+            compared[old] = self.signatures[representative[old]]
+            compared[~old] = signatures[representative[~old] - first_new]
+            similarity = np.where(earlier, (compared == signatures).mean(axis=1), -1.0)
+            better = similarity > best_similarity
+            best_similarity[better], parents[better] = similarity[better], representative[better]
+
+        new_cluster_ids = np.empty(len(rows), dtype=np.int64)
+        matched = best_similarity >= self.threshold
+        for i, parent in enumerate(parents.tolist()):
+            if not matched[i]:
+                new_cluster_ids[i] = self.next_cluster_id
+                self.next_cluster_id += 1
+            elif parent < first_new:
+                new_cluster_ids[i] = self.cluster_ids[parent]
+            else:
+                new_cluster_ids[i] = new_cluster_ids[parent - first_new]
+
+        self.keys = np.concatenate([self.keys, keys[rows]])
+        self.signatures = np.concatenate([self.signatures, signatures])
+        self.cluster_ids = np.concatenate([self.cluster_ids, new_cluster_ids])
+
+        # Spread the new ids to every new row of the batch, repeats of a key included
+        order = np.argsort(keys[rows])
+        cluster_ids[candidates] = new_cluster_ids[order[np.searchsorted(keys[rows], keys[candidates], sorter=order)]]
+        return cluster_ids
+
+    def save(self, path=SIGNATURES_PATH):
+        """ Atomically write the signatures, keys, cluster ids and parameters to an .npz file. """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            keys=self.keys,
+            signatures=self.signatures,
+            cluster_ids=self.cluster_ids,
+            params=np.array([self.num_perm, self.shingle_size, self.seed, self.next_cluster_id], dtype=np.int64)
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=SIGNATURES_PATH, threshold=DEFAULT_THRESHOLD):
+        """ Load an index saved by save(); the threshold may differ from the one it was built with. """
+        with np.load(path) as data:
+            num_perm, shingle_size, seed, next_cluster_id = data['params'].tolist()
+            index = cls(threshold, num_perm=num_perm, shingle_size=shingle_size, seed=seed)
+            index.keys, index.signatures, index.cluster_ids = data['keys'], data['signatures'], data['cluster_ids']
+        index.next_cluster_id = next_cluster_id
+        # The buckets are rebuilt for this threshold's band split; messages keep their order
+        index._bucket(index.band_keys(index.signatures), 0)
+        return index
+
+def load_index(path=SIGNATURES_PATH, threshold=DEFAULT_THRESHOLD):
+    """ Load the index saved at path, or start an empty one if there is none yet. """
+    if path and os.path.exists(path):
+        return NearDuplicateIndex.load(path, threshold)
+    return NearDuplicateIndex(threshold)
@@ -0,0 +1,171 @@
+import logging
+import glob
+import os
+import shutil
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Ensure logs folder exists
+os.makedirs("../logs", exist_ok=True)
+
+# Configure logging to write to file & display in Jupyter Notebook
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[
+        logging.FileHandler("../logs/parquet_store.log", encoding='utf-8'),  # Log to file with UTF-8 encoding
+        logging.StreamHandler()  # Log to Jupyter Notebook output
+    ]
+)
+
+# Root of the Parquet layers; each layer is a hive-partitioned dataset below it
+PARQUET_DIR = '../src/data/parquet'
+
+# Explicit schemas, so dates and IDs are typed once on write instead of re-inferred on every read
+MERGED_SCHEMA = pa.schema([
+    ('Channel Title', pa.string()),
+    ('Channel Username', pa.string()),
+    ('ID', pa.int64()),
+    ('Message', pa.string()),
+    ('Date', pa.timestamp('us', tz='UTC'))
+])
+CLEANED_SCHEMA = pa.schema([
+    ('channel_title', pa.string()),
+    ('channel_username', pa.string()),
+    ('message_id', pa.int64()),
+    ('message', pa.string()),
+    ('message_date', pa.timestamp('us', tz='UTC')),
+    ('emoji_used', pa.string()),
+    ('youtube_links', pa.string()),
+    ('product_name', pa.string()),
+    ('usage_info', pa.string()),
+    ('cluster_id', pa.int64())
+])
+LAYERS = {
+    'merged': (MERGED_SCHEMA, 'Channel Username', 'Date'),
+    'cleaned': (CLEANED_SCHEMA, 'channel_username', 'message_date')
+}
+
+# Partition keys written as directories: channel=<username without @>/month=<YYYY-MM>
+PARTITIONING = ds.partitioning(pa.schema([('channel', pa.string()), ('month', pa.string())]), flavor='hive')
+PARTITION_COLUMNS = ['channel', 'month']
+
+def layer_path(layer, base_dir=PARQUET_DIR):
+    """ Return the directory holding a layer's dataset. """
+    if layer not in LAYERS:
+        raise ValueError(f"Unknown layer '{layer}'; expected one of {sorted(LAYERS)}")
+    return os.path.join(base_dir, layer)
+
+def to_table(df, layer):
+    """ Coerce a DataFrame to the layer's schema and add the channel/month partition columns. """
+    schema, channel_column, date_column = LAYERS[layer]
+    df = df.copy()
+    for field in schema:
+        if field.name not in df:
+            df[field.name] = None
+        if pa.types.is_integer(field.type):
+            df[field.name] = pd.to_numeric(df[field.name], errors='coerce').astype('Int64')
+        elif pa.types.is_timestamp(field.type):
+            df[field.name] = pd.to_datetime(df[field.name], errors='coerce', utc=True, format='ISO8601')
+        else:
+            df[field.name] = df[field.name].astype('string')
+    df['channel'] = df[channel_column].str.strip().str.lstrip('@')
+    df['month'] = df[date_column].dt.strftime('%Y-%m')
+    table_schema = schema.append(pa.field('channel', pa.string())).append(pa.field('month', pa.string()))
+    return pa.Table.from_pandas(df[table_schema.names], schema=table_schema, preserve_index=False)
+
+def write_layer(df, layer, base_dir=PARQUET_DIR, run_id=None):
+    """ Append a DataFrame to a layer as zstd-compressed Parquet, partitioned by channel and month.
+
+    Each call writes new files named after run_id, so earlier runs are never rewritten.
+    Returns the number of rows written.
+    """
+    run_id = run_id or uuid.uuid4().hex[:12]
+    try:
+        table = to_table(df, layer)
+        ds.write_dataset(
+            table,
+            layer_path(layer, base_dir),
+            format='parquet',
+            partitioning=PARTITIONING,
+            basename_template=f"part-{run_id}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore',
+            file_options=ds.ParquetFileFormat().make_write_options(compression='zstd')
+        )
+        logging.info(f"✅ {table.num_rows} rows written to the '{layer}' Parquet layer.")
+        return table.num_rows
+    except Exception as e:
+        logging.error(f"❌ Error writing the '{layer}' Parquet layer: {e}")
+        raise
+
+def remove_run_files(layer, run_id_prefix, base_dir=PARQUET_DIR):
+    """ Delete every file of a layer whose run_id starts with run_id_prefix. Returns the number removed. """
+    pattern = os.path.join(glob.escape(layer_path(layer, base_dir)), '*', '*', f"part-{glob.escape(run_id_prefix)}*.parquet")
+    paths = glob.glob(pattern)
+    for path in paths:
+        os.remove(path)
+    return len(paths)
+
+def clear_layer(layer, base_dir=PARQUET_DIR):
+    """ Delete a layer's whole dataset. """
+    shutil.rmtree(layer_path(layer, base_dir), ignore_errors=True)
+
+def layer_dataset(layer, base_dir=PARQUET_DIR):
+    """ Open a layer as a pyarrow dataset with its declared schema and partition keys. """
+    path = layer_path(layer, base_dir)
+    schema = LAYERS[layer][0]
+    return ds.dataset(
+        path,
+        format='parquet',
+        partitioning=PARTITIONING,
+        schema=schema.append(pa.field('channel', pa.string())).append(pa.field('month', pa.string()))
+    )
+
+def read_layer(layer, columns=None, filters=None, base_dir=PARQUET_DIR):
+    """ Load a layer into a DataFrame, reading only the requested columns and matching rows.
+
+    filters is a pyarrow expression or a list of (column, op, value) tuples as in
+    pandas.read_parquet. Filters on the 'channel' and 'month' partition keys skip
+    whole directories; filters on other columns skip row groups by their statistics.
+    The partition keys are only returned when asked for in columns.
+    """
+    try:
+        if filters is not None and not isinstance(filters, ds.Expression):
+            filters = pq.filters_to_expression(filters)
+        dataset = layer_dataset(layer, base_dir)
+        columns = columns or LAYERS[layer][0].names
+        df = dataset.to_table(columns=columns, filter=filters).to_pandas()
+        logging.info(f"✅ {len(df)} rows loaded from the '{layer}' Parquet layer.")
+        return df
+    except Exception as e:
+        logging.error(f"❌ Error reading the '{layer}' Parquet layer: {e}")
+        raise
+
+def iter_layer_batches(layer, batch_size=50000, columns=None, filters=None, base_dir=PARQUET_DIR):
+    """ Yield a layer as DataFrames of at most batch_size rows, for streaming consumers. """
+    if filters is not None and not isinstance(filters, ds.Expression):
+        filters = pq.filters_to_expression(filters)
+    scanner = layer_dataset(layer, base_dir).scanner(
+        columns=columns or LAYERS[layer][0].names, filter=filters, batch_size=batch_size
+    )
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+def export_csv(layer, output_path, columns=None, filters=None, base_dir=PARQUET_DIR):
+    """ Write a layer (or a projection/filter of it) to CSV on demand. Returns the number of rows. """
+    try:
+        rows = 0
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        for df in iter_layer_batches(layer, columns=columns, filters=filters, base_dir=base_dir):
+            df.to_csv(output_path, mode='a', index=False, header=rows == 0)
+            rows += len(df)
+        logging.info(f"✅ {rows} rows of the '{layer}' layer exported to '{output_path}'.")
+        return rows
+    except Exception as e:
+        logging.error(f"❌ Error exporting the '{layer}' layer to CSV: {e}")
+        raise
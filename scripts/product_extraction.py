@@ -0,0 +1,208 @@
+import csv
+import re
+import sys
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from emoji_matcher import character_class
+
+# Product dictionary shared with dbt (`dbt seed` loads it as a table too): canonical name and one alias per row
+SEED_PATH = '../dbt_medical_data/seeds/product_names.csv'
+
+# Words of a message: Latin and Ethiopic letters and digits; hyphens and punctuation split words
+WORD_PATTERN = re.compile(r"\w+")
+# The expressions transform_medical_data.sql used to evaluate in Postgres, compiled once.
+# A dose or count: up to three digits and an optional unit, e.g. '500mg', '20 tablets'
+USAGE_PATTERN = re.compile(r"\d{1,3}\s?[A-Za-z]*", re.ASCII)
+# Fallback product name for messages no dictionary entry matches: the first run of Latin letters and spaces
+LATIN_RUN_PATTERN = re.compile(r"[A-Za-z ]{3,}")
+LATIN_WORD_PATTERN = re.compile(r"[A-Za-z]{3}")
+
+# The same expressions in RE2 syntax, run over the whole message column by Arrow. RE2's \d and \s
+# are ASCII like re.ASCII, except that \s leaves out \v
+ARROW_USAGE_PATTERN = r"(?P<usage_info>[0-9]{1,3}[\t\n\v\f\r ]?[A-Za-z]*)"
+ARROW_LATIN_RUN_PATTERN = r"(?P<product_name>[A-Za-z ]{3,})"
+
+# ASCII and the Ethiopic blocks, the scripts of the product dictionary and of nearly all messages.
+# Within them casefold() only lowercases ASCII letters and \w is a short class, so RE2 can look
+# up the aliases in a whole column
+ARROW_CODEPOINTS = [*range(0x80), *range(0x1200, 0x13A0), *range(0x2D80, 0x2DE0), *range(0xAB00, 0xAB30)]
+ARROW_WORD_CLASS = character_class([c for c in ARROW_CODEPOINTS if WORD_PATTERN.match(chr(c))])
+
+def other_word_codepoints(block_size=1024):
+    """ Return the codepoints outside ARROW_CODEPOINTS that can change a match.
+
+    These are the other word characters, and the few characters whose
+    casefold() contains one (U+0345 folds to 'ι'). Emojis and punctuation are
+    not among them: they separate words under either matcher.
+    """
+    codepoints = np.arange(sys.maxunicode + 1, dtype="<u4")
+    # Every codepoint but the surrogates as one string, decoded in C rather than with one chr() call each
+    text = codepoints[(codepoints < 0xD800) | (codepoints >= 0xE000)].tobytes().decode("utf-32-le")
+    selected = np.zeros(sys.maxunicode + 1, dtype=bool)
+    selected[np.frombuffer("".join(WORD_PATTERN.findall(text)).encode("utf-32-le"), dtype="<u4")] = True
+    for start in range(0, len(text), block_size):
+        block = text[start:start + block_size]
+        if block.casefold() != block:
+            for char in block:
+                if not WORD_PATTERN.match(char) and WORD_PATTERN.search(char.casefold()):
+                    selected[ord(char)] = True
+    selected[ARROW_CODEPOINTS] = False
+    return np.flatnonzero(selected).tolist()
+
+@lru_cache(maxsize=None)
+def other_word_pattern():
+    """ RE2 class of other_word_codepoints(); messages containing any of them are matched in Python.
+
+    Scanning every codepoint takes a noticeable fraction of a second, so it runs
+    on the first column matched rather than in every process importing this module.
+    """
+    return "[" + character_class(other_word_codepoints()) + "]"
+
+# Placeholder clean_messages stores for missing messages; nothing is extracted from it
+NO_MESSAGE = "No Message"
+
+# Marks a trie node where a complete alias ends; holds the canonical product name
+END = ""
+
+def load_aliases(path=SEED_PATH):
+    """ Return {alias: product_name} from the seed file; aliases are matched case-insensitively. """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return {row['alias'].casefold().strip(): row['product_name'].strip() for row in csv.DictReader(f) if row['alias'].strip()}
+
+class ProductMatcher:
+    """ Finds dictionary product names in text with a trie over words.
+
+    Multi-word aliases ('vitamin c', 'ፎሊክ አሲድ') match on whole words and the
+    longest alias starting at a word wins. A regex of the aliases' first words
+    skips the words that cannot start one in C; only the words after a
+    candidate are walked through the trie.
+    """
+
+    def __init__(self, aliases):
+        self.trie = {}
+        for alias, product_name in aliases.items():
+            words = WORD_PATTERN.findall(alias.casefold())
+            if not words:
+                continue
+            node = self.trie
+            for word in words:
+                node = node.setdefault(word, {})
+            node[END] = product_name
+        first_words = "|".join(re.escape(word) for word in sorted(self.trie, key=len, reverse=True))
+        self.first_word_pattern = re.compile(rf"(?<!\w)(?:{first_words or '(?!)'})(?!\w)")
+
+        # The same search as one RE2 alternation for whole columns. Aliases with more words come
+        # first, so at any position the longest one wins, as in the trie walk
+        self.products = {}
+        for alias, product_name in aliases.items():
+            words = WORD_PATTERN.findall(alias.casefold())
+            if words:
+                self.products[" ".join(words)] = product_name
+        alternatives = "|".join(
+            f"[^{ARROW_WORD_CLASS}]+".join(re.escape(word) for word in alias.split(" "))
+            for alias in sorted(self.products, key=lambda alias: (-alias.count(" "), -len(alias), alias))
+        )
+        self.arrow_pattern = (
+            f"(?i)(?:^|[^{ARROW_WORD_CLASS}])(?P<alias>{alternatives})(?:[^{ARROW_WORD_CLASS}]|$)"
+            if alternatives else None
+        )
+
+    @classmethod
+    def from_seed(cls, path=SEED_PATH):
+        return cls(load_aliases(path))
+
+    def iter_matches(self, text):
+        """ Yield the canonical product names mentioned in text, in order of appearance.
+
+        The text is scanned lazily, so a caller that stops at the first product
+        does not scan the rest of the message.
+        """
+        text = text.casefold()
+        find_candidate, search = self.first_word_pattern.search, WORD_PATTERN.search
+        position = 0
+        while True:
+            word = find_candidate(text, position)
+            if word is None:
+                return
+            node = self.trie[word.group()]
+            product_name = node.get(END)
+            end = following = word.end()
+            while True:
+                next_word = search(text, following)
+                if next_word is None:
+                    break
+                node = node.get(next_word.group())
+                if node is None:
+                    break
+                following = next_word.end()
+                if END in node:
+                    product_name, end = node[END], following
+            if product_name is not None:
+                yield product_name
+            position = end
+
+    def match_column(self, texts):
+        """ Return the first product name of every string in an Arrow array as a list (None for no match or null).
+
+        The whole column is searched in one RE2 pass; only the aliases found,
+        and the messages with word characters outside ASCII and Ethiopic, are
+        handled in Python.
+        """
+        if self.arrow_pattern is None:
+            return [None] * len(texts)
+        found = pc.struct_field(pc.extract_regex(texts, self.arrow_pattern), [0])
+        # Each distinct match (the alias's words and whatever separated them in the message) is mapped back once
+        unique = pc.unique(found).drop_null().to_pylist()
+        names = [self.products[" ".join(WORD_PATTERN.findall(alias.casefold()))] for alias in unique]
+        product_names = pc.take(pa.array(names, type=pa.large_string()), pc.index_in(found, pa.array(unique, type=found.type))).to_pylist()
+        other_words = pc.match_substring_regex(texts, other_word_pattern()).to_numpy(zero_copy_only=False)
+        for row in other_words.nonzero()[0].tolist():
+            product_names[row] = self.match(texts[row].as_py())
+        return product_names
+
+    def find_all(self, text):
+        """ Return the canonical product names mentioned in text, in order of appearance. """
+        return list(self.iter_matches(text))
+
+    def match(self, text):
+        """ Return the first product name mentioned in text, or None. """
+        return next(self.iter_matches(text), None)
+
+@lru_cache(maxsize=None)
+def default_matcher(path=SEED_PATH):
+    """ The matcher for the seed file, built once per process. """
+    return ProductMatcher.from_seed(path)
+
+def extract_usage(text):
+    """ Return the first dose or count in text ('500mg', '20 tablets'), or None. """
+    match = USAGE_PATTERN.search(text)
+    return match.group().strip() if match else None
+
+def extract_product_info(messages, matcher=None, empty=(NO_MESSAGE,)):
+    """ Return a DataFrame with the product_name and usage_info of every message.
+
+    product_name is the first dictionary product in the message; messages with
+    none fall back to the first run of Latin letters, as the SQL extraction did.
+    Missing messages and the placeholders in empty get None for both. The
+    column is searched with Arrow's RE2 kernels in a few passes over all
+    messages rather than message by message.
+    """
+    matcher = matcher or default_matcher()
+    texts = pa.array(messages, type=pa.large_string(), from_pandas=True)
+    if isinstance(texts, pa.ChunkedArray):
+        texts = texts.combine_chunks()
+    texts = pc.if_else(pc.is_in(texts, pa.array(empty, type=pa.large_string())), None, texts)
+
+    usage_info = pc.utf8_trim_whitespace(pc.struct_field(pc.extract_regex(texts, ARROW_USAGE_PATTERN), [0]))
+    latin_run = pc.utf8_trim(pc.struct_field(pc.extract_regex(texts, ARROW_LATIN_RUN_PATTERN), [0]), " ")
+    has_latin_word = pc.match_substring_regex(texts, LATIN_WORD_PATTERN.pattern)
+    latin_run = pc.if_else(pc.and_(has_latin_word, pc.not_equal(latin_run, "")), latin_run, None)
+
+    dictionary_names = pa.array(matcher.match_column(texts), type=pa.large_string())
+    return pd.DataFrame({
+        "product_name": pc.coalesce(dictionary_names, latin_run).to_pylist(),
+        "usage_info": usage_info.to_pylist()
+    }, index=messages.index, dtype=object)
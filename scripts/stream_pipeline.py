@@ -0,0 +1,116 @@
+import argparse
+import logging
+import os
+import pandas as pd
+from clean_medical_data import assign_cluster_ids, clean_chunk, message_keys, MessageKeyIndex
+from database_setup import get_db_connection, create_table, insert_data
+from merge_medical_data import DATA_DIR, RAW_DTYPES, get_channel_paths
+from instrumentation import timed_stage
+from channel_registry import load_channels
+from near_duplicates import load_index, DEFAULT_THRESHOLD, SIGNATURES_PATH
+
+# Ensure logs folder exists
+os.makedirs("../logs", exist_ok=True)
+
+# Configure logging to write to file & display in Jupyter Notebook
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[
+        logging.FileHandler("../logs/stream_pipeline.log", encoding='utf-8'),  # Log to file with UTF-8 encoding
+        logging.StreamHandler()  # Log to Jupyter Notebook output
+    ]
+)
+
+# Rows read, cleaned and loaded per step; bounds peak memory
+CHUNK_SIZE = 50000
+
+def iter_raw_chunks(data_dir=DATA_DIR, channel_files=None, chunksize=CHUNK_SIZE):
+    """ Yield raw channel rows in chunks of at most chunksize rows, one file at a time.
+
+    channel_files defaults to the CSVs of the channels in the registry.
+    """
+    if channel_files is None:
+        channel_files = [channel.csv_file for channel in load_channels()]
+    file_paths = [path for channel_file in channel_files for path in get_channel_paths(data_dir, channel_file)]
+    for file_path in file_paths:
+        try:
+            for chunk in pd.read_csv(file_path, chunksize=chunksize, dtype=RAW_DTYPES):
+                yield chunk
+            logging.info(f"✅ CSV file '{file_path}' streamed successfully.")
+        except Exception as e:
+            logging.error(f"❌ Error streaming CSV file '{file_path}': {e}")
+            raise
+
+def _append_csv(df, output_path):
+    """ Append a chunk to a debug CSV, writing the header only for a new file. """
+    df.to_csv(output_path, mode='a', index=False, header=not os.path.exists(output_path))
+
+@timed_stage('stream_pipeline', rows=sum)
+def run_pipeline(engine, data_dir=DATA_DIR, channel_files=None, chunksize=CHUNK_SIZE,
+                 merged_path=None, cleaned_path=None, near_duplicate_index=None):
+    """ Stream raw channel CSVs through cleaning into telegram_medical_messages.
+
+    Only one chunk is held in memory at a time. Duplicate (channel, message ID)
+    pairs are dropped across chunks, matching MedicalDataCleaner.clean_dataframe. merged_path
+    and cleaned_path optionally write the intermediate layers as debug CSVs.
+    With a near_duplicate_index, each chunk's messages get a cluster_id matched
+    against the index, which grows as chunks are loaded. Returns a tuple (inserted, skipped).
+    """
+    for output_path in (merged_path, cleaned_path):
+        if output_path and os.path.exists(output_path):
+            os.remove(output_path)
+
+    seen_keys = MessageKeyIndex()
+    inserted = skipped = rows_read = 0
+    try:
+        for chunk in iter_raw_chunks(data_dir, channel_files, chunksize):
+            rows_read += len(chunk)
+            if merged_path:
+                _append_csv(chunk, merged_path)
+
+            chunk = chunk[seen_keys.add(message_keys(chunk))]
+            if chunk.empty:
+                continue
+
+            cleaned_df = clean_chunk(chunk)
+            if near_duplicate_index is not None:
+                cleaned_df['cluster_id'] = assign_cluster_ids(cleaned_df, near_duplicate_index)
+            if cleaned_path:
+                _append_csv(cleaned_df, cleaned_path)
+
+            chunk_inserted, chunk_skipped = insert_data(engine, cleaned_df)
+            inserted += chunk_inserted
+            skipped += chunk_skipped
+            logging.info(f"✅ Chunk loaded: {rows_read} rows read, {inserted} inserted, {skipped} skipped so far.")
+
+        logging.info(f"✅ Streaming pipeline completed: {rows_read} rows read, {inserted} inserted, {skipped} skipped.")
+        return inserted, skipped
+    except Exception as e:
+        logging.error(f"❌ Streaming pipeline error: {e}")
+        raise
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream raw Telegram channel CSVs into PostgreSQL.")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE, help="Rows per chunk")
+    parser.add_argument("--debug-merged", help="Also write the merged layer to this CSV")
+    parser.add_argument("--debug-cleaned", help="Also write the cleaned layer to this CSV")
+    parser.add_argument("--near-duplicate-threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Estimated similarity at which messages share a cluster_id")
+    parser.add_argument("--signatures", default=SIGNATURES_PATH, help="Near-duplicate signatures carried between runs")
+    args = parser.parse_args()
+
+    index = load_index(args.signatures, args.near_duplicate_threshold)
+    engine = get_db_connection()
+    create_table(engine)
+    run_pipeline(
+        engine,
+        chunksize=args.chunksize,
+        merged_path=args.debug_merged,
+        cleaned_path=args.debug_cleaned,
+        near_duplicate_index=index
+    )
+    index.save(args.signatures)
+
+if __name__ == "__main__":
+    main()
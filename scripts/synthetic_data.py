@@ -0,0 +1,122 @@
+import argparse
+import os
+import random
+import numpy as np
+import pandas as pd
+
+# Vocabulary of the pharmacy and clinic channels, in English and Amharic
+ENGLISH_WORDS = [
+    "Paracetamol", "500mg", "tablets", "available", "now", "Vitamin", "C", "1000mg", "Amoxicillin",
+    "capsules", "syrup", "for", "children", "adults", "price", "birr", "delivery", "Addis", "Ababa",
+    "pharmacy", "open", "24/7", "call", "us", "original", "imported", "cream", "lotion", "sunscreen",
+    "Omeprazole", "20mg", "Ibuprofen", "400mg", "Metformin", "insulin", "glucometer", "strips", "mask"
+]
+AMHARIC_WORDS = [
+    "በቅናሽ", "ዋጋ", "መድሃኒት", "ለልጆች", "ለአዋቂዎች", "አዲስ", "ገብቷል", "ይደውሉ", "ፋርማሲ", "ክሬም",
+    "ቫይታሚን", "በአዲስ", "አበባ", "እናደርሳለን", "ጥራት", "ያለው", "ኦሪጅናል", "ብር", "ቅዳሜ", "እሁድ"
+]
+EMOJIS = ["😊", "💊", "🔥", "✅", "❤️", "📞", "🚚", "👶", "💉", "🩺", "👍🏽", "🇪🇹"]
+LINKS = [
+    "https://youtu.be/dQw4w9WgXcQ", "https://www.youtube.com/watch?v=abc123",
+    "https://youtube.com/shorts/xyz789", "https://t.me/CheMed123"
+]
+PHONES = ["0911234567", "0922345678", "+251911223344"]
+
+# Channels the generated rows are spread over, as in ../config/channels.yaml
+CHANNELS = ['@DoctorsET', '@CheMed123', '@lobelia4cosmetics', '@yetenaweg', '@EAHCI']
+# Distinct message texts; rows draw from this pool so 10M rows do not need 10M Python strings built
+MESSAGE_POOL_SIZE = 50000
+
+def make_message(rng):
+    """ Build one channel post: mixed Amharic/English lines with emojis, a phone number and sometimes a link. """
+    amharic_share = rng.random()
+    words = [
+        rng.choice(AMHARIC_WORDS) if rng.random() < amharic_share else rng.choice(ENGLISH_WORDS)
+        for _ in range(rng.randint(5, 80))
+    ]
+    for _ in range(rng.choice([0, 0, 1, 2, 4])):
+        words.insert(rng.randrange(len(words) + 1), rng.choice(EMOJIS))
+    if rng.random() < 0.3:
+        words.append(rng.choice(PHONES))
+    if rng.random() < 0.1:
+        words.insert(rng.randrange(len(words) + 1), rng.choice(LINKS))
+    for _ in range(rng.randint(0, 3)):
+        words.insert(rng.randrange(len(words) + 1), rng.choice(["\n", "\n\n"]))
+    return " ".join(words)
+
+def make_message_pool(size, seed=42):
+    """ Return an object array of size distinct synthetic messages. """
+    rng = random.Random(seed)
+    return np.array([make_message(rng) for _ in range(size)], dtype=object)
+
+def generate_channel_data(rows, channels=CHANNELS, duplicate_rate=0.02, missing_date_rate=0.01,
+                          missing_message_rate=0.05, months=24, start='2023-01-01', seed=42):
+    """ Generate a raw merged-channel DataFrame shaped like telegram_scrape.py output.
+
+    Message IDs increase with the date inside each channel, duplicate_rate of
+    the rows are re-scraped copies of earlier rows, and Date/Message are
+    missing at the given rates. The columns match merge_medical_data.RAW_COLUMNS.
+    """
+    rng = np.random.default_rng(seed)
+    duplicates = int(rows * duplicate_rate)
+    unique_rows = rows - duplicates
+
+    channel_index = rng.integers(len(channels), size=unique_rows)
+    message_id = pd.Series(channel_index).groupby(channel_index).cumcount().to_numpy() + 1
+    channel_rows = np.bincount(channel_index, minlength=len(channels))
+
+    # Spread each channel's posts evenly over the period, in ID order
+    span_seconds = months * 30 * 86400
+    offsets = (message_id / channel_rows[channel_index] * span_seconds).astype('int64')
+    dates = pd.Timestamp(start, tz='UTC') + pd.to_timedelta(offsets, unit='s')
+    date_text = pd.Series(dates.astype(str), dtype=object)
+    date_text[rng.random(unique_rows) < missing_date_rate] = None
+
+    pool = make_message_pool(min(MESSAGE_POOL_SIZE, max(unique_rows, 1)), seed)
+    messages = pool[rng.integers(len(pool), size=unique_rows)]
+    messages[rng.random(unique_rows) < missing_message_rate] = None
+
+    usernames = np.array(channels, dtype=object)
+    df = pd.DataFrame({
+        'Channel Title': np.array([username[1:] for username in channels], dtype=object)[channel_index],
+        'Channel Username': usernames[channel_index],
+        'ID': message_id,
+        'Message': messages,
+        'Date': date_text.to_numpy()
+    })
+    if duplicates and unique_rows:
+        df = pd.concat([df, df.iloc[rng.integers(unique_rows, size=duplicates)]], ignore_index=True)
+    return df
+
+def write_channel_csvs(df, data_dir):
+    """ Write one raw CSV per channel, named as telegram_scrape.py names them. Returns the paths. """
+    os.makedirs(data_dir, exist_ok=True)
+    paths = []
+    for username, channel_df in df.groupby('Channel Username', sort=False):
+        path = os.path.join(data_dir, f"{username[1:]}_data.csv")
+        channel_df.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+def write_registry(channels, path):
+    """ Write a channel registry listing the given channels. """
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("channels:\n")
+        for username in channels:
+            f.write(f"  - '{username}'\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic raw Telegram channel CSVs.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--output", default="../src/data/synthetic_raw_data", help="Directory for the per-channel CSVs")
+    parser.add_argument("--duplicate-rate", type=float, default=0.02)
+    parser.add_argument("--missing-date-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    df = generate_channel_data(args.rows, duplicate_rate=args.duplicate_rate, missing_date_rate=args.missing_date_rate, seed=args.seed)
+    for path in write_channel_csvs(df, args.output):
+        print(f"✅ {path}")
+
+if __name__ == "__main__":
+    main()
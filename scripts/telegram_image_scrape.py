@@ -1,9 +1,14 @@
 import logging
 from telethon import TelegramClient
+import asyncio
 import os
 import json
+import sys
 from dotenv import load_dotenv
 from telethon.tl.types import MessageMediaPhoto
+from image_manifest import ImageManifest
+from instrumentation import track_stage, log_sampled
+from channel_registry import load_channels, ChannelScheduler, REGISTRY_PATH, SCHEDULE_PATH, UNLIMITED_BACKFILL
 
 # Ensure logs folder exists
 os.makedirs("../logs", exist_ok=True)
@@ -21,6 +26,11 @@ api_id = os.getenv('API_ID')
 api_hash = os.getenv('API_HASH')
 phone_number = os.getenv('PHONE_NUMBER')
 
+# Number of photos downloaded at the same time per channel
+MAX_CONCURRENT_DOWNLOADS = int(os.getenv('DOWNLOAD_CONCURRENCY', 4))
+# Messages scanned per channel per run unless the channel sets backfill_limit; each run resumes after the last checkpoint
+BACKFILL_LIMIT = 100
+
 # Function to get last processed message ID
 def get_last_processed_id(channel_username):
     try:
@@ -37,57 +47,159 @@ def save_last_processed_id(channel_username, last_id):
         json.dump({'last_id': last_id}, f)
         logging.info(f"Saved last processed ID {last_id} for {channel_username}.")
 
-# Function to scrape images from a single channel
-async def scrape_images(client, channel_username, image_dir):
+# Function to get the number of messages to scan for a registered channel, or None for its whole history
+def get_backfill_limit(channel):
+    if channel.backfill_limit is None:
+        return BACKFILL_LIMIT
+    return None if channel.backfill_limit == UNLIMITED_BACKFILL else channel.backfill_limit
+
+# Function to get the byte size of the largest version of a photo, as download_media fetches it
+def get_photo_size(photo):
+    sizes = []
+    for photo_size in getattr(photo, 'sizes', None) or []:
+        if getattr(photo_size, 'sizes', None):  # PhotoSizeProgressive
+            sizes.append(max(photo_size.sizes))
+        elif isinstance(getattr(photo_size, 'size', None), int):
+            sizes.append(photo_size.size)
+    return max(sizes, default=None)
+
+# Function to download one photo unless it is already on disk or in the manifest
+async def download_photo(client, manifest, channel_username, message_id, photo, image_dir):
+    if manifest.has_message(channel_username, message_id):
+        return 'known'
+
+    file_path = os.path.join(image_dir, f"{message_id}.jpg")
+    expected_size = get_photo_size(photo)
+
+    # Same photo already stored (e.g. forwarded within or across channels)
+    known_photo = manifest.find_photo(photo.id)
+    if known_photo and os.path.exists(known_photo[1]):
+        manifest.record(channel_username, message_id, photo.id, *known_photo)
+        return 'duplicate'
+
+    # File left on disk by a run interrupted before it recorded the message; it is kept only if it was
+    # written for this photo and has the photo's size. Files the manifest never saw are downloaded again
+    if (os.path.exists(file_path) and manifest.file_photo(file_path) == photo.id
+            and (expected_size is None or os.path.getsize(file_path) == expected_size)):
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        stored_path = manifest.record(channel_username, message_id, photo.id, manifest.hash_bytes(data), file_path, len(data))
+        if stored_path != file_path:
+            os.remove(file_path)
+            return 'duplicate'
+        return 'existing'
+
+    data = await client.download_media(photo, file=bytes)
+    sha256 = manifest.hash_bytes(data)
+    if manifest.find_hash(sha256) is not None:
+        manifest.record(channel_username, message_id, photo.id, sha256, file_path, len(data))
+        return 'duplicate'
+
+    # The manifest keeps the first path recorded for a hash; a worker or process that stored
+    # the same image in the meantime wins, and this copy is removed
+    manifest.start_file(file_path, photo.id)
+    with open(file_path, 'wb') as f:
+        f.write(data)
+    stored_path = manifest.record(channel_username, message_id, photo.id, sha256, file_path, len(data))
+    if stored_path != file_path:
+        os.remove(file_path)
+        return 'duplicate'
+    log_sampled('downloaded_image', "Downloaded image %s from %s.", file_path, channel_username)
+    return 'downloaded'
+
+# Worker that downloads queued photos until cancelled; the IDs of messages whose download failed are added to failed_ids
+async def download_worker(client, manifest, queue, results, failed_ids):
+    while True:
+        channel_username, message_id, photo, image_dir = await queue.get()
+        try:
+            outcome = await download_photo(client, manifest, channel_username, message_id, photo, image_dir)
+            results[outcome] = results.get(outcome, 0) + 1
+        except Exception as e:
+            results['failed'] = results.get('failed', 0) + 1
+            failed_ids.append(message_id)
+            logging.error(f"Error downloading photo from message {message_id} of {channel_username}: {e}")
+        finally:
+            queue.task_done()
+
+# Function to scrape images from a single channel; message iteration keeps running while downloads are in flight
+async def scrape_images(client, channel_username, image_dir, manifest=None, workers=MAX_CONCURRENT_DOWNLOADS, backfill_limit=BACKFILL_LIMIT):
+    owns_manifest = manifest is None
+    manifest = manifest or ImageManifest()
+    results = {}
+    failed_ids = []
     try:
         entity = await client.get_entity(channel_username)
         last_id = get_last_processed_id(channel_username)
-        
-        # Limit to scraping only 100 messages
-        async for message in client.iter_messages(entity, limit=100, reverse=True):
-            if message.id <= last_id:
-                continue
-            
-            if isinstance(message.media, MessageMediaPhoto):
-                photo = message.media.photo
-                file_path = os.path.join(image_dir, f"{message.id}.jpg")
-                await client.download_media(photo, file_path)
-                logging.info(f"Downloaded image {file_path} from {channel_username}.")
-            
-            last_id = message.id
 
+        queue = asyncio.Queue(maxsize=workers * 4)
+        tasks = [asyncio.create_task(download_worker(client, manifest, queue, results, failed_ids)) for _ in range(workers)]
+        try:
+            # Scan at most backfill_limit messages after the checkpoint
+            async for message in client.iter_messages(entity, limit=backfill_limit, min_id=last_id, reverse=True):
+                if message.id <= last_id:
+                    continue
+
+                if isinstance(message.media, MessageMediaPhoto):
+                    await queue.put((channel_username, message.id, message.media.photo, image_dir))
+
+                last_id = message.id
+
+            await queue.join()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        # Checkpoint only up to the first failed download so the next run retries it;
+        # the messages after it are in the manifest by then and are skipped as known
+        if failed_ids:
+            last_id = min(failed_ids) - 1
+            logging.warning(f"{len(failed_ids)} downloads failed for {channel_username}; retrying from message {last_id + 1} next run.")
         save_last_processed_id(channel_username, last_id)
+        logging.info(f"Image results for {channel_username}: {results}.")
 
     except Exception as e:
         logging.error(f"Error while scraping images from {channel_username}: {e}")
+    finally:
+        if owns_manifest:
+            manifest.close()
+
+    return results
 
 # Initialize the client once with a session file
 client = TelegramClient('scraping_session', api_id, api_hash)
 
-async def main():
+# Function to scrape images from the registered media channels that are due, or all of them with force=True
+async def main(registry_path=REGISTRY_PATH, schedule_path=None, force=False):
     try:
         await client.start(phone_number)
         logging.info("Client started successfully.")
         
-        # Directories to save images
-        chemed123_dir = '../src/data/images/CheMed123_images'
-        lobelia4cosmetics_dir = '../src/data/images/lobelia4cosmetics_images'
-        os.makedirs(chemed123_dir, exist_ok=True)
-        os.makedirs(lobelia4cosmetics_dir, exist_ok=True)
-
-        # Channels to scrape images from
-        channels = {
-            '@CheMed123': chemed123_dir,
-            '@lobelia4cosmetics': lobelia4cosmetics_dir
-        }
+        # Channels to scrape images from: registered channels with fetch_media enabled
+        media_channels = [channel for channel in load_channels(registry_path) if channel.fetch_media]
+        scheduler = ChannelScheduler(schedule_path or SCHEDULE_PATH)
+        channels = media_channels if force else scheduler.due(media_channels, 'images')
+        logging.info(f"{len(channels)} of {len(media_channels)} media channels due for image scraping.")
         
-        for channel, image_dir in channels.items():
-            await scrape_images(client, channel, image_dir)
-            logging.info(f"Scraped images from {channel}.")
+        # One manifest for all channels, so a photo reposted elsewhere is stored once
+        manifest = ImageManifest()
+        try:
+            for channel in channels:
+                os.makedirs(channel.image_dir, exist_ok=True)
+                with track_stage('scrape_images', channel=channel.username) as stage:
+                    results = await scrape_images(client, channel.username, channel.image_dir, manifest=manifest,
+                                                  backfill_limit=get_backfill_limit(channel))
+                    stage.rows = sum(results.values())
+                    stage.fields.update(results)
+                scheduler.mark_run('images', channel)
+                scheduler.save()
+                logging.info(f"Scraped images from {channel.username}.")
+            logging.info(f"Image manifest: {manifest.stats()}.")
+        finally:
+            manifest.close()
 
     except Exception as e:
         logging.error(f"Error in main function: {e}")
 
 if __name__ == "__main__":
-    import asyncio
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main(force='--all' in sys.argv[1:]))
\ No newline at end of file
@@ -1,9 +1,15 @@
 import logging
 from telethon import TelegramClient
+from telethon.errors import FloodWaitError
+import asyncio
 import csv
 import os
 import json
+import time
+import sys
 from dotenv import load_dotenv
+from instrumentation import track_stage
+from channel_registry import load_channels, ChannelScheduler, REGISTRY_PATH, SCHEDULE_PATH, UNLIMITED_BACKFILL
 
 # Set up logging
 logging.basicConfig(
@@ -18,6 +24,23 @@ api_id = os.getenv('API_ID')
 api_hash = os.getenv('API_HASH')
 phone_number = os.getenv('PHONE_NUMBER')
 
+# Maximum number of channels scraped at the same time
+MAX_CONCURRENT_CHANNELS = int(os.getenv('SCRAPE_CONCURRENCY', 3))
+# Maximum number of due channels scraped per run (unset: all due channels)
+MAX_CHANNELS_PER_RUN = int(os.getenv('SCHEDULE_MAX_CHANNELS', 0)) or None
+# Number of times a channel is retried after Telegram asks us to wait
+MAX_FLOOD_RETRIES = 3
+
+# Messages fetched per channel per run unless the channel sets backfill_limit; each run resumes
+# after the last checkpoint. Passing None to scrape_channel backfills the whole remaining history.
+BACKFILL_LIMIT = 1000
+# Messages written between flushes of the output file
+FLUSH_EVERY = 100
+# Messages written between last-ID checkpoints
+CHECKPOINT_EVERY = 500
+
+CSV_HEADER = ['Channel Title', 'Channel Username', 'ID', 'Message', 'Date']
+
 # Function to get last processed message ID
 def get_last_processed_id(channel_username):
     try:
@@ -27,48 +50,110 @@ def get_last_processed_id(channel_username):
         logging.warning(f"No last ID file found for {channel_username}. Starting from 0.")
         return 0
 
-# Function to save last processed message ID
+# Function to save last processed message ID atomically (write a temp file, then rename)
 def save_last_processed_id(channel_username, last_id):
-    with open(f"{channel_username}_last_id.json", 'w') as f:
+    path = f"{channel_username}_last_id.json"
+    with open(f"{path}.tmp", 'w') as f:
         json.dump({'last_id': last_id}, f)
-        logging.info(f"Saved last processed ID {last_id} for {channel_username}.")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{path}.tmp", path)
+    logging.debug(f"Saved last processed ID {last_id} for {channel_username}.")
+
+# Function to get the number of messages to fetch for a registered channel, or None for its whole history
+def get_backfill_limit(channel):
+    if channel.backfill_limit is None:
+        return BACKFILL_LIMIT
+    return None if channel.backfill_limit == UNLIMITED_BACKFILL else channel.backfill_limit
 
-# Function to scrape data from a single channel
-async def scrape_channel(client, channel_username, data_dir):
+# Function to build the per-run output file of a channel, e.g. DoctorsET_data_20250202T101500Z.csv
+# Raw data stays CSV so rows can be appended as they arrive; merge_medical_data converts it to Parquet once
+def get_run_output_path(data_dir, channel_username, run_id):
+    return os.path.join(data_dir, f"{channel_username[1:]}_data_{run_id}.csv")
+
+# Function to scrape data from a single channel, streaming messages to disk as they arrive
+async def scrape_channel(client, channel_username, data_dir, run_id=None, backfill_limit=BACKFILL_LIMIT):
     try:
         entity = await client.get_entity(channel_username)
         channel_title = entity.title
-        
+
         last_id = get_last_processed_id(channel_username)
-        
-        # Limit to scraping only 1000 messages
-        messages = []
-        async for message in client.iter_messages(entity, limit=1000, reverse=True):
-            if message.id <= last_id:
-                continue
-            messages.append(message)
-        
-        filename = os.path.join(data_dir, f"{channel_username[1:]}_data.csv")
-        with open(filename, 'w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow(['Channel Title', 'Channel Username', 'ID', 'Message', 'Date'])
-            for message in reversed(messages):
+        run_id = run_id or time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+        filename = get_run_output_path(data_dir, channel_username, run_id)
+
+        count = 0
+        file = None
+        # Size of the output file up to the last saved checkpoint
+        checkpoint_offset = 0
+        try:
+            async for message in client.iter_messages(entity, limit=backfill_limit, min_id=last_id, reverse=True):
+                if message.id <= last_id:
+                    continue
+                if file is None:
+                    # Append-only; the file is only created once there is something to write
+                    is_new_file = not os.path.exists(filename)
+                    file = open(filename, 'a', newline='', encoding='utf-8')
+                    writer = csv.writer(file)
+                    if is_new_file:
+                        writer.writerow(CSV_HEADER)
+                    checkpoint_offset = file.tell()
+
                 writer.writerow([channel_title, channel_username, message.id, message.message, message.date])
-                logging.info(f"Processed message ID {message.id} from {channel_username}.")
                 last_id = message.id
+                count += 1
 
-        save_last_processed_id(channel_username, last_id)
+                if count % CHECKPOINT_EVERY == 0:
+                    # Data must be on disk before the checkpoint moves past it
+                    file.flush()
+                    os.fsync(file.fileno())
+                    save_last_processed_id(channel_username, last_id)
+                    checkpoint_offset = file.tell()
+                    logging.debug(f"Processed {count} messages from {channel_username} (last ID {last_id}).")
+                elif count % FLUSH_EVERY == 0:
+                    file.flush()
+        except BaseException:
+            # The retry or the next run fetches again from the checkpoint; drop the rows written
+            # after it so they are not stored twice
+            if file is not None:
+                file.truncate(checkpoint_offset)
+            raise
+        finally:
+            if file is not None:
+                file.close()
 
-        if not messages:
+        if count:
+            save_last_processed_id(channel_username, last_id)
+        else:
             logging.info(f"No new messages found for {channel_username}.")
 
+        return count
+
+    except FloodWaitError:
+        raise
     except Exception as e:
         logging.error(f"Error while scraping {channel_username}: {e}")
 
+# Function to scrape a channel under the concurrency limit, backing off on flood waits
+async def scrape_channel_with_backoff(client, channel_username, data_dir, semaphore, max_retries=MAX_FLOOD_RETRIES, run_id=None, backfill_limit=BACKFILL_LIMIT):
+    start = time.perf_counter()
+    for attempt in range(1, max_retries + 2):
+        try:
+            async with semaphore:
+                with track_stage('scrape_messages', channel=channel_username) as stage:
+                    count = await scrape_channel(client, channel_username, data_dir, run_id=run_id, backfill_limit=backfill_limit)
+                    stage.rows = count or 0
+            return count, time.perf_counter() - start
+        except FloodWaitError as e:
+            if attempt > max_retries:
+                raise
+            logging.warning(f"Flood wait of {e.seconds}s for {channel_username} (retry {attempt}/{max_retries}).")
+            await asyncio.sleep(e.seconds)
+
 # Initialize the client once with a session file
 client = TelegramClient('scraping_session', api_id, api_hash)
 
-async def main():
+# Function to scrape the registered channels that are due, or all of them with force=True
+async def main(registry_path=REGISTRY_PATH, schedule_path=None, force=False):
     try:
         await client.start(phone_number)
         logging.info("Client started successfully.")
@@ -76,21 +161,34 @@ async def main():
         data_dir = '../src/data/raw_data'
         os.makedirs(data_dir, exist_ok=True)
 
-        channels = [
-            '@DoctorsET',
-            '@CheMed123',
-            '@lobelia4cosmetics',
-            '@yetenaweg',
-            '@EAHCI'
-        ]
+        # Channels come from the registry; the scheduler skips those scraped within their interval
+        registered = load_channels(registry_path)
+        scheduler = ChannelScheduler(schedule_path or SCHEDULE_PATH)
+        channels = registered if force else scheduler.due(registered, 'messages', limit=MAX_CHANNELS_PER_RUN)
+        logging.info(f"{len(channels)} of {len(registered)} registered channels due for scraping.")
         
-        for channel in channels:
-            await scrape_channel(client, channel, data_dir)
-            logging.info(f"Scraped data from {channel}.")
+        # Scrape channels concurrently; one failing channel does not cancel the others
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_CHANNELS)
+        run_id = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+        results = await asyncio.gather(
+            *(scrape_channel_with_backoff(client, channel.username, data_dir, semaphore, run_id=run_id,
+                                          backfill_limit=get_backfill_limit(channel))
+              for channel in channels),
+            return_exceptions=True
+        )
+
+        for channel, result in zip(channels, results):
+            if isinstance(result, BaseException):
+                logging.error(f"Failed to scrape {channel.username}: {result}")
+            else:
+                count, elapsed = result
+                if count is not None:  # scrape_channel returns None after logging its own error
+                    scheduler.mark_run('messages', channel)
+                logging.info(f"Scraped data from {channel.username}: {count or 0} messages in {elapsed:.2f}s.")
+        scheduler.save()
 
     except Exception as e:
         logging.error(f"Error in main function: {e}")
 
 if __name__ == "__main__":
-    import asyncio
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main(force='--all' in sys.argv[1:]))
\ No newline at end of file
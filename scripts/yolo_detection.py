@@ -0,0 +1,245 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from database_setup import get_db_connection
+from instrumentation import timed_stage
+from image_manifest import ImageManifest, MANIFEST_PATH
+from channel_registry import load_channels, REGISTRY_PATH
+
+# The API package sits next to scripts/; its models and cache are shared with it
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fast_api.models import DetectionData
+from fast_api.cache import CACHE_URL, CACHE_TTL_SECONDS, create_backend
+
+# Ensure logs folder exists
+os.makedirs("../logs", exist_ok=True)
+
+# Configure logging to write to file & display in Jupyter Notebook
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[
+        logging.FileHandler("../logs/yolo_detection.log", encoding='utf-8'),  # Log to file with UTF-8 encoding
+        logging.StreamHandler()  # Log to Jupyter Notebook output
+    ]
+)
+
+# Detection settings, configurable through the environment
+MODEL_PATH = os.getenv('YOLO_MODEL', 'yolov8s.pt')
+BATCH_SIZE = int(os.getenv('DETECTION_BATCH_SIZE', 16))  # Images per model() call
+DECODE_WORKERS = int(os.getenv('DECODE_WORKERS', 4))  # Threads decoding images ahead of inference
+
+# Manifest image id up to which detections have been stored
+CURSOR_PATH = '../src/data/last_id/detection_lastid.json'
+
+# The API's model defines the table, so the API serves what this module writes
+detection_data = DetectionData.__table__
+
+def create_detection_table(engine):
+    """ Create detection_data, and on an existing table any index declared since it was created. """
+    detection_data.create(engine, checkfirst=True)
+    for index in detection_data.indexes:
+        index.create(engine, checkfirst=True)
+
+def invalidate_api_cache(cache_url=CACHE_URL):
+    """ Invalidate the API's cached detection pages after a write.
+
+    Only a shared cache (CACHE_URL) can be reached from this process. An API
+    using its in-process cache serves pages cached before the write until
+    they expire, CACHE_TTL_SECONDS after they were cached.
+    """
+    if not cache_url:
+        logging.debug(f"No shared API cache; cached detection pages expire within {CACHE_TTL_SECONDS:.0f}s.")
+        return
+
+    async def invalidate():
+        backend = create_backend(cache_url)
+        try:
+            await backend.invalidate()
+        finally:
+            await backend.client.aclose()
+
+    try:
+        asyncio.run(invalidate())
+    except Exception as e:
+        logging.warning(f"⚠️ Could not invalidate the API cache: {e}")
+
+def import_existing_images(manifest, registry_path=REGISTRY_PATH):
+    """ Add the images already in the media channels' directories that the manifest does not know.
+
+    Images downloaded before the manifest existed are never recorded by the
+    scraper, whose checkpoint is past their messages; importing them once
+    lets run_detection process them like any new image.
+    Returns the number of images added.
+    """
+    added = 0
+    for channel in load_channels(registry_path):
+        if channel.fetch_media and os.path.isdir(channel.image_dir):
+            added += manifest.import_directory(channel.image_dir)
+    logging.info(f"✅ Imported {added} existing images into the manifest.")
+    return added
+
+def get_last_detected_id(cursor_path=CURSOR_PATH):
+    """ Return the last manifest image id whose detections were stored, or 0. """
+    try:
+        with open(cursor_path, 'r') as f:
+            return json.load(f).get('last_id', 0)
+    except FileNotFoundError:
+        logging.warning("No detection cursor found. Starting from the first image in the manifest.")
+        return 0
+
+def save_last_detected_id(last_id, cursor_path=CURSOR_PATH):
+    """ Atomically replace the detection cursor so a crash never leaves it half written. """
+    os.makedirs(os.path.dirname(cursor_path) or '.', exist_ok=True)
+    tmp_path = f"{cursor_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'last_id': last_id}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, cursor_path)
+
+def load_model(model_path=MODEL_PATH):
+    """ Load the YOLO model. ultralytics (and torch) is imported here because it takes seconds to import. """
+    try:
+        from ultralytics import YOLO
+        model = YOLO(model_path)
+        logging.info(f"✅ Loaded YOLO model '{model_path}'.")
+        return model
+    except Exception as e:
+        logging.error(f"❌ Error loading YOLO model '{model_path}': {e}")
+        raise
+
+def decode_image(image_path):
+    """ Read an image into a BGR array, or None if it is missing or unreadable. """
+    return cv2.imread(image_path)
+
+def prefetch_batches(pool, images, batch_size):
+    """ Yield (batch, frames) pairs while the next batch is already being decoded in the pool.
+
+    At most two batches of decoded frames are held at once: the one being
+    inferred and the one being prefetched.
+    """
+    batches = [images[start:start + batch_size] for start in range(0, len(images), batch_size)]
+    submit = lambda batch: [pool.submit(decode_image, image_path) for _, image_path, _ in batch]
+    pending = submit(batches[0]) if batches else []
+    for index, batch in enumerate(batches):
+        current = pending
+        if index + 1 < len(batches):
+            pending = submit(batches[index + 1])
+        yield batch, [future.result() for future in current]
+
+def extract_boxes(result):
+    """ Return (xyxy, confidence, class_id) numpy arrays for one image's result. """
+    boxes = result.boxes
+    xyxy = boxes.xyxy.cpu().numpy().astype(np.int32)
+    confidence = boxes.conf.cpu().numpy().astype(np.float32)
+    class_id = boxes.cls.cpu().numpy().astype(np.int16)
+    return xyxy, confidence, class_id
+
+def boxes_to_rows(image_path, boxes, class_names):
+    """ Turn one image's box arrays into detection_data rows. """
+    xyxy, confidence, class_id = boxes
+    return [
+        {
+            'bounding_box': box,
+            'confidence': score,
+            'class_id': cls,
+            'class_name': class_names[cls],
+            'image_path': image_path
+        }
+        for box, score, cls in zip(xyxy.tolist(), confidence.tolist(), class_id.tolist())
+    ]
+
+def store_detections(engine, image_paths, rows):
+    """ Replace the detections of these images with rows in one transaction.
+
+    Deleting first makes a batch safe to re-run if the cursor was not saved
+    after its previous attempt.
+    """
+    with engine.begin() as connection:
+        connection.execute(detection_data.delete().where(detection_data.c.image_path.in_(image_paths)))
+        if rows:
+            connection.execute(detection_data.insert(), rows)
+
+@timed_stage('detect', rows=lambda stats: stats['images'])
+def run_detection(model, engine, manifest, batch_size=BATCH_SIZE, workers=DECODE_WORKERS, cursor_path=CURSOR_PATH):
+    """ Detect objects in every manifest image added since the cursor and bulk-write the boxes.
+
+    Frames are decoded in a thread pool one batch ahead of inference, each
+    model() call receives a whole batch, and only compact box arrays are kept
+    per image. The cursor advances and the API cache is invalidated after
+    every stored batch.
+    Returns a dict with image, detection and throughput counts.
+    """
+    last_id = get_last_detected_id(cursor_path)
+    images = manifest.new_images(last_id)
+    stats = {'images': 0, 'unreadable': 0, 'detections': 0, 'images_per_sec': 0.0}
+    if not images:
+        logging.info(f"✅ No new images after manifest id {last_id}.")
+        return stats
+
+    logging.info(f"Detecting objects in {len(images)} new images (batch size {batch_size}, {workers} decode workers).")
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for batch, frames in prefetch_batches(pool, images, batch_size):
+                readable = []
+                for (_, image_path, _), frame in zip(batch, frames):
+                    if frame is None:
+                        logging.warning(f"Skipping unreadable image '{image_path}'.")
+                    else:
+                        readable.append((image_path, frame))
+
+                rows = []
+                if readable:
+                    results = model([frame for _, frame in readable], verbose=False)
+                    for (image_path, _), result in zip(readable, results):
+                        rows.extend(boxes_to_rows(image_path, extract_boxes(result), model.names))
+
+                store_detections(engine, [image_path for _, image_path, _ in batch], rows)
+                save_last_detected_id(batch[-1][0], cursor_path)
+                invalidate_api_cache()
+
+                stats['images'] += len(readable)
+                stats['unreadable'] += len(batch) - len(readable)
+                stats['detections'] += len(rows)
+                elapsed = time.perf_counter() - start
+                logging.info(f"✅ Batch stored: {stats['images']} images, {stats['detections']} detections, "
+                             f"{stats['images'] / elapsed:.1f} images/sec.")
+
+        stats['images_per_sec'] = round(stats['images'] / (time.perf_counter() - start), 2)
+        logging.info(f"✅ Detection completed: {stats}.")
+        return stats
+    except Exception as e:
+        logging.error(f"❌ Detection error: {e}")
+        raise
+
+def main():
+    parser = argparse.ArgumentParser(description="Run YOLO detection on new images and store the boxes in PostgreSQL.")
+    parser.add_argument("--model", default=MODEL_PATH, help="YOLO weights to load")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Images per inference call")
+    parser.add_argument("--workers", type=int, default=DECODE_WORKERS, help="Threads decoding images ahead of inference")
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="Image manifest written by telegram_image_scrape")
+    parser.add_argument("--rescan", action="store_true", help="First add the images of the channels' image directories that are not in the manifest")
+    args = parser.parse_args()
+
+    engine = get_db_connection()
+    create_detection_table(engine)
+    model = load_model(args.model)
+    manifest = ImageManifest(args.manifest)
+    try:
+        if args.rescan:
+            import_existing_images(manifest)
+        run_detection(model, engine, manifest, batch_size=args.batch_size, workers=args.workers)
+    finally:
+        manifest.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import unittest
+import os
+import tempfile
+from benchmark_suite import run_suite, append_history, load_history, find_baseline, compare_runs
+
+class TestBenchmarkSuite(unittest.TestCase):
+
+    def test_run_suite(self):
+        run = run_suite(500, benchmarks=['clean', 'merge', 'insert'])
+        self.assertEqual((run['rows'], run['backend']), (500, 'sqlite'))
+        for name in ['generate', 'clean_dataframe', 'clean_messages', 'extract_product_info', 'merge_full', 'merge_unchanged', 'insert_data']:
+            self.assertGreater(run['results'][name]['seconds'], 0)
+        self.assertEqual(run['results']['merge_full']['rows'], 500)
+        self.assertEqual(run['results']['insert_data']['inserted'], run['results']['insert_data']['rows'])
+
+    def test_history_and_regressions(self):
+        def make_run(rows, seconds, commit):
+            return {'rows': rows, 'backend': 'sqlite', 'workers': 1, 'commit': commit,
+                    'results': {'clean_dataframe': {'seconds': seconds}, 'insert_data': {'seconds': 1.0}}}
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            history_path = os.path.join(tmp_dir, 'benchmarks', 'history.json')
+            append_history(make_run(1000, 1.0, 'aaa'), history_path)
+            append_history(make_run(5000, 9.0, 'bbb'), history_path)
+            history = load_history(history_path)
+            self.assertEqual(len(history), 2)
+
+            run = make_run(1000, 1.5, 'ccc')
+            baseline = find_baseline(run, history)
+            self.assertEqual(baseline['commit'], 'aaa')
+            rows = {name: regressed for name, _, _, _, regressed in compare_runs(run, baseline, threshold=0.1)}
+            self.assertEqual(rows, {'clean_dataframe': True, 'insert_data': False})
+            self.assertIsNone(find_baseline(make_run(42, 1.0, 'ddd'), history))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+from channel_registry import Channel, ChannelScheduler, load_channels
+
+class TestChannelRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.registry_path = os.path.join(self.tmp_dir.name, 'channels.yaml')
+        self.schedule_path = os.path.join(self.tmp_dir.name, 'state', 'channel_schedule.json')
+        self.now = datetime(2025, 2, 2, 12, 0, tzinfo=timezone.utc)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_registry(self, content):
+        with open(self.registry_path, 'w') as f:
+            f.write(content)
+
+    def test_load_channels(self):
+        self.write_registry(
+            "channels:\n"
+            "  - '@DoctorsET'\n"
+            "  - username: '@CheMed123'\n"
+            "    fetch_media: true\n"
+            "    scrape_interval_minutes: 30\n"
+            "  - username: '@EAHCI'\n"
+            "    enabled: false\n"
+        )
+        channels = load_channels(self.registry_path)
+        self.assertEqual([channel.username for channel in channels], ['@DoctorsET', '@CheMed123'])
+        self.assertEqual(channels[1].csv_file, 'CheMed123_data.csv')
+        self.assertEqual(channels[1].image_dir, '../src/data/images/CheMed123_images')
+        self.assertTrue(channels[1].fetch_media)
+        self.assertEqual(channels[1].scrape_interval, timedelta(minutes=30))
+        self.assertEqual(len(load_channels(self.registry_path, include_disabled=True)), 3)
+
+    def test_load_channels_rejects_invalid(self):
+        self.write_registry("channels:\n  - '@DoctorsET'\n  - '@DoctorsET'\n")
+        with self.assertRaises(ValueError):
+            load_channels(self.registry_path)
+        self.write_registry("channels:\n  - username: DoctorsET\n")
+        with self.assertRaises(ValueError):
+            load_channels(self.registry_path)
+        self.write_registry("channels:\n  - username: '@DoctorsET'\n    interval: 5\n")
+        with self.assertRaises(ValueError):
+            load_channels(self.registry_path)
+        self.write_registry("channels:\n  - username: '@DoctorsET'\n    backfill_limit: 0\n")
+        with self.assertRaises(ValueError):
+            load_channels(self.registry_path)
+
+    def test_project_registry(self):
+        channels = load_channels()
+        self.assertEqual(len(channels), 5)
+        self.assertEqual([channel.username for channel in channels if channel.fetch_media], ['@CheMed123', '@lobelia4cosmetics'])
+
+    def test_due_channels(self):
+        hourly = Channel('@hourly', scrape_interval_minutes=60)
+        daily = Channel('@daily', scrape_interval_minutes=1440)
+        urgent = Channel('@urgent', scrape_interval_minutes=60, priority=5)
+        channels = [hourly, daily, urgent]
+
+        scheduler = ChannelScheduler(self.schedule_path)
+        self.assertEqual(scheduler.due(channels, 'messages', now=self.now), [urgent, hourly, daily])
+        self.assertEqual(scheduler.due(channels, 'messages', now=self.now, limit=1), [urgent])
+
+        for channel in channels:
+            scheduler.mark_run('messages', channel, when=self.now)
+        scheduler.save()
+
+        scheduler = ChannelScheduler(self.schedule_path)
+        self.assertEqual(scheduler.due(channels, 'messages', now=self.now + timedelta(minutes=30)), [])
+        self.assertEqual(scheduler.due(channels, 'messages', now=self.now + timedelta(hours=2)), [urgent, hourly])
+        self.assertEqual(scheduler.due(channels, 'images', now=self.now), [urgent, hourly, daily])
+
+if __name__ == "__main__":
+    unittest.main()
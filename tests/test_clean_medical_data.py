@@ -3,7 +3,8 @@ from unittest.mock import patch, MagicMock, mock_open
 import pandas as pd
 import os
 import logging
-from clean_medical_data import MedicalDataCleaner
+import tempfile
+from clean_medical_data import MedicalDataCleaner, clean_messages, message_keys, MessageKeyIndex
 
 class TestMedicalDataCleaner(unittest.TestCase):
 
@@ -75,5 +76,147 @@ class TestMedicalDataCleaner(unittest.TestCase):
         mock_clean_dataframe.assert_called_once()
         mock_save_cleaned_data.assert_called_once_with(output_path)
 
+    def test_clean_messages(self):
+        messages = pd.Series([
+            "Hello 😊\n\nWorld https://youtu.be/dQw4w9WgXcQ",
+            None,
+            "No links here",
+            "💊💊 Paracetamol\n500mg 🔥"
+        ])
+        cleaned = clean_messages(messages)
+        self.assertEqual(cleaned['message'].tolist(), ["Hello  World", "No Message", "No links here", "Paracetamol 500mg"])
+        self.assertEqual(cleaned['emoji_used'].tolist(), ["😊", "No emoji", "No emoji", "💊💊🔥"])
+        self.assertEqual(cleaned['youtube_links'].tolist(), ["https://youtu.be/dQw4w9WgXcQ", "No YouTube link", "No YouTube link", "No YouTube link"])
+
+    def test_clean_messages_multi_codepoint_emojis(self):
+        messages = pd.Series(["👍🏽 Original 🇪🇹\nproducts ❤️", "#️⃣1 only"])
+        cleaned = clean_messages(messages)
+        self.assertEqual(cleaned['message'].tolist(), ["Original  products", "1 only"])
+        self.assertEqual(cleaned['emoji_used'].tolist(), ["👍🏽🇪🇹❤️", "#️⃣"])
+
+    def test_emoji_frequencies(self):
+        cleaner = MedicalDataCleaner(df=pd.DataFrame({'Message': ["💊 👍🏽", None, "💊"]}))
+        self.assertEqual(cleaner.emoji_frequencies(), {"💊": 2, "👍🏽": 1})
+
+    def test_clean_messages_matches_per_row_methods(self):
+        cleaner = MedicalDataCleaner(df=pd.DataFrame())
+        messages = pd.Series([
+            "😊 a\nb https://www.youtube.com/watch?v=x😊y ©", "\n\n", "  ❤  ", "🇪🇹 👩‍⚕️\n5️⃣",
+            "💊 a 🔥 b ❤", "👍🏽 skin tone only", "# 1 ™", "you😊tu.be https://you😊tu.be/x", "ዋጋ\u3000"
+        ])
+        cleaned = clean_messages(messages)
+        for index, text in messages.items():
+            text = cleaner.clean_text(text)
+            self.assertEqual(cleaned.loc[index, 'emoji_used'], cleaner.extract_emojis(text))
+            text = cleaner.remove_emojis(text)
+            self.assertEqual(cleaned.loc[index, 'youtube_links'], cleaner.extract_youtube_links(text))
+            self.assertEqual(cleaned.loc[index, 'message'], cleaner.remove_youtube_links(text))
+
+    def test_clean_messages_chunked_column(self):
+        # Concatenated string columns are backed by several Arrow chunks
+        messages = pd.concat([pd.Series(["a 😊"], dtype="str"), pd.Series([None, "b\n\nc"], dtype="str")], ignore_index=True)
+        cleaned = clean_messages(messages)
+        self.assertEqual(cleaned['message'].tolist(), ['a', 'No Message', 'b c'])
+        self.assertEqual(cleaned['emoji_used'].tolist(), ['😊', 'No emoji', 'No emoji'])
+
+    def test_clean_dataframe(self):
+        df = pd.DataFrame({
+            'Channel Title': [' Channel 1 ', ' Channel 1 ', 'Channel 2'],
+            'Channel Username': ['@channel1', '@channel1', '@channel2'],
+            'ID': [1, 1, 2],
+            'Message': ['Hello 😊', 'Hello 😊', None],
+            'Date': ['2025-02-02 10:00:00+00:00', '2025-02-02 10:00:00+00:00', None]
+        })
+        cleaner = MedicalDataCleaner(df=df)
+        cleaner.clean_dataframe()
+        self.assertEqual(len(cleaner.df), 2)
+        self.assertEqual(cleaner.df['channel_title'].tolist(), ['Channel 1', 'Channel 2'])
+        self.assertEqual(cleaner.df['message'].tolist(), ['Hello', 'No Message'])
+        self.assertEqual(cleaner.df['emoji_used'].tolist(), ['😊', 'No emoji'])
+        self.assertEqual(cleaner.df['youtube_links'].tolist(), ['No YouTube link', 'No YouTube link'])
+        self.assertEqual(cleaner.df['product_name'].tolist(), ['Hello', None])
+        self.assertEqual(cleaner.df['usage_info'].tolist(), [None, None])
+
+    def test_clean_dataframe_extracts_products(self):
+        df = pd.DataFrame({
+            'Channel Title': ['Channel 1'] * 2,
+            'Channel Username': ['@channel1'] * 2,
+            'ID': [1, 2],
+            'Message': ['ቫይታሚን ሲ 500mg 😊', 'ዋጋ 300 ብር'],
+            'Date': ['2025-02-02 10:00:00+00:00'] * 2
+        })
+        cleaner = MedicalDataCleaner(df=df)
+        cleaner.clean_dataframe()
+        self.assertEqual(cleaner.df['product_name'].tolist(), ['Vitamin C', None])
+        self.assertEqual(cleaner.df['usage_info'].tolist(), ['500mg', '300'])
+
+    def test_clean_dataframe_keeps_same_id_in_other_channels(self):
+        df = pd.DataFrame({
+            'Channel Title': ['Channel 1', 'Channel 2', 'Channel 1'],
+            'Channel Username': ['@channel1', '@channel2', ' @channel1'],
+            'ID': [7, 7, 7],
+            'Message': ['First', 'Other channel', 'Repeat'],
+            'Date': ['2025-02-02 10:00:00'] * 3
+        })
+        cleaner = MedicalDataCleaner(df=df)
+        cleaner.clean_dataframe()
+        self.assertEqual(cleaner.df['channel_username'].tolist(), ['@channel1', '@channel2'])
+        self.assertEqual(cleaner.df['message'].tolist(), ['First', 'Other channel'])
+
+    def test_detect_near_duplicates(self):
+        df = pd.DataFrame({
+            'Channel Title': ['Channel 1'] * 4,
+            'Channel Username': ['@channel1'] * 4,
+            'ID': [1, 2, 3, 4],
+            'Message': [
+                'Paracetamol 500mg tablets now in stock, call 0911 for delivery',
+                'PARACETAMOL 500mg tablets now in stock!! Call 0911 for delivery 😊',
+                'Vitamin C effervescent tablets available at our Bole branch',
+                None
+            ],
+            'Date': ['2025-02-02 10:00:00'] * 4
+        })
+        with tempfile.TemporaryDirectory() as directory:
+            signatures_path = os.path.join(directory, 'signatures.npz')
+            cleaner = MedicalDataCleaner(df=df)
+            cleaner.clean_dataframe()
+            cleaner.detect_near_duplicates(signatures_path=signatures_path)
+            cluster_ids = cleaner.df['cluster_id']
+            self.assertEqual(str(cluster_ids.dtype), 'Int64')
+            self.assertEqual(cluster_ids.iloc[0], cluster_ids.iloc[1])
+            self.assertNotEqual(cluster_ids.iloc[0], cluster_ids.iloc[2])
+            self.assertTrue(pd.isna(cluster_ids.iloc[3]))
+
+            # A later run matches a repost against the saved clusters
+            repost = MedicalDataCleaner(df=df.iloc[[2]].assign(ID=[9], Message=['Vitamin C effervescent tablets available at our Bole branch!']))
+            repost.clean_dataframe()
+            repost.detect_near_duplicates(signatures_path=signatures_path)
+            self.assertEqual(repost.df['cluster_id'].tolist(), [cluster_ids.iloc[2]])
+
+    def test_message_key_index(self):
+        df = pd.DataFrame({'Channel Username': ['@a', '@b', '@a', '@a'], 'ID': [1, 1, 1, '2']})
+        index = MessageKeyIndex()
+        self.assertEqual(index.add(message_keys(df)).tolist(), [True, True, False, True])
+        self.assertEqual(len(index), 3)
+
+        more = pd.DataFrame({'Channel Username': ['@b', '@c'], 'ID': [1, 1]})
+        self.assertEqual(index.add(message_keys(more)).tolist(), [False, True])
+        self.assertTrue((index.keys[:-1] <= index.keys[1:]).all())
+
+    def test_clean_dataframe_parallel(self):
+        df = pd.DataFrame({
+            'Channel Title': ['Channel 1'] * 7,
+            'Channel Username': ['@channel1'] * 7,
+            'ID': [5, 4, 4, 3, 2, 1, 5],
+            'Message': ['Hello 😊', 'a\nb', 'a\nb', None, 'https://youtu.be/x', 'x', 'Hello 😊'],
+            'Date': ['2025-02-02 10:00:00'] * 7
+        })
+        serial = MedicalDataCleaner(df=df)
+        serial.clean_dataframe()
+        parallel = MedicalDataCleaner(df=df)
+        parallel.clean_dataframe(workers=2, chunksize=2)
+        self.assertEqual(parallel.df['message_id'].tolist(), [5, 4, 3, 2, 1])
+        pd.testing.assert_frame_equal(parallel.df, serial.df)
+
 if __name__ == "__main__":
     unittest.main()
@@ -4,7 +4,7 @@ from sqlalchemy import create_engine, text
 import pandas as pd
 import os
 import logging
-from database_setup import get_db_connection, create_table, insert_data
+from database_setup import get_db_connection, create_table, insert_data, bulk_insert_data, backfill_extracted_columns
 
 class TestDatabaseSetup(unittest.TestCase):
 
@@ -21,27 +21,23 @@ class TestDatabaseSetup(unittest.TestCase):
         connection.execute.assert_called_once_with(text("SELECT 1"))
         self.assertEqual(engine, mock_engine)
 
-    @patch('database_setup.create_engine')
-    @patch('database_setup.text')
-    def test_create_table(self, mock_text, mock_create_engine):
+    def test_create_table(self):
         mock_engine = MagicMock()
-        mock_create_engine.return_value = mock_engine
+        mock_engine.dialect.name = 'postgresql'
         connection = MagicMock()
-        mock_engine.connect.return_value.__enter__.return_value = connection
+        mock_engine.connect.return_value.execution_options.return_value.__enter__.return_value = connection
+        connection.execute.return_value.scalar.return_value = True
 
-        create_table(mock_engine)
-        connection.execute.assert_called_once_with(mock_text("""
-            CREATE TABLE IF NOT EXISTS telegram_medical_messages (
-                id SERIAL PRIMARY KEY,
-                channel_title TEXT,
-                channel_username TEXT,
-                message_id BIGINT UNIQUE,
-                message TEXT,
-                message_date TIMESTAMP,
-                emoji_used TEXT,
-                youtube_links TEXT
-            );
-        """))
+        create_table(mock_engine, months_ahead=2)
+        statements = [str(call[0][0]) for call in connection.execute.call_args_list]
+        self.assertIn('PARTITION BY RANGE (message_date)', statements[0])
+        self.assertIn('UNIQUE (channel_username, message_id, message_date)', statements[0])
+        self.assertTrue(any('PARTITION OF telegram_medical_messages DEFAULT' in statement for statement in statements))
+        self.assertTrue(any('(channel_username, message_date)' in statement for statement in statements))
+        self.assertIn("search_vector TSVECTOR GENERATED ALWAYS AS (to_tsvector('simple'", statements[0])
+        self.assertTrue(any('ADD COLUMN IF NOT EXISTS search_vector' in statement for statement in statements))
+        self.assertTrue(any('USING GIN (search_vector)' in statement for statement in statements))
+        self.assertIn("INTERVAL '2 months'", statements[-1])
 
     @patch('database_setup.create_engine')
     @patch('database_setup.text')
@@ -74,8 +70,135 @@ class TestDatabaseSetup(unittest.TestCase):
             'message': 'Test message',
             'message_date': '2025-02-02',
             'emoji_used': '😊',
-            'youtube_links': 'https://youtu.be/dQw4w9WgXcQ'
+            'youtube_links': 'https://youtu.be/dQw4w9WgXcQ',
+            'product_name': None,
+            'usage_info': None,
+            'cluster_id': None
+        })
+
+    def test_bulk_insert_data(self):
+        mock_engine = MagicMock()
+        mock_engine.dialect.name = 'postgresql'
+        raw_connection = mock_engine.raw_connection.return_value
+        cursor = raw_connection.cursor.return_value
+        cursor.rowcount = 2
+
+        cleaned_df = pd.DataFrame({
+            'channel_title': ['Channel 1'] * 3,
+            'channel_username': ['@channel1'] * 3,
+            'message_id': [1, 2, 3],
+            'message': ['Test message'] * 3,
+            'message_date': ['2025-02-02', None, '2025-02-03'],
+            'emoji_used': ['😊'] * 3,
+            'youtube_links': ['No YouTube link'] * 3
+        })
+
+        inserted, skipped = insert_data(mock_engine, cleaned_df, batch_size=2)
+
+        self.assertEqual((inserted, skipped), (2, 1))
+        self.assertEqual(cursor.copy_expert.call_count, 2)
+        first_batch = cursor.copy_expert.call_args_list[0][0][1].getvalue()
+        self.assertIn('\\N', first_batch)
+        executed = [call[0][0] for call in cursor.execute.call_args_list]
+        self.assertIn('create_message_partitions', executed[-2])
+        self.assertIn('NOT EXISTS', executed[-1])
+        self.assertIn('ON CONFLICT DO NOTHING', executed[-1])
+        raw_connection.commit.assert_called_once()
+        raw_connection.close.assert_called_once()
+
+    def test_bulk_insert_data_rolls_back_on_error(self):
+        mock_engine = MagicMock()
+        raw_connection = mock_engine.raw_connection.return_value
+        raw_connection.cursor.return_value.copy_expert.side_effect = Exception('copy failed')
+
+        cleaned_df = pd.DataFrame({column: ['x'] for column in [
+            'channel_title', 'channel_username', 'message', 'emoji_used', 'youtube_links'
+        ]})
+        cleaned_df['message_id'] = [1]
+        cleaned_df['message_date'] = ['2025-02-02']
+
+        with self.assertRaises(Exception):
+            bulk_insert_data(mock_engine, cleaned_df)
+        raw_connection.rollback.assert_called_once()
+        raw_connection.close.assert_called_once()
+
+    def test_insert_data_sqlite_fallback(self):
+        engine = create_engine('sqlite://')
+        create_table(engine)
+
+        cleaned_df = pd.DataFrame({
+            'channel_title': ['Channel 1', 'Channel 1'],
+            'channel_username': ['@channel1', '@channel1'],
+            'message_id': [1, 1],
+            'message': ['Test message', 'Duplicate'],
+            'message_date': ['2025-02-02', None],
+            'emoji_used': ['😊', 'No emoji'],
+            'youtube_links': ['No YouTube link', 'No YouTube link']
         })
 
+        inserted, skipped = insert_data(engine, cleaned_df)
+
+        self.assertEqual((inserted, skipped), (1, 1))
+        with engine.connect() as connection:
+            count = connection.execute(text("SELECT COUNT(*) FROM telegram_medical_messages")).scalar()
+        self.assertEqual(count, 1)
+
+    def test_insert_data_keys_on_channel_and_message_id(self):
+        engine = create_engine('sqlite://')
+        create_table(engine)
+
+        cleaned_df = pd.DataFrame({
+            'channel_title': ['Channel 1', 'Channel 2', 'Channel 2'],
+            'channel_username': ['@channel1', '@channel2', '@channel2'],
+            'message_id': [1, 1, 1],
+            'message': ['Test message', 'Same ID, other channel', 'Duplicate'],
+            'message_date': ['2025-02-02'] * 3,
+            'emoji_used': ['No emoji'] * 3,
+            'youtube_links': ['No YouTube link'] * 3
+        })
+
+        self.assertEqual(insert_data(engine, cleaned_df), (2, 1))
+
+    def test_insert_data_loads_extracted_columns(self):
+        engine = create_engine('sqlite://')
+        create_table(engine)
+
+        cleaned_df = pd.DataFrame({
+            'channel_title': ['Channel 1'],
+            'channel_username': ['@channel1'],
+            'message_id': [1],
+            'message': ['Paracetamol 500mg'],
+            'message_date': ['2025-02-02'],
+            'emoji_used': ['No emoji'],
+            'youtube_links': ['No YouTube link'],
+            'product_name': ['Paracetamol'],
+            'usage_info': ['500mg'],
+            'cluster_id': pd.array([3], dtype='Int64')
+        })
+        insert_data(engine, cleaned_df)
+
+        with engine.connect() as connection:
+            row = connection.execute(text("SELECT product_name, usage_info, cluster_id FROM telegram_medical_messages")).one()
+        self.assertEqual(tuple(row), ('Paracetamol', '500mg', 3))
+
+    def test_backfill_extracted_columns(self):
+        engine = create_engine('sqlite://')
+        create_table(engine)
+        cleaned_df = pd.DataFrame({
+            'channel_title': ['Channel 1'] * 3,
+            'channel_username': ['@channel1'] * 3,
+            'message_id': [1, 2, 3],
+            'message': ['ፓራሲታሞል 20 ፍሬ', 'No Message', 'Amoxicillin capsules'],
+            'message_date': ['2025-02-02'] * 3,
+            'emoji_used': ['No emoji'] * 3,
+            'youtube_links': ['No YouTube link'] * 3
+        })
+        insert_data(engine, cleaned_df)
+
+        self.assertEqual(backfill_extracted_columns(engine, batch_size=2), 2)
+        with engine.connect() as connection:
+            rows = connection.execute(text("SELECT product_name, usage_info FROM telegram_medical_messages ORDER BY message_id")).all()
+        self.assertEqual([tuple(row) for row in rows], [('Paracetamol', '20'), (None, None), ('Amoxicillin', None)])
+
 if __name__ == "__main__":
     unittest.main()
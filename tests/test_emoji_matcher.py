@@ -0,0 +1,48 @@
+import re
+import unittest
+from emoji_matcher import EMOJI_SEQUENCES, SEQUENCE_CLASS, SINGLE_EMOJI_CLASS, build_trie, emoji_frequencies, emoji_spans, find_emojis, split_emojis
+
+class TestEmojiMatcher(unittest.TestCase):
+
+    def test_split_emojis_keeps_sequences_whole(self):
+        found, stripped = split_emojis("Hi 👍🏽 from 🇪🇹 ❤️‍🔥 ❤️ 👨‍👩‍👧")
+        self.assertEqual(found, ["👍🏽", "🇪🇹", "❤️‍🔥", "❤️", "👨‍👩‍👧"])
+        self.assertEqual(stripped, "Hi  from    ")
+
+    def test_split_emojis_without_emojis(self):
+        self.assertEqual(split_emojis("Paracetamol 500mg በቅናሽ ዋጋ"), ([], "Paracetamol 500mg በቅናሽ ዋጋ"))
+        self.assertEqual(split_emojis(""), ([], ""))
+
+    def test_keycaps_and_digits(self):
+        found, stripped = split_emojis("call 0911234567 #️⃣1️⃣ ©2025")
+        self.assertEqual(found, ["#️⃣", "1️⃣", "©"])
+        self.assertEqual(stripped, "call 0911234567  2025")
+
+    def test_longest_match_wins(self):
+        # A skin tone after a base emoji forms one sequence; on its own it is an emoji too
+        self.assertEqual(find_emojis("👍🏽👍 🏽"), ["👍🏽", "👍", "🏽"])
+
+    def test_every_known_sequence_matches_whole(self):
+        for sequence in EMOJI_SEQUENCES:
+            self.assertEqual(emoji_spans(f"a {sequence}1"), [(2, 2 + len(sequence))], repr(sequence))
+
+    def test_single_emoji_class_matches_trie_without_sequence_codepoints(self):
+        self.assertTrue(re.fullmatch(f"[{SEQUENCE_CLASS}]+", "\ufe0f\u200d\u20e3🇪"))
+        self.assertIsNone(re.search(f"[{SEQUENCE_CLASS}]", "🏽#1©"))
+        single_emoji_run = re.compile(f"[{SINGLE_EMOJI_CLASS}]+")
+        for text in ["💊💊 a 🔥", "👍🏽👍 🏽 b", "#1 ©2025 ™", "ዋጋ ☀ c"]:
+            found, stripped = split_emojis(text)
+            self.assertEqual(single_emoji_run.sub("", text), stripped, text)
+            self.assertEqual("".join(single_emoji_run.findall(text)), "".join(found), text)
+
+    def test_build_trie(self):
+        trie = build_trie(["ab", "a"])
+        self.assertIn("", trie["a"])
+        self.assertIn("", trie["a"]["b"])
+
+    def test_emoji_frequencies(self):
+        counts = emoji_frequencies(["💊💊 🇪🇹", None, "🇪", "🇹 💊"])
+        self.assertEqual(counts, {"💊": 3, "🇪🇹": 1})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,363 @@
+import asyncio
+from datetime import date, datetime
+import unittest
+import json
+import os
+from unittest.mock import patch
+import tempfile
+
+# Point the API at a throwaway SQLite database before the app is imported
+TMP_DIR = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = f"sqlite+aiosqlite:///{os.path.join(TMP_DIR.name, 'api.sqlite')}"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert, inspect
+from fast_api.main import app, create_schema
+from fast_api import models
+from fast_api.cache import RedisCache, ResponseCache, TTLCache
+from fast_api.metrics import PIPELINE_STAGES
+
+def make_detection(i):
+    return {
+        'bounding_box': [i, i, i + 10, i + 10],
+        'confidence': 0.5 + i / 100,
+        'class_id': i % 3,
+        'class_name': ['bottle', 'person', 'cup'][i % 3],
+        'image_path': f'images/{i}.jpg'
+    }
+
+class TestFastApi(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.client_context = TestClient(app)
+        cls.client = cls.client_context.__enter__()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client_context.__exit__(None, None, None)
+
+    def test_create_and_read_detection_data(self):
+        created = [self.client.post('/detection_data/', json=make_detection(i)).json() for i in range(3)]
+        self.assertEqual(created[0]['class_name'], 'bottle')
+        self.assertEqual(created[0]['bounding_box'], [0, 0, 10, 10])
+
+        response = self.client.get('/detection_data/', params={'image_path': 'images/1.jpg'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['items'], [created[1]])
+
+    def test_read_detection_data_cursor_pagination(self):
+        created = [
+            self.client.post('/detection_data/', json={**make_detection(i), 'class_name': 'pill'}).json()
+            for i in range(100, 107)
+        ]
+
+        pages = []
+        params = {'class_name': 'pill', 'limit': 3}
+        while True:
+            page = self.client.get('/detection_data/', params=params).json()
+            pages.append(page['items'])
+            if page['next_cursor'] is None:
+                break
+            params['cursor'] = page['next_cursor']
+        self.assertEqual([len(items) for items in pages], [3, 3, 1])
+        self.assertEqual([item for items in pages for item in items], created)
+
+    def test_read_detection_data_min_confidence(self):
+        for i in range(200, 204):
+            self.client.post('/detection_data/', json={**make_detection(i), 'class_name': 'syringe', 'confidence': i / 1000})
+
+        response = self.client.get('/detection_data/', params={'class_name': 'syringe', 'min_confidence': 0.202})
+        self.assertEqual([item['confidence'] for item in response.json()['items']], [0.202, 0.203])
+
+    def test_read_detection_data_invalid_cursor(self):
+        response = self.client.get('/detection_data/', params={'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_create_detection_data_validation(self):
+        response = self.client.post('/detection_data/', json={'confidence': 'high'})
+        self.assertEqual(response.status_code, 422)
+
+    def test_create_detection_data_batch(self):
+        items = [make_detection(300), {'confidence': 'high'}, make_detection(301)]
+        response = self.client.post('/detection_data/batch', json=items)
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual(result['inserted'], 2)
+        self.assertIsNone(result['ids'][1])
+        self.assertLess(result['ids'][0], result['ids'][2])
+        self.assertEqual([error['index'] for error in result['errors']], [1])
+
+        stored = self.client.get('/detection_data/', params={'image_path': 'images/301.jpg'}).json()['items']
+        self.assertEqual(stored[0]['id'], result['ids'][2])
+
+    def test_create_detection_data_batch_ndjson(self):
+        lines = [json.dumps(make_detection(400)), '{not json', '', json.dumps(make_detection(401))]
+        response = self.client.post(
+            '/detection_data/batch',
+            content='\n'.join(lines).encode(),
+            headers={'Content-Type': 'application/x-ndjson'}
+        )
+        result = response.json()
+        self.assertEqual(result['inserted'], 2)
+        self.assertEqual(len(result['ids']), 3)
+        self.assertEqual(result['errors'][0]['index'], 1)
+        self.assertEqual(result['errors'][0]['errors'][0]['type'], 'json_invalid')
+
+    def test_create_detection_data_batch_too_large(self):
+        with patch('fast_api.main.MAX_BATCH_SIZE', 2):
+            response = self.client.post('/detection_data/batch', json=[make_detection(i) for i in range(500, 503)])
+        self.assertEqual(response.status_code, 413)
+        stored = self.client.get('/detection_data/', params={'image_path': 'images/500.jpg'}).json()['items']
+        self.assertEqual(stored, [])
+
+    def test_metrics(self):
+        self.client.get('/detection_data/', params={'limit': 1})
+        self.client.get('/no/such/path')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers['content-type'].startswith('text/plain'))
+        body = response.text
+        self.assertIn('http_requests_total{method="GET",route="/detection_data/",status="200"}', body)
+        self.assertIn('route="unmatched",status="404"', body)
+        self.assertIn('http_request_duration_seconds_bucket', body)
+
+    def test_metrics_pipeline_stages(self):
+        log_path = os.path.join(TMP_DIR.name, 'pipeline_metrics.jsonl')
+        events = [
+            {'event': 'stage', 'stage': 'merge', 'status': 'ok', 'seconds': 0.3, 'rows': 10, 'rows_per_sec': 33.3, 'peak_rss_bytes': 2048},
+            {'event': 'stage', 'stage': 'merge', 'status': 'ok', 'seconds': 2.0, 'rows': 5, 'rows_per_sec': 2.5, 'peak_rss_bytes': 4096},
+            {'event': 'stage', 'stage': 'load', 'status': 'error', 'seconds': 0.05, 'rows': 0, 'rows_per_sec': 0.0, 'peak_rss_bytes': None}
+        ]
+        with open(log_path, 'w') as f:
+            f.writelines(json.dumps(event) + '\n' for event in events)
+            f.write('{"event": "stage", "stage": "merge"')  # Still being written
+
+        with patch.object(PIPELINE_STAGES, 'path', log_path):
+            body = self.client.get('/metrics').text
+            self.assertIn('pipeline_stage_rows_total{stage="merge"} 15.0', body)
+            self.assertIn('pipeline_stage_rows_per_second{stage="merge"} 2.5', body)
+            self.assertIn('pipeline_stage_peak_rss_bytes{stage="merge"} 4096.0', body)
+            self.assertIn('pipeline_stage_duration_seconds_bucket{le="0.5",stage="merge",status="ok"} 1.0', body)
+            self.assertIn('pipeline_stage_duration_seconds_count{stage="merge",status="ok"} 2.0', body)
+            self.assertIn('pipeline_stage_duration_seconds_count{stage="load",status="error"} 1.0', body)
+
+            # Lines appended later are added once the scrape reads them
+            with open(log_path, 'a') as f:
+                f.write(', "status": "ok", "seconds": 1.0, "rows": 5, "rows_per_sec": 5.0}\n')
+            body = self.client.get('/metrics').text
+            self.assertIn('pipeline_stage_rows_total{stage="merge"} 20.0', body)
+
+    def test_read_detection_data_cache(self):
+        self.client.post('/detection_data/', json={**make_detection(600), 'class_name': 'inhaler'})
+        params = {'class_name': 'inhaler'}
+        first = self.client.get('/detection_data/', params=params)
+        second = self.client.get('/detection_data/', params=params)
+        self.assertEqual(first.headers['x-cache'], 'MISS')
+        self.assertEqual(second.headers['x-cache'], 'HIT')
+        self.assertEqual(first.headers['etag'], second.headers['etag'])
+        self.assertEqual(first.json(), second.json())
+
+        not_modified = self.client.get('/detection_data/', params=params, headers={'If-None-Match': first.headers['etag']})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+
+        # A write invalidates the cached pages
+        self.client.post('/detection_data/', json={**make_detection(601), 'class_name': 'inhaler'})
+        third = self.client.get('/detection_data/', params=params)
+        self.assertEqual(third.headers['x-cache'], 'MISS')
+        self.assertEqual(len(third.json()['items']), 2)
+        self.assertNotEqual(third.headers['etag'], first.headers['etag'])
+
+    def test_cache_stats(self):
+        before = self.client.get('/cache/stats').json()
+        self.client.get('/detection_data/', params={'class_name': 'stats-check'})
+        self.client.get('/detection_data/', params={'class_name': 'stats-check'})
+        after = self.client.get('/cache/stats').json()
+        self.assertEqual(after['backend'], 'TTLCache')
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+
+class TestStatsEndpoints(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.client_context = TestClient(app)
+        cls.client = cls.client_context.__enter__()
+        # dbt builds the rollups in production; here they are created and filled directly
+        sync_engine = create_engine(f"sqlite:///{os.path.join(TMP_DIR.name, 'api.sqlite')}")
+        with sync_engine.begin() as connection:
+            models.Base.metadata.create_all(connection, tables=models.ROLLUP_TABLES)
+            connection.execute(insert(models.DailyChannelMessages), [
+                {'channel_username': '@a', 'message_day': date(2025, 1, 6), 'message_count': 5, 'messages_with_emoji': 2,
+                 'messages_with_youtube_links': 1, 'youtube_link_count': 2, 'max_source_id': 5},
+                {'channel_username': '@a', 'message_day': date(2025, 1, 7), 'message_count': 3, 'messages_with_emoji': 0,
+                 'messages_with_youtube_links': 0, 'youtube_link_count': 0, 'max_source_id': 8},
+                {'channel_username': '@b', 'message_day': date(2025, 1, 7), 'message_count': 10, 'messages_with_emoji': 4,
+                 'messages_with_youtube_links': 1, 'youtube_link_count': 1, 'max_source_id': 9}
+            ])
+            connection.execute(insert(models.WeeklyChannelProducts), [
+                {'channel_username': '@a', 'week_start': date(2025, 1, 6), 'product_name': name, 'mentions': mentions, 'max_source_id': 1}
+                for name, mentions in [('Paracetamol', 4), ('Vitamin', 2), ('Insulin', 7)]
+            ])
+            connection.execute(insert(models.DetectionClassCounts), [
+                {'class_name': 'bottle', 'detection_count': 12, 'image_count': 5, 'avg_confidence': 0.8, 'max_detection_id': 40},
+                {'class_name': 'person', 'detection_count': 30, 'image_count': 9, 'avg_confidence': 0.6, 'max_detection_id': 41}
+            ])
+        sync_engine.dispose()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client_context.__exit__(None, None, None)
+
+    def test_create_schema_leaves_rollups_to_dbt(self):
+        sync_engine = create_engine('sqlite://')
+        with sync_engine.begin() as connection:
+            create_schema(connection)
+            self.assertEqual(inspect(connection).get_table_names(), ['detection_data'])
+
+    def test_daily_message_stats(self):
+        response = self.client.get('/stats/messages/daily', params={'channel_username': '@a'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['message_day'] for row in response.json()], ['2025-01-07', '2025-01-06'])
+        self.assertEqual(response.json()[1]['youtube_link_count'], 2)
+
+        response = self.client.get('/stats/messages/daily', params={'start': '2025-01-07', 'limit': 1})
+        self.assertEqual([(row['channel_username'], row['message_count']) for row in response.json()], [('@a', 3)])
+
+    def test_channel_message_stats(self):
+        response = self.client.get('/stats/messages/channels')
+        self.assertEqual([(row['channel_username'], row['message_count']) for row in response.json()], [('@b', 10), ('@a', 8)])
+        self.assertEqual(response.json()[1]['first_day'], '2025-01-06')
+
+        response = self.client.get('/stats/messages/channels', params={'end': '2025-01-06'})
+        self.assertEqual([(row['channel_username'], row['messages_with_emoji']) for row in response.json()], [('@a', 2)])
+
+    def test_weekly_product_stats(self):
+        response = self.client.get('/stats/products/weekly', params={'channel_username': '@a', 'top': 2})
+        self.assertEqual([(row['product_name'], row['mentions']) for row in response.json()], [('Insulin', 7), ('Paracetamol', 4)])
+
+    def test_detection_class_stats(self):
+        response = self.client.get('/stats/detections/classes')
+        self.assertEqual([row['class_name'] for row in response.json()], ['person', 'bottle'])
+        self.assertEqual(response.json()[1]['avg_confidence'], 0.8)
+
+class TestMessageSearch(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.client_context = TestClient(app)
+        cls.client = cls.client_context.__enter__()
+        # database_setup creates and loads the message table in production; here it is created and filled directly
+        sync_engine = create_engine(f"sqlite:///{os.path.join(TMP_DIR.name, 'api.sqlite')}")
+        with sync_engine.begin() as connection:
+            models.TelegramMessage.__table__.create(connection, checkfirst=True)
+            connection.execute(insert(models.TelegramMessage), [
+                {'id': 1, 'channel_username': '@a', 'message_id': 1, 'message': 'Paracetamol 500mg tablets',
+                 'message_date': datetime(2025, 1, 6, 9), 'product_name': 'Paracetamol', 'usage_info': '500mg', 'cluster_id': 1},
+                {'id': 2, 'channel_username': '@b', 'message_id': 1, 'message': 'paracetamol syrup for children',
+                 'message_date': datetime(2025, 1, 7, 23, 30), 'product_name': None, 'usage_info': None, 'cluster_id': None},
+                {'id': 3, 'channel_username': '@a', 'message_id': 2, 'message': 'Face cream',
+                 'message_date': datetime(2025, 1, 7), 'product_name': 'Face Cream', 'usage_info': None, 'cluster_id': 3},
+                {'id': 4, 'channel_username': '@a', 'message_id': 3, 'message': 'Paracetamol in stock',
+                 'message_date': datetime(2025, 2, 1), 'product_name': 'Paracetamol', 'usage_info': None, 'cluster_id': 1}
+            ])
+        sync_engine.dispose()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client_context.__exit__(None, None, None)
+
+    def test_search(self):
+        response = self.client.get('/messages/search', params={'q': 'paracetamol'})
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        self.assertEqual([item['id'] for item in page['items']], [1, 2, 4])
+        self.assertEqual(page['items'][0]['product_name'], 'Paracetamol')
+        self.assertEqual([item['cluster_id'] for item in page['items']], [1, None, 1])
+        self.assertIsNone(page['next_cursor'])
+
+        response = self.client.get('/messages/search', params={'q': 'paracetamol syrup'})
+        self.assertEqual([item['id'] for item in response.json()['items']], [2])
+
+    def test_search_filters(self):
+        response = self.client.get('/messages/search', params={'q': 'paracetamol', 'channel_username': '@a'})
+        self.assertEqual([item['id'] for item in response.json()['items']], [1, 4])
+
+        # end is inclusive of the whole day
+        response = self.client.get('/messages/search', params={'q': 'paracetamol', 'start': '2025-01-07', 'end': '2025-01-07'})
+        self.assertEqual([item['id'] for item in response.json()['items']], [2])
+
+    def test_search_keyset_pagination(self):
+        ids, cursor = [], None
+        while True:
+            params = {'q': 'paracetamol', 'limit': 2, **({'cursor': cursor} if cursor else {})}
+            page = self.client.get('/messages/search', params=params).json()
+            ids += [item['id'] for item in page['items']]
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(ids, [1, 2, 4])
+
+    def test_search_rejects_bad_input(self):
+        self.assertEqual(self.client.get('/messages/search').status_code, 422)
+        self.assertEqual(self.client.get('/messages/search', params={'q': 'x', 'cursor': 'not-a-cursor'}).status_code, 400)
+
+class FakeRedis:
+    """ The subset of the redis.asyncio client RedisCache uses. """
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+class TestResponseCache(unittest.TestCase):
+
+    def test_ttl_cache_evicts_least_recently_used(self):
+        cache = TTLCache(ttl=60, max_entries=2)
+        async def run():
+            await cache.set('a', b'1', 0)
+            await cache.set('b', b'2', 0)
+            await cache.get('a')
+            await cache.set('c', b'3', 0)
+            return [await cache.get(key) for key in ('a', 'b', 'c')]
+        self.assertEqual(asyncio.run(run()), [b'1', None, b'3'])
+
+    def test_ttl_cache_expiry(self):
+        cache = TTLCache(ttl=60)
+        async def run():
+            await cache.set('a', b'1', 0)
+            with patch('fast_api.cache.time.monotonic', return_value=10 ** 9):
+                return await cache.get('a')
+        self.assertIsNone(asyncio.run(run()))
+
+    def test_stale_set_after_invalidate_is_dropped(self):
+        for backend in (TTLCache(ttl=60), RedisCache(FakeRedis(), ttl=60)):
+            cache = ResponseCache(backend)
+            async def run():
+                body, generation = await cache.get('page')
+                await cache.invalidate()
+                await cache.set('page', b'stale', generation)
+                return (await cache.get('page'))[0]
+            self.assertIsNone(asyncio.run(run()), type(backend).__name__)
+
+    def test_redis_cache_invalidate(self):
+        cache = ResponseCache(RedisCache(FakeRedis(), ttl=60))
+        async def run():
+            body, generation = await cache.get('page')
+            await cache.set('page', b'fresh', generation)
+            cached = (await cache.get('page'))[0]
+            await cache.invalidate()
+            return cached, (await cache.get('page'))[0]
+        self.assertEqual(asyncio.run(run()), (b'fresh', None))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import os
+import tempfile
+from image_manifest import ImageManifest
+
+class TestImageManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.manifest = ImageManifest(os.path.join(self.tmp_dir.name, 'images', 'manifest.sqlite'))
+
+    def tearDown(self):
+        self.manifest.close()
+        self.tmp_dir.cleanup()
+
+    def test_record_deduplicates_by_hash(self):
+        sha256 = ImageManifest.hash_bytes(b'photo')
+        first = self.manifest.record('@CheMed123', 1, 100, sha256, 'CheMed123_images/1.jpg', 5)
+        second = self.manifest.record('@lobelia4cosmetics', 7, 200, sha256, 'lobelia4cosmetics_images/7.jpg', 5)
+        self.assertEqual(first, 'CheMed123_images/1.jpg')
+        self.assertEqual(second, 'CheMed123_images/1.jpg')
+        self.assertEqual(self.manifest.stats(), {'images': 1, 'messages': 2})
+
+    def test_lookups(self):
+        sha256 = ImageManifest.hash_bytes(b'photo')
+        self.manifest.record('@CheMed123', 1, 100, sha256, '1.jpg', 5)
+        self.assertTrue(self.manifest.has_message('@CheMed123', 1))
+        self.assertFalse(self.manifest.has_message('@CheMed123', 2))
+        self.assertEqual(self.manifest.find_photo(100), (sha256, '1.jpg', 5))
+        self.assertIsNone(self.manifest.find_photo(101))
+        self.assertEqual(self.manifest.find_hash(sha256), '1.jpg')
+
+    def test_file_photo(self):
+        self.assertIsNone(self.manifest.file_photo('1.jpg'))
+        self.manifest.start_file('1.jpg', 100)
+        self.manifest.start_file('1.jpg', 101)
+        self.assertEqual(self.manifest.file_photo('1.jpg'), 101)
+
+    def test_new_images(self):
+        for message_id, data in enumerate([b'a', b'b', b'a', b'c'], start=1):
+            self.manifest.record('@CheMed123', message_id, message_id, ImageManifest.hash_bytes(data), f'{message_id}.jpg', 1)
+        images = self.manifest.new_images()
+        self.assertEqual([path for _, path, _ in images], ['1.jpg', '2.jpg', '4.jpg'])
+        self.assertEqual([path for _, path, _ in self.manifest.new_images(after_id=images[1][0])], ['4.jpg'])
+
+    def test_import_directory(self):
+        image_dir = os.path.join(self.tmp_dir.name, 'CheMed123_images')
+        os.makedirs(image_dir)
+        for file_name, data in [('1.jpg', b'a'), ('2.jpg', b'b'), ('3.jpg', b'a'), ('notes.txt', b'c')]:
+            with open(os.path.join(image_dir, file_name), 'wb') as f:
+                f.write(data)
+        self.manifest.record('@CheMed123', 2, 200, ImageManifest.hash_bytes(b'b'), os.path.join(image_dir, '2.jpg'), 1)
+
+        self.assertEqual(self.manifest.import_directory(image_dir), 1)
+        self.assertEqual(self.manifest.import_directory(image_dir), 0)
+        self.assertEqual([path for _, path, _ in self.manifest.new_images()], [os.path.join(image_dir, '2.jpg'), os.path.join(image_dir, '1.jpg')])
+        self.assertFalse(self.manifest.has_message('@CheMed123', 1))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+import json
+import logging
+import os
+import tempfile
+from unittest.mock import patch
+import instrumentation
+from instrumentation import track_stage, timed_stage, log_sampled, render_metrics, REGISTRY
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.tmp_dir.name, 'metrics.jsonl')
+        self.handler = logging.FileHandler(self.log_path, encoding='utf-8')
+        self.handler.setFormatter(logging.Formatter('%(message)s'))
+        instrumentation.metrics_logger.addHandler(self.handler)
+        instrumentation.metrics_logger.setLevel(logging.INFO)
+
+    def tearDown(self):
+        instrumentation.metrics_logger.removeHandler(self.handler)
+        self.handler.close()
+        self.tmp_dir.cleanup()
+
+    def events(self):
+        self.handler.flush()
+        with open(self.log_path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_track_stage(self):
+        before = REGISTRY.get_sample_value('pipeline_stage_rows_total', {'stage': 'test_ok'}) or 0
+        with track_stage('test_ok', channel='@CheMed123') as stage:
+            stage.add_rows(40)
+            stage.add_rows(2)
+
+        event = self.events()[-1]
+        self.assertEqual((event['event'], event['stage'], event['status'], event['rows']), ('stage', 'test_ok', 'ok', 42))
+        self.assertEqual(event['channel'], '@CheMed123')
+        self.assertGreater(event['rows_per_sec'], 0)
+        self.assertGreater(event['peak_rss_bytes'], 0)
+        self.assertEqual(REGISTRY.get_sample_value('pipeline_stage_rows_total', {'stage': 'test_ok'}), before + 42)
+        self.assertEqual(REGISTRY.get_sample_value('pipeline_stage_duration_seconds_count', {'stage': 'test_ok', 'status': 'ok'}), 1)
+
+    def test_track_stage_error(self):
+        with self.assertRaises(ValueError):
+            with track_stage('test_error'):
+                raise ValueError('boom')
+        self.assertEqual(self.events()[-1]['status'], 'error')
+        self.assertEqual(REGISTRY.get_sample_value('pipeline_stage_duration_seconds_count', {'stage': 'test_error', 'status': 'error'}), 1)
+
+    def test_timed_stage(self):
+        @timed_stage('test_decorated', rows=sum)
+        def load(rows):
+            return rows, 1
+
+        self.assertEqual(load(5), (5, 1))
+        self.assertEqual(self.events()[-1]['rows'], 6)
+
+    def test_log_sampled(self):
+        logger = logging.getLogger('test_instrumentation.sampled')
+        with patch.object(logger, 'debug') as mock_debug:
+            logger.setLevel(logging.INFO)
+            log_sampled('disabled', 'row %s', 1, logger=logger)
+            mock_debug.assert_not_called()
+
+            logger.setLevel(logging.DEBUG)
+            for row in range(1, 11):
+                log_sampled('rows', 'row %s', row, every=5, logger=logger)
+            self.assertEqual([call.args[1] for call in mock_debug.call_args_list], [1, 5, 10])
+
+    def test_render_metrics(self):
+        with track_stage('test_render') as stage:
+            stage.rows = 3
+        body, content_type = render_metrics()
+        self.assertTrue(content_type.startswith('text/plain'))
+        self.assertIn(b'pipeline_stage_rows_total{stage="test_render"} 3.0', body)
+        self.assertIn(b'process_peak_rss_bytes', body)
+
+if __name__ == "__main__":
+    unittest.main()
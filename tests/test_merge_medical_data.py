@@ -3,19 +3,26 @@ from unittest.mock import patch, MagicMock, mock_open
 import pandas as pd
 import os
 import logging
-from merge_medical_data import load_csv, save_merged_data, main
+import tempfile
+from merge_medical_data import get_channel_paths, load_csv, save_merged_data, merge_incremental, load_manifest, main
+from parquet_store import read_layer
 
 class TestMergeMedicalData(unittest.TestCase):
 
-    @patch('merge_medical_data.pd.read_csv')
-    def test_load_csv(self, mock_read_csv):
-        mock_read_csv.return_value = pd.DataFrame({'col1': [1, 2], 'col2': [3, 4]})
-        file_path = 'test.csv'
-        df = load_csv(file_path)
-        mock_read_csv.assert_called_once_with(file_path)
-        self.assertEqual(df.shape, (2, 2))
-        self.assertIn('col1', df.columns)
-        self.assertIn('col2', df.columns)
+    def test_load_csv(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            file_path = os.path.join(data_dir, 'test.csv')
+            with open(file_path, 'w') as f:
+                f.write("Channel Title,Channel Username,ID,Message,Date\nCheMed,@CheMed123,1,Hello,2025-02-02\n")
+            df = load_csv(file_path)
+            self.assertEqual(df.shape, (1, 5))
+            self.assertEqual(str(df['ID'].dtype), 'Int64')
+            self.assertEqual(str(df['Date'].dtype), 'string')
+
+            with open(file_path, 'w') as f:
+                f.write("col1,col2\n1,3\n")
+            with self.assertRaises(ValueError):
+                load_csv(file_path)
 
     @patch('merge_medical_data.pd.DataFrame.to_csv')
     def test_save_merged_data(self, mock_to_csv):
@@ -24,21 +31,120 @@ class TestMergeMedicalData(unittest.TestCase):
         save_merged_data(df, output_path)
         mock_to_csv.assert_called_once_with(output_path, index=False)
 
-    @patch('merge_medical_data.load_csv')
-    @patch('merge_medical_data.save_merged_data')
-    @patch('merge_medical_data.pd.concat')
-    @patch('merge_medical_data.os.path.join', side_effect=lambda *args: '/'.join(args))
-    @patch('merge_medical_data.os.makedirs')
-    def test_main(self, mock_makedirs, mock_path_join, mock_concat, mock_save_merged_data, mock_load_csv):
-        mock_load_csv.return_value = pd.DataFrame({'col1': [1, 2], 'col2': [3, 4]})
-        mock_concat.return_value = pd.DataFrame({'col1': [1, 2, 1, 2], 'col2': [3, 4, 3, 4]})
+    @patch('merge_medical_data.export_csv')
+    @patch('merge_medical_data.merge_incremental')
+    def test_main(self, mock_merge_incremental, mock_export_csv):
+        mock_merge_incremental.return_value = {'unchanged': 4, 'new': 1, 'append': 0, 'rewrite': 0, 'removed': 0, 'rows': 2}
         
-        main()
+        main(csv_export=True)
         
-        self.assertEqual(mock_load_csv.call_count, 5)
-        mock_concat.assert_called_once()
-        mock_save_merged_data.assert_called_once()
-        mock_makedirs.assert_called_once_with('../logs', exist_ok=True)
+        mock_merge_incremental.assert_called_once_with(full=False)
+        mock_export_csv.assert_called_once_with('merged', '../src/data/merged_medical_data.csv')
+
+        mock_export_csv.reset_mock()
+        main(full=True)
+        mock_merge_incremental.assert_called_with(full=True)
+        mock_export_csv.assert_not_called()
+
+    def test_get_channel_paths(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            for name in ['DoctorsET_data.csv', 'DoctorsET_data_20250202T000000Z.csv', 'DoctorsET_data_20250101T000000Z.csv', 'EAHCI_data.csv']:
+                open(os.path.join(data_dir, name), 'w').close()
+            paths = [os.path.basename(path) for path in get_channel_paths(data_dir, 'DoctorsET_data.csv')]
+            self.assertEqual(paths, ['DoctorsET_data.csv', 'DoctorsET_data_20250101T000000Z.csv', 'DoctorsET_data_20250202T000000Z.csv'])
+            self.assertEqual(get_channel_paths(data_dir, 'CheMed123_data.csv'), [os.path.join(data_dir, 'CheMed123_data.csv')])
+
+class TestIncrementalMerge(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, 'raw_data')
+        self.base_dir = os.path.join(self.tmp_dir.name, 'parquet')
+        self.manifest_path = os.path.join(self.tmp_dir.name, 'merge_manifest.json')
+        self.registry_path = os.path.join(self.tmp_dir.name, 'channels.yaml')
+        os.makedirs(self.data_dir)
+        with open(self.registry_path, 'w') as f:
+            f.write("channels:\n  - '@CheMed123'\n  - '@DoctorsET'\n")
+        self.write_rows('CheMed123_data.csv', '@CheMed123', [1, 2])
+        self.write_rows('DoctorsET_data.csv', '@DoctorsET', [1])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_rows(self, file_name, channel, ids, mode='w'):
+        file_path = os.path.join(self.data_dir, file_name)
+        with open(file_path, mode, encoding='utf-8') as f:
+            if mode == 'w':
+                f.write("Channel Title,Channel Username,ID,Message,Date\n")
+            for message_id in ids:
+                f.write(f'{channel[1:]},{channel},{message_id},"Message\n{message_id}",2025-02-0{message_id} 10:00:00+00:00\n')
+        return file_path
+
+    def merge(self, **kwargs):
+        return merge_incremental(self.data_dir, self.base_dir, self.manifest_path, self.registry_path, **kwargs)
+
+    def merged_keys(self):
+        df = read_layer('merged', base_dir=self.base_dir)
+        return sorted(zip(df['Channel Username'], df['ID']))
+
+    def test_first_run_and_unchanged(self):
+        stats = self.merge()
+        self.assertEqual((stats['new'], stats['rows']), (2, 3))
+        self.assertEqual(load_manifest(self.manifest_path)['CheMed123_data.csv']['rows'], 2)
+
+        with patch('merge_medical_data.load_csv') as mock_load_csv:
+            stats = self.merge()
+        mock_load_csv.assert_not_called()
+        self.assertEqual((stats['unchanged'], stats['rows']), (2, 0))
+        self.assertEqual(len(self.merged_keys()), 3)
+
+    def test_appended_rows_only(self):
+        self.merge()
+        self.write_rows('CheMed123_data.csv', '@CheMed123', [3], mode='a')
+        self.write_rows('CheMed123_data_20250203T000000Z.csv', '@CheMed123', [4])
+
+        stats = self.merge()
+        self.assertEqual((stats['append'], stats['new'], stats['unchanged'], stats['rows']), (1, 1, 1, 2))
+        self.assertEqual(self.merged_keys(), [('@CheMed123', 1), ('@CheMed123', 2), ('@CheMed123', 3), ('@CheMed123', 4), ('@DoctorsET', 1)])
+        self.assertEqual(load_manifest(self.manifest_path)['CheMed123_data.csv']['rows'], 3)
+
+    def test_row_cut_mid_write(self):
+        file_path = os.path.join(self.data_dir, 'CheMed123_data.csv')
+        with open(file_path, 'rb') as f:
+            content = f.read()
+        cut = content.index(b'"Message\n2') + 5  # Inside the quoted message of the second row
+        with open(file_path, 'wb') as f:
+            f.write(content[:cut])
+
+        stats = self.merge()
+        self.assertEqual(stats['rows'], 2)
+        self.assertEqual(load_manifest(self.manifest_path)['CheMed123_data.csv']['size'], content.index(b'CheMed123,@CheMed123,2'))
+        self.assertEqual(self.merged_keys(), [('@CheMed123', 1), ('@DoctorsET', 1)])
+
+        with open(file_path, 'ab') as f:
+            f.write(content[cut:])
+        self.write_rows('CheMed123_data.csv', '@CheMed123', [3], mode='a')
+        stats = self.merge()
+        self.assertEqual((stats['append'], stats['rows']), (1, 2))
+        df = read_layer('merged', base_dir=self.base_dir)
+        self.assertEqual(sorted(zip(df['Channel Username'], df['ID'])), [('@CheMed123', 1), ('@CheMed123', 2), ('@CheMed123', 3), ('@DoctorsET', 1)])
+        self.assertEqual(df.loc[df['ID'] == 2, 'Message'].tolist(), ['Message\n2'])
+        self.assertFalse(df['Date'].isna().any())
+
+    def test_rewritten_and_removed_inputs(self):
+        self.merge()
+        self.write_rows('CheMed123_data.csv', '@CheMed123', [5])
+        os.remove(os.path.join(self.data_dir, 'DoctorsET_data.csv'))
+
+        stats = self.merge()
+        self.assertEqual((stats['rewrite'], stats['removed']), (1, 1))
+        self.assertEqual(self.merged_keys(), [('@CheMed123', 5)])
+
+    def test_full_rebuild(self):
+        self.merge()
+        stats = self.merge(full=True)
+        self.assertEqual((stats['new'], stats['rows']), (2, 3))
+        self.assertEqual(len(self.merged_keys()), 3)
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from near_duplicates import NearDuplicateIndex, encode_texts, load_index, lsh_params, select_texts
+
+MESSAGE = "Paracetamol 500mg tablets now in stock at our Bole branch, call 0911 for delivery"
+
+class TestNearDuplicates(unittest.TestCase):
+
+    def decode(self, codepoints, lengths):
+        starts = np.cumsum(lengths) - lengths
+        return [codepoints[start:start + length].tobytes().decode('utf-32-le') for start, length in zip(starts, lengths)]
+
+    def test_encode_texts_normalizes_case_spacing_and_punctuation(self):
+        codepoints, lengths = encode_texts(["  Hello,   WORLD!! ", "ፓራሲታሞል - 500mg", None, "!!!", ""])
+        self.assertEqual(self.decode(codepoints, lengths), ["hello world", "ፓራሲታሞል 500mg", "", "", ""])
+        self.assertEqual(encode_texts([])[1].tolist(), [])
+
+    def test_select_texts(self):
+        codepoints, lengths = encode_texts(["one", "two words", "three"])
+        self.assertEqual(self.decode(*select_texts(codepoints, lengths, np.array([2, 0]))), ["three", "one"])
+
+    def test_lsh_params(self):
+        bands, rows = lsh_params(0.8, 64)
+        self.assertLessEqual(bands * rows, 64)
+        self.assertGreater(lsh_params(0.9, 64)[1], lsh_params(0.5, 64)[1])
+
+    def test_near_copies_share_a_cluster(self):
+        index = NearDuplicateIndex()
+        cluster_ids = index.assign([1, 2, 3, 4, 5], [
+            MESSAGE,
+            MESSAGE.upper() + " 😊",
+            "Vitamin C effervescent tablets, 20 per tube, free delivery in Addis",
+            None,
+            "..."
+        ])
+        self.assertEqual(cluster_ids[0], cluster_ids[1])
+        self.assertNotEqual(cluster_ids[0], cluster_ids[2])
+        self.assertEqual(cluster_ids[3:].tolist(), [-1, -1])
+        self.assertEqual(len(index), 3)
+
+    def test_threshold(self):
+        edited = MESSAGE.replace("Bole", "Piassa").replace("0911", "0922")
+        self.assertEqual(len(set(NearDuplicateIndex(0.5).assign([1, 2], [MESSAGE, edited]))), 1)
+        self.assertEqual(len(set(NearDuplicateIndex(0.95).assign([1, 2], [MESSAGE, edited]))), 2)
+
+    def test_known_keys_keep_their_cluster(self):
+        index = NearDuplicateIndex()
+        first = index.assign([1, 2], [MESSAGE, "Amoxicillin 250mg capsules"])
+        # Repeated keys are not added again, whatever their text now says
+        again = index.assign([2, 1, 2], ["something else entirely", MESSAGE, None])
+        self.assertEqual(again.tolist(), [first[1], first[0], first[1]])
+        self.assertEqual(len(index), 2)
+
+    def test_save_and_load_match_incrementally(self):
+        index = NearDuplicateIndex()
+        first = index.assign([1, 2], [MESSAGE, "Amoxicillin 250mg capsules for sale"])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'near_duplicates', 'signatures.npz')
+            index.save(path)
+            self.assertEqual(os.listdir(os.path.dirname(path)), ['signatures.npz'])
+
+            loaded = load_index(path)
+            np.testing.assert_array_equal(loaded.signatures, index.signatures)
+            later = loaded.assign([3, 4], [MESSAGE + "!", "Insulin pens back in stock"])
+            self.assertEqual(later[0], first[0])
+            self.assertNotIn(later[1], first)
+            self.assertEqual(load_index(os.path.join(directory, 'missing.npz')).keys.tolist(), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import os
+import tempfile
+import pandas as pd
+from parquet_store import write_layer, read_layer, export_csv, layer_path
+
+class TestParquetStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.base_dir = self.tmp_dir.name
+        self.df = pd.DataFrame({
+            'Channel Title': ['CheMed', 'CheMed', 'Doctors ET'],
+            'Channel Username': ['@CheMed123', '@CheMed123', '@DoctorsET'],
+            'ID': ['1', '2', '3'],
+            'Message': ['Paracetamol', None, 'Vitamin C'],
+            'Date': ['2025-01-10 08:00:00+00:00', '2025-02-03 09:30:00+00:00', '2025-01-15 12:00:00+00:00']
+        })
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_round_trip_types(self):
+        self.assertEqual(write_layer(self.df, 'merged', base_dir=self.base_dir), 3)
+        df = read_layer('merged', base_dir=self.base_dir).sort_values('ID', ignore_index=True)
+        self.assertEqual(list(df.columns), list(self.df.columns))
+        self.assertEqual(df['ID'].tolist(), [1, 2, 3])
+        self.assertEqual(str(df['Date'].dtype), 'datetime64[us, UTC]')
+        self.assertTrue(pd.isna(df.loc[1, 'Message']))
+
+    def test_partition_layout(self):
+        write_layer(self.df, 'merged', base_dir=self.base_dir, run_id='run1')
+        files = sorted(
+            os.path.relpath(os.path.join(root, name), layer_path('merged', self.base_dir))
+            for root, _, names in os.walk(self.base_dir) for name in names
+        )
+        self.assertEqual(files, [
+            os.path.join('channel=CheMed123', 'month=2025-01', 'part-run1-0.parquet'),
+            os.path.join('channel=CheMed123', 'month=2025-02', 'part-run1-0.parquet'),
+            os.path.join('channel=DoctorsET', 'month=2025-01', 'part-run1-0.parquet')
+        ])
+
+    def test_projection_and_filters(self):
+        write_layer(self.df, 'merged', base_dir=self.base_dir)
+        df = read_layer('merged', columns=['ID'], filters=[('channel', '=', 'CheMed123')], base_dir=self.base_dir)
+        self.assertEqual(list(df.columns), ['ID'])
+        self.assertEqual(sorted(df['ID']), [1, 2])
+
+        df = read_layer('merged', filters=[('month', '=', '2025-01'), ('ID', '>', 1)], base_dir=self.base_dir)
+        self.assertEqual(df['ID'].tolist(), [3])
+
+    def test_appends_runs(self):
+        write_layer(self.df, 'merged', base_dir=self.base_dir)
+        write_layer(self.df.iloc[:1], 'merged', base_dir=self.base_dir)
+        self.assertEqual(len(read_layer('merged', base_dir=self.base_dir)), 4)
+
+    def test_export_csv(self):
+        write_layer(self.df, 'merged', base_dir=self.base_dir)
+        output_path = os.path.join(self.base_dir, 'export.csv')
+        rows = export_csv('merged', output_path, filters=[('channel', '=', 'CheMed123')], base_dir=self.base_dir)
+        self.assertEqual(rows, 2)
+        self.assertEqual(sorted(pd.read_csv(output_path)['ID']), [1, 2])
+
+    def test_unknown_layer(self):
+        with self.assertRaises(ValueError):
+            read_layer('raw', base_dir=self.base_dir)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+from product_extraction import LATIN_RUN_PATTERN, ProductMatcher, default_matcher, extract_product_info, extract_usage, load_aliases
+
+class TestProductExtraction(unittest.TestCase):
+
+    def setUp(self):
+        self.matcher = ProductMatcher({
+            'paracetamol': 'Paracetamol',
+            'ፓራሲታሞል': 'Paracetamol',
+            'vitamin c': 'Vitamin C',
+            'vitamin c plus zinc': 'Vitamin C + Zinc',
+            'ፎሊክ አሲድ': 'Folic Acid'
+        })
+
+    def test_match_aliases_case_insensitively(self):
+        self.assertEqual(self.matcher.match("PARACETAMOL 500mg"), "Paracetamol")
+        self.assertEqual(self.matcher.match("ፓራሲታሞል በቅናሽ ዋጋ"), "Paracetamol")
+        self.assertIsNone(self.matcher.match("Ibuprofen 400mg"))
+
+    def test_multi_word_aliases_longest_wins(self):
+        self.assertEqual(self.matcher.find_all("Vitamin C plus zinc, vitamin c and ፎሊክ አሲድ"), ["Vitamin C + Zinc", "Vitamin C", "Folic Acid"])
+        self.assertEqual(self.matcher.find_all("vitamin C plus"), ["Vitamin C"])
+
+    def test_whole_words_only(self):
+        self.assertEqual(self.matcher.find_all("paracetamols vitamin cream"), [])
+        self.assertEqual(ProductMatcher({}).find_all("paracetamol"), [])
+
+    def test_extract_usage(self):
+        self.assertEqual(extract_usage("Take 2 tablets daily"), "2 tablets")
+        self.assertEqual(extract_usage("500mg"), "500mg")
+        self.assertIsNone(extract_usage("ዋጋ ብር"))
+
+    def test_extract_product_info(self):
+        messages = pd.Series(["ፓራሲታሞል 20 ፍሬ", "Sunscreen SPF 50", "ዋጋ 300 ብር", "No Message", None], index=[5, 6, 7, 8, 9])
+        extracted = extract_product_info(messages, self.matcher)
+        self.assertEqual(extracted.index.tolist(), [5, 6, 7, 8, 9])
+        # Messages without a dictionary product fall back to the first run of Latin letters
+        self.assertEqual(extracted['product_name'].tolist(), ["Paracetamol", "Sunscreen SPF", None, None, None])
+        self.assertEqual(extracted['usage_info'].tolist(), ["20", "50", "300", None, None])
+
+    def test_extract_product_info_matches_matcher(self):
+        # Messages with letters outside ASCII and Ethiopic are matched in Python, with full case folding;
+        # the others by the column search, where a suffix or an underscore still joins words
+        messages = pd.Series(["İፓራሲታሞል", "Crème VITAMIN-C", "Straße ፎሊክ አሲድ", "ፓራሲታሞልን vitamin_c"])
+        extracted = extract_product_info(messages, self.matcher)
+        self.assertEqual(extracted['product_name'].tolist(), ["Paracetamol", "Vitamin C", "Folic Acid", "vitamin"])
+        self.assertEqual(extracted['product_name'].tolist(), [
+            self.matcher.match(text) or LATIN_RUN_PATTERN.search(text).group().strip() for text in messages
+        ])
+
+    def test_seed_file(self):
+        aliases = load_aliases()
+        self.assertEqual(aliases['ፓራሲታሞል'], 'Paracetamol')
+        self.assertEqual(default_matcher().match("Amoxicillin 250mg capsules"), "Amoxicillin")
+        self.assertIs(default_matcher(), default_matcher())
+
+    def test_load_aliases_skips_empty_aliases(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'products.csv')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("product_name,alias\nInsulin, Insulin \nInsulin,\n")
+            self.assertEqual(load_aliases(path), {'insulin': 'Insulin'})
+
+if __name__ == "__main__":
+    unittest.main()
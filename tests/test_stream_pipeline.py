@@ -0,0 +1,72 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import tempfile
+import pandas as pd
+from sqlalchemy import create_engine, text
+from database_setup import create_table
+from stream_pipeline import iter_raw_chunks, run_pipeline
+
+class TestStreamPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = self.tmp_dir.name
+        pd.DataFrame({
+            'Channel Title': ['Channel 1'] * 3,
+            'Channel Username': ['@channel1'] * 3,
+            'ID': [3, 2, 1],
+            'Message': ['Hello 😊', 'https://youtu.be/dQw4w9WgXcQ', None],
+            'Date': ['2025-02-02 10:00:00'] * 3
+        }).to_csv(os.path.join(self.data_dir, 'channel1_data.csv'), index=False)
+        pd.DataFrame({
+            'Channel Title': ['Channel 2'] * 2,
+            'Channel Username': ['@channel2'] * 2,
+            'ID': [2, 4],
+            'Message': ['Duplicate ID', 'Paracetamol\n500mg'],
+            'Date': ['2025-02-03 10:00:00', None]
+        }).to_csv(os.path.join(self.data_dir, 'channel2_data.csv'), index=False)
+        self.channel_files = ['channel1_data.csv', 'channel2_data.csv']
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_iter_raw_chunks(self):
+        chunks = list(iter_raw_chunks(self.data_dir, self.channel_files, chunksize=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1, 2])
+
+    def test_run_pipeline(self):
+        engine = create_engine('sqlite://')
+        create_table(engine)
+        cleaned_path = os.path.join(self.data_dir, 'cleaned.csv')
+
+        inserted, skipped = run_pipeline(engine, self.data_dir, self.channel_files, chunksize=2, cleaned_path=cleaned_path)
+
+        self.assertEqual((inserted, skipped), (5, 0))
+        with engine.connect() as connection:
+            rows = connection.execute(text(
+                "SELECT channel_username, message_id, message, emoji_used FROM telegram_medical_messages "
+                "ORDER BY channel_username, message_id"
+            )).fetchall()
+        self.assertEqual([tuple(row) for row in rows], [
+            ('@channel1', 1, 'No Message', 'No emoji'),
+            ('@channel1', 2, '', 'No emoji'),
+            ('@channel1', 3, 'Hello', '😊'),
+            ('@channel2', 2, 'Duplicate ID', 'No emoji'),
+            ('@channel2', 4, 'Paracetamol 500mg', 'No emoji')
+        ])
+        self.assertEqual(len(pd.read_csv(cleaned_path)), 5)
+
+    @patch('stream_pipeline.insert_data', return_value=(3, 0))
+    def test_run_pipeline_drops_repeated_messages_across_chunks(self, mock_insert_data):
+        run_pipeline(MagicMock(), self.data_dir, ['channel1_data.csv', 'channel1_data.csv'], chunksize=2)
+        loaded = pd.concat([call[0][1] for call in mock_insert_data.call_args_list])
+        self.assertEqual(sorted(loaded['message_id']), [1, 2, 3])
+
+    @patch('stream_pipeline.insert_data', return_value=(1, 0))
+    def test_run_pipeline_skips_empty_chunks(self, mock_insert_data):
+        run_pipeline(MagicMock(), self.data_dir, ['channel1_data.csv', 'channel1_data.csv'], chunksize=5)
+        self.assertEqual(mock_insert_data.call_count, 1)
+
+if __name__ == "__main__":
+    unittest.main()
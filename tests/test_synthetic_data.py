@@ -0,0 +1,38 @@
+import unittest
+import os
+import tempfile
+import pandas as pd
+from synthetic_data import generate_channel_data, write_channel_csvs, AMHARIC_WORDS, CHANNELS
+from merge_medical_data import load_csv
+
+class TestSyntheticData(unittest.TestCase):
+
+    def test_generate_channel_data(self):
+        df = generate_channel_data(2000, duplicate_rate=0.05, missing_date_rate=0.1, seed=1)
+        self.assertEqual(len(df), 2000)
+        self.assertEqual(list(df.columns), ['Channel Title', 'Channel Username', 'ID', 'Message', 'Date'])
+        self.assertEqual(set(df['Channel Username']), set(CHANNELS))
+        self.assertEqual(df.duplicated(['Channel Username', 'ID']).sum(), 100)
+        self.assertTrue(0.05 < df['Date'].isna().mean() < 0.15)
+        self.assertTrue(df['Message'].isna().any())
+
+        messages = df['Message'].dropna()
+        self.assertTrue(messages.str.contains('youtu').any())
+        self.assertTrue(messages.apply(lambda text: any(word in text for word in AMHARIC_WORDS)).any())
+
+        # IDs follow the dates inside a channel
+        channel = df[(df['Channel Username'] == '@CheMed123') & df['Date'].notna()].drop_duplicates()
+        self.assertTrue(pd.to_datetime(channel.sort_values('ID')['Date']).is_monotonic_increasing)
+
+    def test_deterministic(self):
+        pd.testing.assert_frame_equal(generate_channel_data(500, seed=3), generate_channel_data(500, seed=3))
+
+    def test_write_channel_csvs(self):
+        df = generate_channel_data(300)
+        with tempfile.TemporaryDirectory() as data_dir:
+            paths = write_channel_csvs(df, data_dir)
+            self.assertEqual(sorted(os.path.basename(path) for path in paths), sorted(f"{channel[1:]}_data.csv" for channel in CHANNELS))
+            self.assertEqual(sum(len(load_csv(path)) for path in paths), 300)
+
+if __name__ == "__main__":
+    unittest.main()
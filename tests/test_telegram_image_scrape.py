@@ -1,10 +1,22 @@
 import unittest
-from unittest.mock import patch, MagicMock, mock_open
+from unittest.mock import patch, MagicMock, AsyncMock, mock_open
+import asyncio
 import os
 import json
 import logging
+import tempfile
+from types import SimpleNamespace
 from telethon import TelegramClient
-from telegram_image_scrape import get_last_processed_id, save_last_processed_id, scrape_images, main
+from telethon.tl.types import MessageMediaPhoto
+from image_manifest import ImageManifest
+from telegram_image_scrape import get_last_processed_id, save_last_processed_id, get_photo_size, download_photo, scrape_images, main
+
+def make_iter_messages(messages):
+    """ Stand-in for TelegramClient.iter_messages over a channel's messages, oldest first. """
+    async def iter_messages(entity, limit=None, min_id=0, reverse=False):
+        for message in [message for message in messages if message.id > min_id][:limit]:
+            yield message
+    return iter_messages
 
 class TestTelegramImageScraper(unittest.TestCase):
 
@@ -42,7 +54,7 @@ class TestTelegramImageScraper(unittest.TestCase):
 
         await scrape_images(client, channel_username, image_dir)
 
-        mock_download_media.assert_called_once_with(message.media.photo, 'test_path')
+        mock_download_media.assert_called_once_with(message.media.photo, file=bytes)
         mock_save_last_id.assert_called_once_with(channel_username, 1)
 
     @patch('telegram_image_scrape.TelegramClient')
@@ -61,5 +73,166 @@ class TestTelegramImageScraper(unittest.TestCase):
         mock_makedirs.assert_any_call('../src/data/images/lobelia4cosmetics_images', exist_ok=True)
         self.assertEqual(mock_scrape_images.call_count, 2)
 
+    def test_get_photo_size(self):
+        photo = SimpleNamespace(sizes=[
+            SimpleNamespace(type='s', bytes=b'x'),
+            SimpleNamespace(type='m', size=1000),
+            SimpleNamespace(type='y', sizes=[2000, 5000, 9000])
+        ])
+        self.assertEqual(get_photo_size(photo), 9000)
+        self.assertIsNone(get_photo_size(SimpleNamespace(sizes=[])))
+
+    @patch('telegram_image_scrape.save_last_processed_id')
+    @patch('telegram_image_scrape.get_last_processed_id', return_value=0)
+    def test_scrape_images_deduplicates(self, mock_get_last_id, mock_save_last_id):
+        contents = {1: b'product-a', 2: b'product-b', 3: b'product-a'}
+        photos = {message_id: SimpleNamespace(id=message_id, sizes=[SimpleNamespace(size=len(data))]) for message_id, data in contents.items()}
+        messages = [SimpleNamespace(id=message_id, media=MessageMediaPhoto(photo=photo)) for message_id, photo in photos.items()]
+        messages.append(SimpleNamespace(id=4, media=None))
+
+        iter_messages = make_iter_messages(messages)
+
+        async def download_media(photo, file=None):
+            await asyncio.sleep(0)
+            return contents[photo.id]
+
+        client = MagicMock()
+        client.get_entity = AsyncMock()
+        client.iter_messages = iter_messages
+        client.download_media = AsyncMock(side_effect=download_media)
+
+        with tempfile.TemporaryDirectory() as image_dir:
+            manifest = ImageManifest(os.path.join(image_dir, 'manifest.sqlite'))
+            # Message 2 was written by an earlier run interrupted before it recorded the message
+            manifest.start_file(os.path.join(image_dir, '2.jpg'), 2)
+            with open(os.path.join(image_dir, '2.jpg'), 'wb') as f:
+                f.write(contents[2])
+
+            results = asyncio.run(scrape_images(client, '@test_channel', image_dir, manifest=manifest, workers=2))
+            # A second run over the same messages downloads nothing
+            mock_get_last_id.return_value = 0
+            rerun = asyncio.run(scrape_images(client, '@test_channel', image_dir, manifest=manifest, workers=2))
+
+            self.assertEqual(sorted(os.listdir(image_dir)), ['1.jpg', '2.jpg', 'manifest.sqlite'])
+            self.assertEqual(manifest.stats(), {'images': 2, 'messages': 3})
+            manifest.close()
+
+        self.assertEqual(results, {'downloaded': 1, 'existing': 1, 'duplicate': 1})
+        self.assertEqual(rerun, {'known': 3})
+        self.assertEqual(client.download_media.await_count, 2)
+        mock_save_last_id.assert_called_with('@test_channel', 4)
+
+    @patch('telegram_image_scrape.save_last_processed_id')
+    @patch('telegram_image_scrape.get_last_processed_id', return_value=0)
+    def test_scrape_images_retries_failed_downloads(self, mock_get_last_id, mock_save_last_id):
+        contents = {1: b'product-a', 2: b'product-b', 3: b'product-c'}
+        messages = [SimpleNamespace(id=message_id, media=MessageMediaPhoto(photo=SimpleNamespace(id=message_id, sizes=[]))) for message_id in contents]
+        failures = {2}
+
+        iter_messages = make_iter_messages(messages)
+
+        async def download_media(photo, file=None):
+            if photo.id in failures:
+                failures.discard(photo.id)
+                raise ConnectionError("connection reset")
+            return contents[photo.id]
+
+        client = MagicMock()
+        client.get_entity = AsyncMock()
+        client.iter_messages = iter_messages
+        client.download_media = AsyncMock(side_effect=download_media)
+
+        with tempfile.TemporaryDirectory() as image_dir:
+            manifest = ImageManifest(os.path.join(image_dir, 'manifest.sqlite'))
+            results = asyncio.run(scrape_images(client, '@test_channel', image_dir, manifest=manifest, workers=2))
+            # The checkpoint stops before the failed message
+            mock_save_last_id.assert_called_with('@test_channel', 1)
+
+            mock_get_last_id.return_value = 1
+            retry = asyncio.run(scrape_images(client, '@test_channel', image_dir, manifest=manifest, workers=2))
+            mock_save_last_id.assert_called_with('@test_channel', 3)
+            self.assertEqual(manifest.stats(), {'images': 3, 'messages': 3})
+            manifest.close()
+
+        self.assertEqual(results, {'downloaded': 2, 'failed': 1})
+        self.assertEqual(retry, {'downloaded': 1, 'known': 1})
+
+    @patch('telegram_image_scrape.save_last_processed_id')
+    @patch('telegram_image_scrape.get_last_processed_id', return_value=0)
+    def test_scrape_images_resumes_after_checkpoint(self, mock_get_last_id, mock_save_last_id):
+        messages = [SimpleNamespace(id=message_id, media=MessageMediaPhoto(photo=SimpleNamespace(id=message_id, sizes=[])))
+                    for message_id in range(1, 6)]
+        client = MagicMock()
+        client.get_entity = AsyncMock()
+        client.iter_messages = make_iter_messages(messages)
+        client.download_media = AsyncMock(side_effect=lambda photo, file=None: f"product-{photo.id}".encode())
+
+        with tempfile.TemporaryDirectory() as image_dir:
+            manifest = ImageManifest(os.path.join(image_dir, 'manifest.sqlite'))
+            first = asyncio.run(scrape_images(client, '@test_channel', image_dir, manifest=manifest, backfill_limit=3))
+            mock_save_last_id.assert_called_with('@test_channel', 3)
+
+            mock_get_last_id.return_value = 3
+            second = asyncio.run(scrape_images(client, '@test_channel', image_dir, manifest=manifest, backfill_limit=3))
+            mock_save_last_id.assert_called_with('@test_channel', 5)
+            self.assertEqual(sorted(os.listdir(image_dir)), ['1.jpg', '2.jpg', '3.jpg', '4.jpg', '5.jpg', 'manifest.sqlite'])
+            manifest.close()
+
+        self.assertEqual(first, {'downloaded': 3})
+        self.assertEqual(second, {'downloaded': 2})
+
+    def test_download_photo_checks_files_on_disk(self):
+        photo = SimpleNamespace(id=2, sizes=[SimpleNamespace(size=9)])
+        client = MagicMock()
+        client.download_media = AsyncMock(return_value=b'product-b')
+
+        with tempfile.TemporaryDirectory() as image_dir:
+            manifest = ImageManifest(os.path.join(image_dir, 'manifest.sqlite'))
+            file_path = os.path.join(image_dir, '2.jpg')
+            # Same size, but written for another photo
+            manifest.start_file(file_path, 1)
+            with open(file_path, 'wb') as f:
+                f.write(b'product-a')
+            outcome = asyncio.run(download_photo(client, manifest, '@test_channel', 2, photo, image_dir))
+            self.assertEqual(outcome, 'downloaded')
+            self.assertEqual(manifest.file_photo(file_path), 2)
+            with open(file_path, 'rb') as f:
+                self.assertEqual(f.read(), b'product-b')
+
+            # Left by an interrupted run for the right photo, but the image is already stored for another channel
+            manifest.record('@other_channel', 7, 70, manifest.hash_bytes(b'product-c'), os.path.join(image_dir, '7.jpg'), 9)
+            file_path = os.path.join(image_dir, '3.jpg')
+            manifest.start_file(file_path, 3)
+            with open(file_path, 'wb') as f:
+                f.write(b'product-c')
+            outcome = asyncio.run(download_photo(client, manifest, '@test_channel', 3, SimpleNamespace(id=3, sizes=[]), image_dir))
+            self.assertEqual(outcome, 'duplicate')
+            self.assertFalse(os.path.exists(file_path))
+            self.assertEqual(manifest.find_photo(3)[1], os.path.join(image_dir, '7.jpg'))
+            manifest.close()
+
+        client.download_media.assert_awaited_once()
+
+    def test_download_photo_keeps_first_stored_copy(self):
+        data = b'product-a'
+        photo = SimpleNamespace(id=2, sizes=[])
+        client = MagicMock()
+        client.download_media = AsyncMock(return_value=data)
+
+        with tempfile.TemporaryDirectory() as image_dir:
+            manifest_path = os.path.join(image_dir, 'manifest.sqlite')
+            manifest = ImageManifest(manifest_path)
+            # Another scraper stores the same image after this one checked the hash
+            other = ImageManifest(manifest_path)
+            other.record('@other_channel', 7, 1, manifest.hash_bytes(data), os.path.join(image_dir, '7.jpg'), len(data))
+            other.close()
+            with patch.object(manifest, 'find_hash', return_value=None):
+                outcome = asyncio.run(download_photo(client, manifest, '@test_channel', 2, photo, image_dir))
+
+            self.assertEqual(outcome, 'duplicate')
+            self.assertFalse(os.path.exists(os.path.join(image_dir, '2.jpg')))
+            self.assertEqual(manifest.find_photo(2)[1], os.path.join(image_dir, '7.jpg'))
+            manifest.close()
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
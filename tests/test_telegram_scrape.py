@@ -1,10 +1,14 @@
 import unittest
-from unittest.mock import patch, MagicMock, mock_open
+from unittest.mock import patch, MagicMock, AsyncMock, mock_open
+import asyncio
 import os
+import tempfile
 import json
 import logging
 from telethon import TelegramClient
-from telegram_scrape import get_last_processed_id, save_last_processed_id, scrape_channel, main
+from telethon.errors import FloodWaitError
+from channel_registry import Channel
+from telegram_scrape import BACKFILL_LIMIT, get_backfill_limit, get_last_processed_id, save_last_processed_id, get_run_output_path, scrape_channel, scrape_channel_with_backoff, main
 
 class TestTelegramScraper(unittest.TestCase):
 
@@ -15,13 +19,17 @@ class TestTelegramScraper(unittest.TestCase):
         self.assertEqual(last_id, 123)
         mock_file.assert_called_once_with(f"{channel_username}_last_id.json", 'r')
 
+    @patch('telegram_scrape.os.replace')
+    @patch('telegram_scrape.os.fsync')
     @patch('telegram_scrape.open', new_callable=mock_open)
-    def test_save_last_processed_id(self, mock_file):
+    def test_save_last_processed_id(self, mock_file, mock_fsync, mock_replace):
         channel_username = '@test_channel'
         last_id = 123
         save_last_processed_id(channel_username, last_id)
-        mock_file.assert_called_once_with(f"{channel_username}_last_id.json", 'w')
-        mock_file().write.assert_called_once_with(json.dumps({'last_id': last_id}))
+        mock_file.assert_called_once_with(f"{channel_username}_last_id.json.tmp", 'w')
+        written = ''.join(call.args[0] for call in mock_file().write.call_args_list)
+        self.assertEqual(written, json.dumps({'last_id': last_id}))
+        mock_replace.assert_called_once_with(f"{channel_username}_last_id.json.tmp", f"{channel_username}_last_id.json")
 
     @patch('telegram_scrape.TelegramClient')
     @patch('telegram_scrape.get_last_processed_id', return_value=0)
@@ -41,9 +49,9 @@ class TestTelegramScraper(unittest.TestCase):
         message.date = '2025-02-02'
         client.iter_messages.return_value = [message]
 
-        await scrape_channel(client, channel_username, data_dir)
+        await scrape_channel(client, channel_username, data_dir, run_id='run1')
 
-        mock_file.assert_called_once_with(os.path.join(data_dir, f"{channel_username[1:]}_data.csv"), 'w', newline='', encoding='utf-8')
+        mock_file.assert_called_once_with(os.path.join(data_dir, f"{channel_username[1:]}_data_run1.csv"), 'a', newline='', encoding='utf-8')
         mock_csv_writer().writerow.assert_any_call(['Channel Title', 'Channel Username', 'ID', 'Message', 'Date'])
         mock_csv_writer().writerow.assert_any_call(['Test Channel', '@test_channel', 1, 'Test message', '2025-02-02'])
         mock_save_last_id.assert_called_once_with(channel_username, 1)
@@ -63,5 +71,119 @@ class TestTelegramScraper(unittest.TestCase):
         mock_makedirs.assert_called_once_with('../src/data/raw_data', exist_ok=True)
         self.assertEqual(mock_scrape_channel.call_count, 5)
 
+    @patch('telegram_scrape.asyncio.sleep', new_callable=AsyncMock)
+    @patch('telegram_scrape.scrape_channel', new_callable=AsyncMock)
+    def test_scrape_channel_with_backoff(self, mock_scrape_channel, mock_sleep):
+        mock_scrape_channel.side_effect = [FloodWaitError(request=None, capture=7), 42]
+
+        count, elapsed = asyncio.run(scrape_channel_with_backoff(MagicMock(), '@test_channel', 'data', asyncio.Semaphore(1)))
+
+        self.assertEqual(count, 42)
+        self.assertGreaterEqual(elapsed, 0)
+        self.assertEqual(mock_scrape_channel.call_count, 2)
+        mock_sleep.assert_awaited_once_with(7)
+
+    @patch('telegram_scrape.asyncio.sleep', new_callable=AsyncMock)
+    @patch('telegram_scrape.scrape_channel', new_callable=AsyncMock)
+    def test_scrape_channel_with_backoff_gives_up(self, mock_scrape_channel, mock_sleep):
+        mock_scrape_channel.side_effect = FloodWaitError(request=None, capture=1)
+
+        with self.assertRaises(FloodWaitError):
+            asyncio.run(scrape_channel_with_backoff(MagicMock(), '@test_channel', 'data', asyncio.Semaphore(1), max_retries=2))
+        self.assertEqual(mock_scrape_channel.call_count, 3)
+
+    @patch('telegram_scrape.os.makedirs')
+    @patch('telegram_scrape.scrape_channel_with_backoff', new_callable=AsyncMock)
+    @patch('telegram_scrape.client')
+    def test_main_isolates_failing_channel(self, mock_client, mock_scrape, mock_makedirs):
+        mock_client.start = AsyncMock()
+        mock_scrape.side_effect = [(1, 0.1), Exception('boom'), (3, 0.2), (0, 0.1), (5, 0.3)]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            schedule_path = os.path.join(tmp_dir, 'channel_schedule.json')
+            with self.assertLogs(level='INFO') as logs:
+                asyncio.run(main(schedule_path=schedule_path))
+
+            self.assertEqual(mock_scrape.await_count, 5)
+            self.assertTrue(any('Failed to scrape @CheMed123: boom' in line for line in logs.output))
+            self.assertTrue(any('Scraped data from @EAHCI: 5 messages' in line for line in logs.output))
+
+            # Only the failed channel is still due on the next run
+            with open(schedule_path) as f:
+                self.assertNotIn('@CheMed123', json.load(f)['messages'])
+            mock_scrape.reset_mock(side_effect=True)
+            mock_scrape.return_value = (2, 0.1)
+            asyncio.run(main(schedule_path=schedule_path))
+            self.assertEqual([call.args[1] for call in mock_scrape.await_args_list], ['@CheMed123'])
+
+    def test_scrape_channel_streams_and_checkpoints(self):
+        async def iter_messages(entity, limit=None, min_id=0, reverse=False):
+            for message_id in range(min_id + 1, min_id + 6):
+                message = MagicMock()
+                message.id = message_id
+                message.message = f'Message {message_id}'
+                message.date = '2025-02-02'
+                yield message
+
+        client = MagicMock()
+        client.get_entity = AsyncMock(return_value=MagicMock(title='Test Channel'))
+        client.iter_messages = iter_messages
+        checkpoints = {'@test_channel': 10}
+
+        with tempfile.TemporaryDirectory() as data_dir, \
+                patch('telegram_scrape.CHECKPOINT_EVERY', 2), \
+                patch('telegram_scrape.get_last_processed_id', side_effect=lambda channel: checkpoints[channel]), \
+                patch('telegram_scrape.save_last_processed_id', side_effect=checkpoints.__setitem__) as mock_save_last_id:
+            count = asyncio.run(scrape_channel(client, '@test_channel', data_dir, run_id='run1'))
+            count += asyncio.run(scrape_channel(client, '@test_channel', data_dir, run_id='run1'))
+
+            with open(get_run_output_path(data_dir, '@test_channel', 'run1'), encoding='utf-8') as f:
+                lines = f.read().splitlines()
+
+        self.assertEqual(count, 10)
+        self.assertEqual(lines[0], 'Channel Title,Channel Username,ID,Message,Date')
+        self.assertEqual(len(lines), 11)
+        self.assertEqual(lines[-1], 'Test Channel,@test_channel,20,Message 20,2025-02-02')
+        self.assertEqual([call.args[1] for call in mock_save_last_id.call_args_list], [12, 14, 15, 17, 19, 20])
+
+    def test_get_backfill_limit(self):
+        self.assertEqual(get_backfill_limit(Channel('@DoctorsET')), BACKFILL_LIMIT)
+        self.assertEqual(get_backfill_limit(Channel('@DoctorsET', backfill_limit=50)), 50)
+        self.assertIsNone(get_backfill_limit(Channel('@DoctorsET', backfill_limit='all')))
+
+    @patch('telegram_scrape.asyncio.sleep', new_callable=AsyncMock)
+    def test_flood_wait_retry_does_not_duplicate_rows(self, mock_sleep):
+        flood_waits = [FloodWaitError(request=None, capture=3)]
+
+        async def iter_messages(entity, limit=None, min_id=0, reverse=False):
+            for message_id in range(min_id + 1, 16):
+                # Telegram asks us to wait after message 13, past the checkpoint at 12
+                if message_id == 14 and flood_waits:
+                    raise flood_waits.pop()
+                message = MagicMock()
+                message.id = message_id
+                message.message = f'Message {message_id}'
+                message.date = '2025-02-02'
+                yield message
+
+        client = MagicMock()
+        client.get_entity = AsyncMock(return_value=MagicMock(title='Test Channel'))
+        client.iter_messages = iter_messages
+        checkpoints = {'@test_channel': 10}
+
+        with tempfile.TemporaryDirectory() as data_dir, \
+                patch('telegram_scrape.CHECKPOINT_EVERY', 2), \
+                patch('telegram_scrape.get_last_processed_id', side_effect=lambda channel: checkpoints[channel]), \
+                patch('telegram_scrape.save_last_processed_id', side_effect=checkpoints.__setitem__):
+            count, _ = asyncio.run(scrape_channel_with_backoff(client, '@test_channel', data_dir, asyncio.Semaphore(1), run_id='run1'))
+
+            with open(get_run_output_path(data_dir, '@test_channel', 'run1'), encoding='utf-8') as f:
+                ids = [line.split(',')[2] for line in f.read().splitlines()[1:]]
+
+        mock_sleep.assert_awaited_once_with(3)
+        self.assertEqual(count, 3)
+        self.assertEqual(ids, [str(message_id) for message_id in range(11, 16)])
+        self.assertEqual(checkpoints['@test_channel'], 15)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,125 @@
+import unittest
+import os
+import tempfile
+import cv2
+import numpy as np
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy import create_engine, select
+from image_manifest import ImageManifest
+from yolo_detection import import_existing_images, invalidate_api_cache, run_detection, extract_boxes, detection_data, create_detection_table
+
+class FakeTensor:
+    """ Stand-in for a torch tensor exposing the cpu().numpy() chain. """
+
+    def __init__(self, values):
+        self.values = np.asarray(values)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.values
+
+def make_result(boxes):
+    result = MagicMock()
+    result.boxes.xyxy = FakeTensor([box[:4] for box in boxes] or np.empty((0, 4)))
+    result.boxes.conf = FakeTensor([box[4] for box in boxes])
+    result.boxes.cls = FakeTensor([box[5] for box in boxes])
+    return result
+
+class TestYoloDetection(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cursor_path = os.path.join(self.tmp_dir.name, 'detection_lastid.json')
+        self.manifest = ImageManifest(':memory:')
+        self.engine = create_engine('sqlite://')
+        create_detection_table(self.engine)
+
+        # One box per image, two for the third image
+        self.model = MagicMock(names={0: 'person', 1: 'bottle'})
+        self.model.side_effect = lambda frames, verbose: [
+            make_result([[1.6, 2, 30, 40, 0.9, 1]] * (2 if frame[0, 0, 0] == 2 else 1)) for frame in frames
+        ]
+
+    def tearDown(self):
+        self.manifest.close()
+        self.engine.dispose()
+        self.tmp_dir.cleanup()
+
+    def add_image(self, message_id, value=None):
+        image_path = os.path.join(self.tmp_dir.name, f'{message_id}.jpg')
+        if value is None:
+            with open(image_path, 'wb') as f:
+                f.write(b'not an image')
+        else:
+            cv2.imwrite(image_path, np.full((8, 8, 3), value, dtype=np.uint8))
+        self.manifest.record('@CheMed123', message_id, message_id, ImageManifest.hash_bytes(str(message_id).encode()), image_path, 1)
+        return image_path
+
+    def stored_rows(self):
+        with self.engine.connect() as connection:
+            return connection.execute(select(detection_data).order_by(detection_data.c.id)).fetchall()
+
+    def test_extract_boxes(self):
+        xyxy, confidence, class_id = extract_boxes(make_result([[1.6, 2, 30, 40, 0.9, 1]]))
+        self.assertEqual(xyxy.dtype, np.int32)
+        self.assertEqual(xyxy.tolist(), [[1, 2, 30, 40]])
+        self.assertEqual(class_id.tolist(), [1])
+
+    def test_run_detection_batches_and_stores(self):
+        paths = [self.add_image(1, 0), self.add_image(2, 0), self.add_image(3, 2), self.add_image(4)]
+        with patch('yolo_detection.invalidate_api_cache') as mock_invalidate:
+            stats = run_detection(self.model, self.engine, self.manifest, batch_size=2, workers=2, cursor_path=self.cursor_path)
+        self.assertEqual(mock_invalidate.call_count, 2)
+
+        self.assertEqual(stats['images'], 3)
+        self.assertEqual(stats['unreadable'], 1)
+        self.assertEqual(stats['detections'], 4)
+        self.assertEqual([len(call.args[0]) for call in self.model.call_args_list], [2, 1])
+
+        rows = self.stored_rows()
+        self.assertEqual([row.image_path for row in rows], [paths[0], paths[1], paths[2], paths[2]])
+        self.assertEqual(rows[0].bounding_box, [1, 2, 30, 40])
+        self.assertEqual(rows[0].class_name, 'bottle')
+
+    def test_run_detection_skips_seen_images(self):
+        self.add_image(1, 0)
+        run_detection(self.model, self.engine, self.manifest, batch_size=2, cursor_path=self.cursor_path)
+        stats = run_detection(self.model, self.engine, self.manifest, batch_size=2, cursor_path=self.cursor_path)
+        self.assertEqual(stats['images'], 0)
+
+        self.add_image(2, 0)
+        stats = run_detection(self.model, self.engine, self.manifest, batch_size=2, cursor_path=self.cursor_path)
+        self.assertEqual(stats['images'], 1)
+        self.assertEqual(self.model.call_count, 2)
+        self.assertEqual(len(self.stored_rows()), 2)
+
+    def test_import_existing_images(self):
+        # Images downloaded before the manifest existed, for a media channel and a text-only one
+        image_dir = os.path.join(self.tmp_dir.name, 'CheMed123_images')
+        os.makedirs(image_dir)
+        for message_id in (1, 2):
+            cv2.imwrite(os.path.join(image_dir, f'{message_id}.jpg'), np.full((8, 8, 3), message_id, dtype=np.uint8))
+        registry_path = os.path.join(self.tmp_dir.name, 'channels.yaml')
+        with open(registry_path, 'w') as f:
+            f.write(f"channels:\n  - username: '@CheMed123'\n    fetch_media: true\n    image_dir: '{image_dir}'\n  - '@DoctorsET'\n")
+
+        self.assertEqual(import_existing_images(self.manifest, registry_path), 2)
+        with patch('yolo_detection.invalidate_api_cache'):
+            stats = run_detection(self.model, self.engine, self.manifest, batch_size=2, cursor_path=self.cursor_path)
+        self.assertEqual(stats['images'], 2)
+        self.assertEqual(import_existing_images(self.manifest, registry_path), 0)
+
+    def test_invalidate_api_cache(self):
+        backend = MagicMock(invalidate=AsyncMock(), client=MagicMock(aclose=AsyncMock()))
+        with patch('yolo_detection.create_backend', return_value=backend) as mock_create_backend:
+            invalidate_api_cache(None)
+            mock_create_backend.assert_not_called()
+            invalidate_api_cache('redis://localhost:6379/0')
+        mock_create_backend.assert_called_once_with('redis://localhost:6379/0')
+        backend.invalidate.assert_awaited_once()
+        backend.client.aclose.assert_awaited_once()
+
+if __name__ == "__main__":
+    unittest.main()